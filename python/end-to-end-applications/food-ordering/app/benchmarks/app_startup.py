@@ -0,0 +1,89 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Startup time of the app: from the start of the import of ordering.app until the app is imported,
+# until it answers the discovery request of Restate (ready to serve), and until the Kafka producer connected.
+# Measured with the broker of KAFKA_BOOTSTRAP_SERVERS (localhost:9092 by default), and with a broker that is down.
+# Every run starts a fresh interpreter, so that nothing is imported yet.
+#
+# Start the Kafka broker to measure with the broker up.
+# Run from the app directory: python -m benchmarks.app_startup
+
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BROKERS = [
+    ("configured", os.environ.get("KAFKA_BOOTSTRAP_SERVERS") or "localhost:9092"),
+    # Nothing listens on this port
+    ("down", "localhost:1"),
+]
+RUNS = 5
+CONNECT_TIMEOUT_SECONDS = 10.0
+
+
+def startup():
+    """Runs in the fresh interpreter, and prints the import, ready and connected times in seconds."""
+    import httpx
+
+    start = time.perf_counter()
+    import ordering.app
+    imported = time.perf_counter() - start
+
+    async def discover():
+        transport = httpx.ASGITransport(app=ordering.app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            response = await client.get("/discover")
+            response.raise_for_status()
+
+    asyncio.run(discover())
+    ready = time.perf_counter() - start
+    connected = time.perf_counter() - start \
+        if ordering.app.kafka_client.wait_until_connected(CONNECT_TIMEOUT_SECONDS) else None
+    print(imported, ready, connected)
+
+
+def measure(name: str, bootstrap_servers: str):
+    runs = []
+    failures = 0
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, "-m", "benchmarks.app_startup", "startup"],
+                                env={**os.environ, "KAFKA_BOOTSTRAP_SERVERS": bootstrap_servers},
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            failures += 1
+            continue
+        # The last line holds the times, after whatever the app printed
+        imported, ready, connected = result.stdout.strip().splitlines()[-1].split()
+        runs.append((float(imported), float(ready), None if connected == "None" else float(connected)))
+
+    def median_millis(times) -> str:
+        return f"{statistics.median(times) * 1000:.0f}" if times else "-"
+
+    connected_runs = [run[2] for run in runs if run[2] is not None]
+    print(f"{name:>10} | {median_millis([run[0] for run in runs]):>11} | {median_millis([run[1] for run in runs]):>8}"
+          f" | {median_millis(connected_runs):>12} | {len(runs) - len(connected_runs):>13} | {failures:>6}")
+
+
+def main():
+    print(f"median of {RUNS} runs, waiting up to {CONNECT_TIMEOUT_SECONDS:.0f} s for the producer to connect")
+    print(f"{'broker':>10} | {'imported ms':>11} | {'ready ms':>8} | {'connected ms':>12}"
+          f" | {'not connected':>13} | {'failed':>6}")
+    for name, bootstrap_servers in BROKERS:
+        measure(name, bootstrap_servers)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["startup"]:
+        startup()
+    else:
+        main()
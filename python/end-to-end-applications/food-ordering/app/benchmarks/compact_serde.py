@@ -0,0 +1,84 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Encode and decode time, and bytes per message, of the default JSON serde
+# compared to the compact serdes of ordering/types/serde.py, for the messages that flow with every location update.
+# Also checks that the compact serdes give back the same messages, and still read JSON.
+#
+# Run from the app directory: python -m benchmarks.compact_serde
+
+import gc
+import random
+import time
+import uuid
+
+from restate.serde import JsonSerde
+
+from ordering.types.serde import DeliveryInformationSerde, DeliveryRequestSerde, LocationSerde
+from ordering.types.types import DeliveryInformation, DeliveryRequest
+from ordering.utils import geo
+
+MESSAGES = 100_000
+
+
+def delivery_request() -> DeliveryRequest:
+    return DeliveryRequest(
+        delivery_id=str(uuid.uuid4()),
+        restaurant_id="restaurant-1",
+        restaurant_location=geo.random_location(),
+        customer_location=geo.random_location(),
+    )
+
+
+def delivery_information() -> DeliveryInformation:
+    restaurant, customer = geo.random_location(), geo.random_location()
+    return DeliveryInformation(
+        order_id=str(uuid.uuid4()),
+        restaurant_id="restaurant-1",
+        restaurant_location=restaurant,
+        customer_location=customer,
+        order_picked_up=random.random() < 0.5,
+        restaurant_to_customer_eta_millis=geo.calculate_eta_millis(restaurant, customer),
+    )
+
+
+def timed(fn):
+    # Without the collector, which otherwise scans the decoded messages over and over
+    gc.disable()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    return result, elapsed
+
+
+def measure(name: str, messages: list, compact_serde):
+    results = {}
+    for serde_name, serde in [("json", JsonSerde()), ("compact", compact_serde)]:
+        encoded, encode_time = timed(lambda: [serde.serialize(message) for message in messages])
+        decoded, decode_time = timed(lambda: [serde.deserialize(buf) for buf in encoded])
+        assert decoded == messages
+        results[serde_name] = sum(len(buf) for buf in encoded) / len(messages)
+        print(f"{name:>20} | {serde_name:>7} | {encode_time / len(messages) * 1e6:>9.2f}"
+              f" | {decode_time / len(messages) * 1e6:>9.2f} | {results[serde_name]:>15.1f}")
+    assert [compact_serde.deserialize(JsonSerde().serialize(message)) for message in messages[:100]] == messages[:100]
+    print(f"{'':>20} | {'':>7} | {'':>9} | {'':>9} | {results['json'] / results['compact']:>14.1f}x")
+
+
+def main():
+    random.seed(MESSAGES)
+    print(f"{MESSAGES} messages of each type")
+    print(f"{'message':>20} | {'serde':>7} | {'encode us':>9} | {'decode us':>9} | {'bytes / message':>15}")
+    measure("Location", [geo.random_location() for _ in range(MESSAGES)], LocationSerde())
+    measure("DeliveryRequest", [delivery_request() for _ in range(MESSAGES)], DeliveryRequestSerde())
+    measure("DeliveryInformation", [delivery_information() for _ in range(MESSAGES)], DeliveryInformationSerde())
+
+
+if __name__ == "__main__":
+    main()
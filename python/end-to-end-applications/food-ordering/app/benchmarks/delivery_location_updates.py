@@ -0,0 +1,112 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Invocations per driver movement in the delivery tracking path
+# (driver digital twin -> delivery manager -> order status), and the error of the ETA shown to the customer,
+# for different ETA thresholds and minimum intervals between location updates.
+# The drivers move every MOVE_INTERVAL of real time, so the intervals are expressed in movements.
+#
+# Run from the app directory: python -m benchmarks.delivery_location_updates
+
+import asyncio
+import random
+import statistics
+from typing import Any
+
+import ordering.delivery_manager as delivery_manager
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.order_status as order_status
+from ordering.external.location_utils import update_location
+from ordering.types.serde import DELIVERY_INFORMATION_SERDE, LOCATION_SERDE
+from ordering.types.types import DriverStatus
+from ordering.utils import geo
+from benchmarks.state_context import SerializedObjectRuntime
+
+DRIVERS = 500
+MOVE_INTERVAL = 0.02
+# (ETA threshold in ms, minimum interval between location updates in movements)
+CONFIGURATIONS = [(0, 0), (5000, 0), (0, 5), (5000, 5), (10000, 10)]
+
+
+async def measure(eta_threshold_millis: int, min_interval_movements: int):
+    delivery_manager.ETA_UPDATE_THRESHOLD_MILLIS = eta_threshold_millis
+    delivery_manager.LOCATION_UPDATE_MIN_INTERVAL_MILLIS = round(min_interval_movements * MOVE_INTERVAL * 1000)
+
+    random.seed(1)
+    runtime = SerializedObjectRuntime()
+    drivers: list[dict[str, Any]] = []
+    for i in range(DRIVERS):
+        driver_id, order_id = f"driver-{i}", f"order-{i}"
+        location, restaurant, customer = geo.random_location(), geo.random_location(), geo.random_location()
+        runtime.context(delivery_manager.start, order_id).set(delivery_manager.DELIVERY_INFO, {
+            "order_id": order_id,
+            "restaurant_id": "restaurant-1",
+            "restaurant_location": restaurant,
+            "customer_location": customer,
+            "order_picked_up": False,
+            "restaurant_to_customer_eta_millis": geo.calculate_eta_millis(restaurant, customer),
+        }, serde=DELIVERY_INFORMATION_SERDE)
+        twin = runtime.context(driver_digital_twin.assign_delivery_job, driver_id)
+        twin.set(driver_digital_twin.DRIVER_STATUS, DriverStatus.WAITING_FOR_WORK)
+        twin.set(driver_digital_twin.DRIVER_LOCATION, location, serde=LOCATION_SERDE)
+        runtime.send(driver_digital_twin.assign_delivery_job, driver_id, {
+            "delivery_id": order_id,
+            "restaurant_id": "restaurant-1",
+            "restaurant_location": restaurant,
+            "customer_location": customer,
+        })
+        drivers.append({"id": driver_id, "order_id": order_id, "location": location, "picked_up": False,
+                        "restaurant": restaurant, "customer": customer})
+    await runtime.drain()
+
+    runtime.invocations.clear()
+    movements = 0
+    eta_errors = []
+    moving = drivers
+    while moving:
+        await asyncio.sleep(MOVE_INTERVAL)
+        for driver in moving:
+            target = driver["customer"] if driver["picked_up"] else driver["restaurant"]
+            driver["location"], arrived = update_location(driver["location"], target)
+            if arrived and not driver["picked_up"]:
+                driver["picked_up"] = True
+                delivery = runtime.context(delivery_manager.start, driver["order_id"])
+                info = await delivery.get(delivery_manager.DELIVERY_INFO, serde=DELIVERY_INFORMATION_SERDE)
+                assert info is not None
+                delivery.set(delivery_manager.DELIVERY_INFO, {**info, "order_picked_up": True},
+                             serde=DELIVERY_INFORMATION_SERDE)
+            driver["done"] = arrived and target is driver["customer"]
+            runtime.send(driver_digital_twin.handle_driver_location_update_event, driver["id"], driver["location"])
+            movements += 1
+        await runtime.drain()
+
+        for driver in moving:
+            eta = geo.calculate_eta_millis(driver["location"], driver["customer"]) if driver["picked_up"] else \
+                geo.calculate_eta_millis(driver["location"], driver["restaurant"]) + \
+                geo.calculate_eta_millis(driver["restaurant"], driver["customer"])
+            shown_eta = await runtime.context(order_status.set_eta, driver["order_id"]).get("eta")
+            if shown_eta is not None:
+                eta_errors.append(abs(eta - shown_eta))
+        moving = [driver for driver in moving if not driver["done"]]
+    runtime.close()
+
+    print(f"{eta_threshold_millis:>13} | {min_interval_movements:>21} | {runtime.invocations.total() / movements:>24.2f}"
+          f" | {statistics.mean(eta_errors):>18.0f}")
+
+
+async def main():
+    print(f"{DRIVERS} drivers, each moving from a random location to a restaurant and on to the customer")
+    print(f"{'eta threshold':>13} | {'min interval (moves)':>21} | {'invocations / movement':>24}"
+          f" | {'mean eta error ms':>18}")
+    for eta_threshold_millis, min_interval_movements in CONFIGURATIONS:
+        await measure(eta_threshold_millis, min_interval_movements)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
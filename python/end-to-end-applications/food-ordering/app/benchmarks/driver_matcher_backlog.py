@@ -0,0 +1,117 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Size of the driver matcher's backlog of deliveries waiting for a driver when orders keep coming in faster than
+# the drivers deliver them, without limits, with a TTL for waiting deliveries, and with a TTL and a maximum backlog
+# per region, for which the order workflow holds back new deliveries.
+# Runs the order workflow, delivery manager, driver matcher and digital twins on the emulated Restate context,
+# with the drivers driven by the fleet simulator (ordering/external/fleet_sim.py) on the virtual clock.
+#
+# Run from the app directory: python -m benchmarks.driver_matcher_backlog
+
+import asyncio
+import contextlib
+import os
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+import ordering.delivery_admission as delivery_admission
+import ordering.driver_matcher as driver_matcher
+import ordering.external.fleet_sim as fleet_sim
+import ordering.order_workflow as order_workflow
+from ordering.external.driver_mobile_app_sim import MOVE_INTERVAL
+from ordering.utils.state_queue import StateQueue
+from benchmarks.order_lifecycle import BenchmarkRestaurant
+from benchmarks.order_stacking import fleet_simulator
+from benchmarks.state_context import SerializedObjectRuntime
+
+DRIVERS = 10
+ORDERS_PER_MINUTE = 60
+SIMULATED_TIME = timedelta(minutes=30)
+# (name, pending delivery TTL, max backlog per region)
+SETTINGS = [
+    ("unbounded", timedelta(0), 0),
+    ("ttl 5 min", timedelta(minutes=5), 0),
+    ("ttl 5 min, max 64", timedelta(minutes=5), 64),
+]
+
+
+async def backlog_size(runtime):
+    return sum([await StateQueue(ctx, driver_matcher.PENDING_DELIVERIES).size()
+                for (service, _), ctx in runtime.contexts.items() if service == "driver-delivery-matcher"])
+
+
+def state_bytes(runtime: SerializedObjectRuntime, service: str) -> int:
+    return sum(len(key) + len(value) for (name, _), ctx in runtime.contexts.items() if name == service
+               for key, value in ctx.state.items())
+
+
+async def measure(name: str, ttl: timedelta, max_backlog: int):
+    random.seed(DRIVERS)
+    driver_matcher.PENDING_DELIVERY_TTL = ttl
+    driver_matcher.MAX_BACKLOG = max_backlog
+
+    runtime = SerializedObjectRuntime()
+    order_workflow.restaurant_client = BenchmarkRestaurant(runtime)  # type: ignore
+    # The matcher stamps and expires the waiting deliveries with the virtual clock
+    driver_matcher.now_millis = lambda: round(runtime.now * 1000)  # type: ignore
+    simulator = fleet_simulator(runtime, fleet_sim.Fleet.random(DRIVERS, prefix="driver-"))
+    await simulator.start()
+    await runtime.drain()
+    runtime.reset_metrics()
+
+    orders = 0
+    orders_due = 0.0
+    peak_backlog = 0
+    start = time.perf_counter()
+    # The payment client logs every payment
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(int(SIMULATED_TIME / MOVE_INTERVAL)):
+            orders_due += ORDERS_PER_MINUTE * MOVE_INTERVAL.total_seconds() / 60
+            while orders_due >= 1:
+                orders_due -= 1
+                runtime.send(order_workflow.run, f"order-{orders}", {
+                    "id": f"order-{orders}",
+                    "restaurant_id": "restaurant-1",
+                    "products": [{"product_id": "pizza", "description": "Pizza", "quantity": 1}],
+                    "total_cost": 10,
+                    "delivery_delay": 0,
+                })
+                orders += 1
+            await runtime.run_for(MOVE_INTERVAL)
+            await simulator.tick()
+            await runtime.drain()
+            peak_backlog = max(peak_backlog, await backlog_size(runtime))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(runtime.context(order_workflow.run, f"order-{i}").state.get("status") for i in range(orders))
+    delivered, rejected = statuses[b'"DELIVERED"'], statuses[b'"REJECTED"']
+    # Waiting for a driver, or held back before asking for one
+    waiting = statuses[b'"SCHEDULING_DELIVERY"']
+    backlog = await backlog_size(runtime)
+    matcher_bytes = state_bytes(runtime, "driver-delivery-matcher")
+    runtime.close()
+
+    print(f"{name:>17} | {delivered:>9} | {rejected:>8} | {waiting:>14} | {peak_backlog:>12} | {backlog:>11}"
+          f" | {matcher_bytes / 1024:>15.1f} | {len(runtime.errors):>6} | {elapsed:>5.1f}")
+
+
+async def main():
+    print(f"{DRIVERS} drivers, {ORDERS_PER_MINUTE} orders per minute, {SIMULATED_TIME.total_seconds() / 60:.0f} minutes, "
+          f"admission retry every {delivery_admission.ADMISSION_RETRY_INTERVAL.total_seconds():.0f} s")
+    print(f"{'setting':>17} | {'delivered':>9} | {'rejected':>8} | {'waiting':>14} | {'peak backlog':>12}"
+          f" | {'end backlog':>11} | {'matcher state KiB':>15} | {'failed':>6} | {'s':>5}")
+    for name, ttl, max_backlog in SETTINGS:
+        await measure(name, ttl, max_backlog)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
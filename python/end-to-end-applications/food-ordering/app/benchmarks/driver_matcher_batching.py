@@ -0,0 +1,103 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Compares the greedy "fifo" matching with the windowed "batch" matching of the driver matcher, under high load.
+# Deliveries and available drivers arrive at random locations in the region, at the same rate,
+# and with more drivers than deliveries so that drivers wait in the queue.
+# Reports the mean ETA of the drivers to the restaurants, the mean time a delivery waits for its driver,
+# the 99th percentile of the time an assigned driver waited for its delivery, and the state writes per match.
+#
+# Run from the app directory: python -m benchmarks.driver_matcher_batching
+
+import asyncio
+import random
+import statistics
+
+import ordering.driver_matcher as driver_matcher
+from ordering.types.types import DEMO_REGION, Location
+from ordering.utils import geo
+from benchmarks.state_context import InMemoryObjectContext
+
+ARRIVALS_PER_SECOND = 50
+DRIVERS_PER_SECOND = [50, 55]
+DURATION_SECONDS = 600
+
+
+async def simulate(mode: str, drivers_per_second: int):
+    driver_matcher.MATCHING_MODE = mode
+    random.seed(42)
+    ctx = InMemoryObjectContext(driver_matcher.shard_key(DEMO_REGION, None))
+
+    # Poisson arrivals of deliveries and drivers, merged in time order
+    events: list[tuple[float, str, int]] = []
+    for kind, rate in [("delivery", ARRIVALS_PER_SECOND), ("driver", drivers_per_second)]:
+        t = 0.0
+        while t < DURATION_SECONDS:
+            t += random.expovariate(rate)
+            events.append((t, kind, len(events)))
+    events.sort()
+
+    batch_window = driver_matcher.BATCH_WINDOW.total_seconds()
+    next_batch = batch_window
+    requested_at: dict[str, float] = {}
+    restaurants: dict[str, Location] = {}
+    drivers: dict[str, Location] = {}
+    available_at: dict[str, float] = {}
+    pickup_etas: list[float] = []
+    waiting_times: list[float] = []
+    driver_waiting_times: list[float] = []
+
+    async def collect(now: float):
+        for promise_id, driver_id in ctx.resolved_awakeables.items():
+            pickup_etas.append(geo.calculate_eta_millis(drivers[driver_id], restaurants[promise_id]))
+            waiting_times.append(now - requested_at[promise_id])
+            driver_waiting_times.append(now - available_at[driver_id])
+        ctx.resolved_awakeables.clear()
+
+    for t, kind, i in events:
+        while mode == "batch" and next_batch <= t:
+            await driver_matcher.assign_batch(ctx)
+            await collect(next_batch)
+            next_batch += batch_window
+
+        if kind == "delivery":
+            promise_id = f"delivery-{i}"
+            requested_at[promise_id], restaurants[promise_id] = t, geo.random_location()
+            await driver_matcher.request_driver_for_delivery(ctx, {
+                "promise_id": promise_id,
+                "restaurant_location": restaurants[promise_id],
+            })
+        else:
+            driver_id = f"driver-{i}"
+            drivers[driver_id], available_at[driver_id] = geo.random_location(), t
+            await driver_matcher.set_driver_available(ctx, {"driver_id": driver_id, "location": drivers[driver_id]})
+        await collect(t)
+
+    driver_waiting_times.sort()
+    driver_wait_p99 = driver_waiting_times[int(len(driver_waiting_times) * 0.99)]
+    print(f"{drivers_per_second:>15} | {mode:>6} | {len(pickup_etas):>8} | {statistics.mean(pickup_etas) / 1000:>10.2f} s"
+          f" | {statistics.mean(waiting_times):>10.2f} s | {driver_wait_p99:>13.2f} s"
+          f" | {ctx.state_writes / len(pickup_etas):>16.2f}")
+
+
+async def main():
+    # A single matcher object for the whole region
+    driver_matcher.SHARDS_PER_SIDE = 1
+
+    print(f"{ARRIVALS_PER_SECOND} deliveries per second, "
+          f"batch window {driver_matcher.BATCH_WINDOW.total_seconds()} s")
+    print(f"{'drivers per sec':>15} | {'mode':>6} | {'matches':>8} | {'pickup ETA':>12} | {'waiting time':>12}"
+          f" | {'driver wait p99':>15} | {'writes per match':>16}")
+    for drivers_per_second in DRIVERS_PER_SECOND:
+        for mode in ["fifo", "batch"]:
+            await simulate(mode, drivers_per_second)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
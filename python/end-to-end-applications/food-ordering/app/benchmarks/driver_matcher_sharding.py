@@ -0,0 +1,77 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Load test of the driver matcher for an increasing number of shards per region.
+# Restate runs the invocations for one object key one after the other, so with a single matcher object
+# the matching throughput of a region is bounded by the latency of one invocation.
+# The load test sends a burst of delivery requests to a region with enough available drivers,
+# and to a region with far fewer drivers than deliveries, where most requests find no driver.
+# Reports the delivery requests handled per second and the number of matcher invocations per request,
+# with the default overflow to the adjacent shards and with overflow to the whole region.
+#
+# Run from the app directory: python -m benchmarks.driver_matcher_sharding
+
+import asyncio
+import random
+import time
+
+import ordering.driver_matcher as driver_matcher
+from ordering.types.types import DEMO_REGION
+from ordering.utils import geo
+from benchmarks.state_context import SerializedObjectRuntime
+
+INVOCATION_LATENCY = 0.001
+DELIVERIES = 4_000
+# (scenario, available drivers)
+SCENARIOS = [("plentiful", 8_000), ("scarce", 400)]
+SHARDS_PER_SIDE = [1, 2, 4, 8]
+DEFAULT_OVERFLOW_RINGS = driver_matcher.OVERFLOW_RINGS
+
+
+async def load_test(scenario: str, drivers: int, shards_per_side: int, overflow_rings: int):
+    driver_matcher.SHARDS_PER_SIDE = shards_per_side
+    driver_matcher.OVERFLOW_RINGS = overflow_rings
+    random.seed(42)
+    runtime = SerializedObjectRuntime(INVOCATION_LATENCY)
+
+    for i in range(drivers):
+        location = geo.random_location()
+        runtime.send(driver_matcher.set_driver_available, driver_matcher.shard_key(DEMO_REGION, location),
+                     {"driver_id": f"driver-{i}", "location": location})
+    await runtime.drain()
+    runtime.invocations.clear()
+
+    start = time.perf_counter()
+    for i in range(DELIVERIES):
+        restaurant_location = geo.random_location()
+        runtime.send(driver_matcher.request_driver_for_delivery,
+                     driver_matcher.shard_key(DEMO_REGION, restaurant_location),
+                     {"promise_id": f"delivery-{i}", "restaurant_location": restaurant_location})
+    await runtime.drain()
+    duration = time.perf_counter() - start
+    runtime.close()
+
+    matched = len(runtime.resolved_awakeables)
+    print(f"{scenario:>9} | {shards_per_side ** 2:>6} | {overflow_rings:>14} | {matched:>7} | {DELIVERIES / duration:>10.0f} /s"
+          f" | {runtime.invocations.total() / DELIVERIES:>22.2f}")
+
+
+async def main():
+    print(f"{DELIVERIES} deliveries, {INVOCATION_LATENCY * 1000:.0f} ms per invocation")
+    print(f"{'drivers':>9} | {'shards':>6} | {'overflow rings':>14} | {'matched':>7} | {'requests / s':>13}"
+          f" | {'invocations / request':>22}")
+    for scenario, drivers in SCENARIOS:
+        for shards_per_side in SHARDS_PER_SIDE:
+            rings = [min(DEFAULT_OVERFLOW_RINGS, shards_per_side - 1), shards_per_side - 1]
+            for overflow_rings in sorted(set(rings)):
+                await load_test(scenario, drivers, shards_per_side, overflow_rings)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# State bytes read and written per driver matcher call, for a growing backlog of pending deliveries.
+# Compares the chunked StateQueue with the previous representation, a single list under one state key.
+#
+# Run from the app directory: python -m benchmarks.driver_matcher_state_bytes
+
+import asyncio
+
+import ordering.driver_matcher as driver_matcher
+from ordering.types.types import DEMO_REGION
+from ordering.utils.state_queue import StateQueue
+from benchmarks.state_context import InMemoryObjectContext
+
+BACKLOG_SIZES = [10, 1_000, 100_000]
+
+
+async def list_request_driver_for_delivery(ctx, request):
+    pending_deliveries = await ctx.get(driver_matcher.PENDING_DELIVERIES) or []
+    pending_deliveries.append(request)
+    ctx.set(driver_matcher.PENDING_DELIVERIES, pending_deliveries)
+
+
+async def list_set_driver_available(ctx, driver):
+    pending_deliveries = await ctx.get(driver_matcher.PENDING_DELIVERIES) or []
+    next_delivery = pending_deliveries.pop(0)
+    ctx.set(driver_matcher.PENDING_DELIVERIES, pending_deliveries)
+    ctx.resolve_awakeable(next_delivery["promise_id"], driver["driver_id"])
+
+
+def pending_delivery(i: int):
+    return {"promise_id": f"prom_1{i:040d}"}
+
+
+async def measure(backlog: int, request_driver, set_driver_available, fill) -> tuple[int, int]:
+    ctx = InMemoryObjectContext(driver_matcher.shard_key(DEMO_REGION, None))
+    await fill(ctx, backlog)
+
+    ctx.reset_counters()
+    await request_driver(ctx, pending_delivery(backlog))
+    enqueue_bytes = ctx.bytes_read + ctx.bytes_written
+
+    ctx.reset_counters()
+    await set_driver_available(ctx, {"driver_id": "driver-01", "location": None})
+    dequeue_bytes = ctx.bytes_read + ctx.bytes_written
+
+    return enqueue_bytes, dequeue_bytes
+
+
+async def fill_list(ctx, backlog: int):
+    ctx.set(driver_matcher.PENDING_DELIVERIES, [pending_delivery(i) for i in range(backlog)])
+
+
+async def fill_queue(ctx, backlog: int):
+    queue = StateQueue(ctx, driver_matcher.PENDING_DELIVERIES)
+    for i in range(backlog):
+        await queue.push(pending_delivery(i))
+
+
+async def main():
+    # A single matcher object for the whole region
+    driver_matcher.SHARDS_PER_SIDE = 1
+
+    print(f"{'backlog':>10} | {'list enqueue':>14} | {'list dequeue':>14} | {'queue enqueue':>14} | {'queue dequeue':>14}")
+    for backlog in BACKLOG_SIZES:
+        list_bytes = await measure(backlog, list_request_driver_for_delivery, list_set_driver_available, fill_list)
+        queue_bytes = await measure(backlog,
+                                    driver_matcher.request_driver_for_delivery,
+                                    driver_matcher.set_driver_available,
+                                    fill_queue)
+        print(f"{backlog:>10} | {list_bytes[0]:>12} B | {list_bytes[1]:>12} B | "
+              f"{queue_bytes[0]:>12} B | {queue_bytes[1]:>12} B")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Compares the "fifo" and "nearest" matching modes of the driver matcher.
+# A fleet of drivers is spread over the region. For every delivery, the matched driver drives to the restaurant
+# and then to the customer, where it becomes available again.
+# Reports the handler time per match and the simulated pickup and total delivery time.
+#
+# Run from the app directory: python -m benchmarks.driver_matching_modes
+
+import asyncio
+import random
+import statistics
+import time
+
+import ordering.driver_matcher as driver_matcher
+from ordering.types.types import DEMO_REGION
+from ordering.utils import geo
+from benchmarks.state_context import InMemoryObjectContext
+
+DRIVERS = 2_000
+DELIVERIES = 20_000
+
+
+async def simulate(mode: str):
+    driver_matcher.MATCHING_MODE = mode
+    random.seed(42)
+
+    ctx = InMemoryObjectContext(driver_matcher.shard_key(DEMO_REGION, None))
+    locations = {}
+    for i in range(DRIVERS):
+        driver_id = f"driver-{i}"
+        locations[driver_id] = geo.random_location()
+        await driver_matcher.set_driver_available(ctx, {"driver_id": driver_id, "location": locations[driver_id]})
+
+    match_latencies, pickup_etas, delivery_etas = [], [], []
+    for i in range(DELIVERIES):
+        promise_id = f"delivery-{i}"
+        restaurant_location, customer_location = geo.random_location(), geo.random_location()
+
+        start = time.perf_counter()
+        await driver_matcher.request_driver_for_delivery(ctx, {
+            "promise_id": promise_id,
+            "restaurant_location": restaurant_location,
+        })
+        match_latencies.append(time.perf_counter() - start)
+
+        driver_id = ctx.resolved_awakeables.pop(promise_id)
+        pickup_eta = geo.calculate_eta_millis(locations[driver_id], restaurant_location)
+        pickup_etas.append(pickup_eta)
+        delivery_etas.append(pickup_eta + geo.calculate_eta_millis(restaurant_location, customer_location))
+
+        locations[driver_id] = customer_location
+        await driver_matcher.set_driver_available(ctx, {"driver_id": driver_id, "location": customer_location})
+
+    print(f"{mode:>8} | {statistics.mean(match_latencies) * 1e6:>10.1f} us"
+          f" | {statistics.quantiles(match_latencies, n=100)[98] * 1e6:>10.1f} us"
+          f" | {statistics.mean(pickup_etas) / 1000:>10.1f} s"
+          f" | {statistics.mean(delivery_etas) / 1000:>10.1f} s")
+
+
+async def main():
+    # A single matcher object for the whole region
+    driver_matcher.SHARDS_PER_SIDE = 1
+
+    print(f"{DRIVERS} drivers, {DELIVERIES} deliveries")
+    print(f"{'mode':>8} | {'match mean':>13} | {'match p99':>13} | {'pickup mean':>12} | {'delivery mean':>12}")
+    for mode in ["fifo", "nearest"]:
+        await simulate(mode)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Invocations caused by idle drivers: the driver's mobile app polling its digital twin for work every second,
+# compared to the mobile app waiting on an awakeable that the digital twin resolves when it assigns a delivery.
+#
+# Run from the app directory: python -m benchmarks.driver_work_notification
+
+import asyncio
+from datetime import timedelta
+
+from restate import VirtualObject, ObjectContext
+
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.external.driver_mobile_app_sim as driver_mobile_app_sim
+from ordering.types.types import DEMO_REGION
+from benchmarks.state_context import SerializedObjectRuntime
+
+DRIVERS = 1_000
+IDLE_TIME = timedelta(minutes=1)
+POLL_INTERVAL = timedelta(milliseconds=1000)
+
+# The previous implementation of the mobile app, which polled the digital twin for work
+polling_mobile_app = VirtualObject("driver-mobile-app-polling")
+
+
+@polling_mobile_app.handler()
+async def poll_for_work(ctx: ObjectContext):
+    optional_assigned_delivery = await ctx.object_call(driver_digital_twin.get_assigned_delivery, ctx.key(), arg=None)
+    if optional_assigned_delivery is None:
+        ctx.object_send(poll_for_work, ctx.key(), arg=None, send_delay=POLL_INTERVAL)
+        return
+    ctx.set(driver_mobile_app_sim.ASSIGNED_DELIVERY, optional_assigned_delivery)
+
+
+async def measure(name: str, wait_for_work, time_to_notice: timedelta):
+    runtime = SerializedObjectRuntime()
+    for i in range(DRIVERS):
+        runtime.send(driver_digital_twin.set_driver_available, f"driver-{i}", DEMO_REGION)
+        runtime.send(wait_for_work, f"driver-{i}", None)
+    await runtime.drain()
+
+    runtime.invocations.clear()
+    await runtime.run_for(IDLE_TIME)
+    idle_invocations = runtime.invocations.total()
+
+    runtime.invocations.clear()
+    for i in range(DRIVERS):
+        runtime.send(driver_digital_twin.assign_delivery_job, f"driver-{i}", {
+            "delivery_id": f"delivery-{i}",
+            "restaurant_id": "restaurant-1",
+            "restaurant_location": {"long": 0.0, "lat": 0.0},
+            "customer_location": {"long": 0.01, "lat": 0.01},
+        })
+    # Only advance the clock until the mobile app can have noticed the assignment, before it starts moving
+    await runtime.run_for(time_to_notice)
+    assignment_invocations = runtime.invocations.total()
+    runtime.close()
+
+    print(f"{name:>8} | {idle_invocations / DRIVERS / IDLE_TIME.total_seconds():>28.2f}"
+          f" | {assignment_invocations / DRIVERS:>27.2f}")
+
+
+async def main():
+    print(f"{DRIVERS} idle drivers for {IDLE_TIME.total_seconds():.0f} s")
+    print(f"{'app':>8} | {'invocations / idle driver / s':>28} | {'invocations / assignment':>27}")
+    await measure("polling", poll_for_work, POLL_INTERVAL)
+    await measure("push", driver_mobile_app_sim.wait_for_work, timedelta(0))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Cost of reading the state of the whole fleet of a region: one call to its fleet aggregates object
+# (ordering/fleet_aggregates.py), compared to a call to the digital twin of every driver,
+# and the invocations that keeping the aggregates costs per delivered order.
+# Runs the order workflow, delivery manager, driver matcher and digital twins on the emulated Restate context,
+# with the drivers driven by the fleet simulator (ordering/external/fleet_sim.py) on the virtual clock.
+# Also checks that the aggregates match the state of the digital twins.
+#
+# Run from the app directory: python -m benchmarks.fleet_aggregates
+
+import asyncio
+import contextlib
+import os
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.external.fleet_sim as fleet_sim
+import ordering.fleet_aggregates as fleet_aggregates
+import ordering.order_workflow as order_workflow
+from ordering.external.driver_mobile_app_sim import MOVE_INTERVAL
+from ordering.types.types import DEMO_REGION
+from benchmarks.order_lifecycle import BenchmarkRestaurant
+from benchmarks.order_stacking import fleet_simulator
+from benchmarks.state_context import SerializedObjectRuntime
+
+DRIVERS = 500
+ORDERS_PER_MINUTE = 600
+SIMULATED_TIME = timedelta(minutes=5)
+
+
+def twin_aggregates(runtime: SerializedObjectRuntime, fleet: fleet_sim.Fleet) -> tuple[Counter, Counter]:
+    """The drivers by status, and the available drivers by heatmap cell, from the state of the digital twins."""
+    by_status: Counter = Counter()
+    by_cell: Counter = Counter()
+    for driver_id in fleet.driver_ids:
+        state = runtime.context(driver_digital_twin.set_driver_available, driver_id).state
+        status = state[driver_digital_twin.DRIVER_STATUS].decode().strip('"')
+        by_status[status] += 1
+        if status == "WAITING_FOR_WORK":
+            by_cell[state[driver_digital_twin.HEATMAP_CELL].decode().strip('"')] += 1
+    return by_status, by_cell
+
+
+async def main():
+    random.seed(DRIVERS)
+    fleet_aggregates.FLEET_AGGREGATES = True
+    runtime = SerializedObjectRuntime()
+    order_workflow.restaurant_client = BenchmarkRestaurant(runtime)  # type: ignore
+    fleet = fleet_sim.Fleet.random(DRIVERS, prefix="driver-")
+    simulator = fleet_simulator(runtime, fleet)
+    await simulator.start()
+    await runtime.drain()
+    runtime.reset_metrics()
+
+    orders = 0
+    orders_due = 0.0
+    # The payment client logs every payment
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(int(SIMULATED_TIME / MOVE_INTERVAL)):
+            orders_due += ORDERS_PER_MINUTE * MOVE_INTERVAL.total_seconds() / 60
+            while orders_due >= 1:
+                orders_due -= 1
+                runtime.send(order_workflow.run, f"order-{orders}", {
+                    "id": f"order-{orders}",
+                    "restaurant_id": "restaurant-1",
+                    "products": [{"product_id": "pizza", "description": "Pizza", "quantity": 1}],
+                    "total_cost": 10,
+                    "delivery_delay": 0,
+                })
+                orders += 1
+            await runtime.run_for(MOVE_INTERVAL)
+            await simulator.tick()
+            await runtime.drain()
+
+    delivered = sum(1 for i in range(orders)
+                    if runtime.context(order_workflow.run, f"order-{i}").state.get("status") == b'"DELIVERED"')
+    invocations = runtime.invocations.total()
+    status_changes = runtime.invocations["fleet-aggregates/count_status_change"]
+    by_status, by_cell = twin_aggregates(runtime, fleet)
+    print(f"{DRIVERS} drivers, {ORDERS_PER_MINUTE} orders per minute, {SIMULATED_TIME.total_seconds() / 60:.0f} minutes: "
+          f"{delivered} orders delivered, {dict(by_status)}")
+    print(f"keeping the aggregates: {status_changes} of {invocations} invocations ({status_changes / invocations:.1%}), "
+          f"{status_changes / max(delivered, 1):.1f} per delivered order, {len(runtime.errors)} failed invocations")
+    print()
+
+    print(f"{'read':>20} | {'invocations':>11} | {'ms':>7} | {'matches the twins':>17}")
+    runtime.reset_metrics()
+    start = time.perf_counter()
+    assigned = [await runtime.call(driver_digital_twin.get_assigned_delivery, driver_id, None)
+                for driver_id in fleet.driver_ids]
+    elapsed = time.perf_counter() - start
+    matches = sum(1 for delivery in assigned if delivery is not None) == by_status["DELIVERING"]
+    print(f"{'every digital twin':>20} | {runtime.invocations.total():>11} | {elapsed * 1000:>7.1f} | {str(matches):>17}")
+
+    runtime.reset_metrics()
+    start = time.perf_counter()
+    aggregates = await runtime.call(fleet_aggregates.get_fleet, DEMO_REGION, None)
+    elapsed = time.perf_counter() - start
+    matches = aggregates["drivers_by_status"] == dict(by_status) and \
+        aggregates["available_drivers_by_cell"] == dict(by_cell)
+    print(f"{'fleet aggregates':>20} | {runtime.invocations.total():>11} | {elapsed * 1000:>7.1f} | {str(matches):>17}")
+    runtime.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Cost of simulating fleets of drivers with the fleet simulator (ordering/external/fleet_sim.py),
+# compared to the invocations that the mobile app simulator needs for the same movements:
+# one move invocation per moving driver per tick, on top of the requests for the pickups, deliveries and new work.
+# Every driver gets a new delivery as soon as it waits for work, so that the whole fleet keeps moving.
+# The location updates and requests to Restate are only counted, not sent.
+# Also checks that the fleet moves the drivers like update_location does.
+#
+# Run from the app directory: python -m benchmarks.fleet_sim
+
+import asyncio
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+from ordering.external.fleet_sim import Fleet, FleetSimulator, TO_CUSTOMER, TO_RESTAURANT
+from ordering.external.location_utils import update_location
+from ordering.utils import geo
+
+FLEET_SIZES = [1_000, 10_000, 100_000]
+TICKS = 60
+
+
+def expected_moves(fleet: Fleet) -> tuple[np.ndarray, list[tuple[float, float, bool]]]:
+    """The drivers that move in the next tick, and where update_location moves them one by one."""
+    moving = np.flatnonzero((fleet.phases == TO_RESTAURANT) | (fleet.phases == TO_CUSTOMER))
+    expected = []
+    for i in moving.tolist():
+        target = fleet.customers[i] if fleet.phases[i] == TO_CUSTOMER else fleet.restaurants[i]
+        location, arrived = update_location(geo.Location(long=fleet.locations[i][0], lat=fleet.locations[i][1]),
+                                            geo.Location(long=target[0], lat=target[1]))
+        expected.append((location["long"], location["lat"], arrived))
+    return moving, expected
+
+
+async def measure(size: int, check: bool):
+    random.seed(size)
+    fleet = Fleet.random(size)
+    location_updates = 0
+    requests: Counter = Counter()
+
+    async def publish(locations):
+        nonlocal location_updates
+        location_updates += len(locations)
+
+    async def send(handler, driver_id, arg):
+        requests[handler] += 1
+        # The driver matcher would assign the driver a delivery
+        if handler == "driver-fleet-sim/wait_for_work":
+            fleet.assign(driver_id, {
+                "delivery_id": f"delivery-{driver_id}-{fleet.ticks}",
+                "restaurant_id": "restaurant-1",
+                "restaurant_location": geo.random_location(),
+                "customer_location": geo.random_location(),
+            })
+
+    async def call(handler, driver_id, arg):
+        await send(handler, driver_id, arg)
+
+    simulator = FleetSimulator(fleet, publish, send, call)
+    await simulator.start()
+    location_updates = 0
+    requests.clear()
+
+    moved = 0
+    elapsed = 0.0
+    for _ in range(TICKS):
+        if check:
+            moving, expected = expected_moves(fleet)
+        start = time.perf_counter()
+        tick = await simulator.tick()
+        elapsed += time.perf_counter() - start
+        moved += len(tick.moved)
+        if check:
+            assert np.array_equal(tick.moved, moving)
+            assert np.array_equal(fleet.locations[moving], np.array([e[:2] for e in expected]).reshape(-1, 2))
+            arrived = np.array([e[2] for e in expected], dtype=bool)
+            assert np.array_equal(np.union1d(tick.picked_up, tick.delivered), moving[arrived])
+
+    fleet_requests = requests.total()
+    # The mobile app simulator makes the same requests, plus one move invocation per moving driver
+    mobile_app_invocations = moved + fleet_requests
+    print(f"{size:>7} | {elapsed / TICKS * 1000:>7.1f} | {location_updates / TICKS:>19.0f}"
+          f" | {fleet_requests / TICKS:>19.0f} | {mobile_app_invocations / TICKS:>27.0f}")
+
+
+async def main():
+    print(f"{TICKS} ticks, every driver always has a delivery")
+    print(f"{'drivers':>7} | {'ms/tick':>7} | {'location updates/tick':>19} | {'fleet requests/tick':>19}"
+          f" | {'mobile app invocations/tick':>27}")
+    for size in FLEET_SIZES:
+        await measure(size, check=size == FLEET_SIZES[0])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Time to compute the ETA and the next movement step of many driver-target pairs,
+# one Location at a time compared to the batch functions over packed float arrays.
+# Also checks that both give the same results, bit for bit.
+#
+# Run from the app directory: python -m benchmarks.geo_batch
+
+import random
+import time
+
+import numpy as np
+
+from ordering.external.location_utils import update_location, update_locations_batch
+from ordering.utils import geo
+
+PAIRS = [1_000, 100_000, 1_000_000]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def measure(pairs: int):
+    random.seed(pairs)
+    drivers = [geo.random_location() for _ in range(pairs)]
+    # Some drivers are within one step of, or at, their target
+    targets = [geo.random_location() if i % 10 else
+               geo.Location(long=driver["long"] + geo.step() / 2, lat=driver["lat"])
+               for i, driver in enumerate(drivers)]
+    targets[0] = drivers[0]
+
+    # Packing is part of the batch cost, unless the caller already keeps the locations packed
+    (driver_points, target_points), pack_time = timed(lambda: (geo.pack_locations(drivers), geo.pack_locations(targets)))
+
+    scalar_etas, scalar_eta_time = timed(lambda: [geo.calculate_eta_millis(d, t) for d, t in zip(drivers, targets)])
+    batch_etas, batch_eta_time = timed(lambda: geo.calculate_eta_millis_batch(driver_points, target_points))
+    assert np.array_equal(np.array(scalar_etas), batch_etas)
+
+    scalar_steps, scalar_step_time = timed(lambda: [update_location(d, t) for d, t in zip(drivers, targets)])
+    (batch_points, batch_arrived), batch_step_time = timed(lambda: update_locations_batch(driver_points, target_points))
+    assert np.array_equal(geo.pack_locations([location for location, _ in scalar_steps]), batch_points)
+    assert np.array_equal(np.array([arrived for _, arrived in scalar_steps]), batch_arrived)
+
+    print(f"{pairs:>9} | {'eta':>5} | {scalar_eta_time * 1000:>10.2f} | {batch_eta_time * 1000:>9.2f}"
+          f" | {scalar_eta_time / batch_eta_time:>8.0f}x")
+    print(f"{pairs:>9} | {'step':>5} | {scalar_step_time * 1000:>10.2f} | {batch_step_time * 1000:>9.2f}"
+          f" | {scalar_step_time / batch_step_time:>8.0f}x")
+    print(f"{pairs:>9} | {'pack':>5} | {'':>10} | {pack_time * 1000:>9.2f} |")
+
+
+def main():
+    print(f"{'pairs':>9} | {'':>5} | {'scalar ms':>10} | {'batch ms':>9} | {'speedup':>9}")
+    for pairs in PAIRS:
+        measure(pairs)
+
+
+if __name__ == "__main__":
+    main()
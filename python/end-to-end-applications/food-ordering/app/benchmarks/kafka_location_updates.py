@@ -0,0 +1,116 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Throughput of sending driver location updates to Kafka from concurrent async handlers:
+# blocking on every record (the previous implementation) compared to awaiting the acknowledgement of batched records.
+# A fake producer stands in for the broker: like the KafkaProducer, it collects the records on a sender thread
+# for up to linger_ms, and acknowledges every batch after a fixed broker round trip.
+#
+# Run from the app directory: python -m benchmarks.kafka_location_updates
+
+import asyncio
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from kafka.future import Future
+
+from ordering.clients.async_producer import AsyncProducer
+
+HANDLERS = 1_000
+UPDATES_PER_HANDLER = 10
+BROKER_ROUND_TRIP = 0.002
+LINGER = 0.005
+BATCH_SIZE = 500
+
+RecordMetadata = namedtuple("RecordMetadata", ["topic", "offset"])
+
+
+class FakeRecordFuture(Future):
+    def get(self, timeout=None):
+        done = threading.Event()
+        self.add_both(lambda _: done.set())
+        done.wait(timeout)
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+class FakeProducer:
+    def __init__(self):
+        self.records: queue.Queue = queue.Queue()
+        self.batches = 0
+        self.sender = threading.Thread(target=self._send_batches, daemon=True)
+        self.sender.start()
+
+    def send(self, topic, key=None, value=None):
+        future = FakeRecordFuture()
+        self.records.put((topic, future))
+        return future
+
+    def flush(self, timeout=None):
+        while not self.records.empty():
+            time.sleep(LINGER)
+
+    def close(self, timeout=None):
+        pass
+
+    def _send_batches(self):
+        offset = 0
+        while True:
+            batch = [self.records.get()]
+            deadline = time.monotonic() + LINGER
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.records.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            time.sleep(BROKER_ROUND_TRIP)
+            self.batches += 1
+            for topic, future in batch:
+                future.success(RecordMetadata(topic, offset))
+                offset += 1
+
+
+async def blocking_handler(producer: FakeProducer):
+    for _ in range(UPDATES_PER_HANDLER):
+        producer.send("driver-updates", key="driver", value={}).get(timeout=10)
+
+
+async def async_handler(producer: AsyncProducer):
+    for _ in range(UPDATES_PER_HANDLER):
+        await producer.send("driver-updates", key="driver", value={})
+
+
+async def measure(name: str, handler, producer, fake_producer: FakeProducer):
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(producer) for _ in range(HANDLERS)))
+    elapsed = time.perf_counter() - start
+
+    updates = HANDLERS * UPDATES_PER_HANDLER
+    print(f"{name:>8} | {updates / elapsed:>15.0f} | {updates / fake_producer.batches:>16.1f}")
+
+
+async def main():
+    print(f"{HANDLERS} concurrent handlers sending {UPDATES_PER_HANDLER} location updates each, "
+          f"{BROKER_ROUND_TRIP * 1000:.0f} ms broker round trip, {LINGER * 1000:.0f} ms linger")
+    print(f"{'producer':>8} | {'updates / s':>15} | {'updates / batch':>16}")
+
+    fake_producer = FakeProducer()
+    await measure("blocking", blocking_handler, fake_producer, fake_producer)
+
+    fake_producer = FakeProducer()
+    async_producer = AsyncProducer(fake_producer, max_in_flight=10_000)
+    await measure("async", async_handler, async_producer, fake_producer)
+    async_producer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Cost of every handler along the lifecycle of an order, from order_workflow.run to the delivery,
+# run in-process with the emulated Restate context of benchmarks/state_context.py.
+# The restaurant answers every preparation request after PREPARATION_TIME of virtual time,
+# and the drivers report the pickup and delivery right after being assigned, instead of moving.
+#
+# Run from the app directory: python -m benchmarks.order_lifecycle [orders]
+
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from datetime import timedelta
+
+import ordering.delivery_manager as delivery_manager
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.driver_matcher as driver_matcher
+import ordering.order_workflow as order_workflow
+from ordering.types.serde import LOCATION_SERDE
+from ordering.types.types import DEMO_REGION
+from ordering.utils import geo
+from benchmarks.state_context import SerializedObjectRuntime
+
+ORDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+PREPARATION_TIME = timedelta(seconds=5)
+
+
+class BenchmarkRestaurant:
+    """Restaurant POS that calls back the workflow after the preparation time, like restaurant/app.py does."""
+
+    def __init__(self, runtime: SerializedObjectRuntime):
+        self.runtime = runtime
+
+    async def prepare(self, order_id: str) -> None:
+        self.runtime.send(order_workflow.finished_preparation, order_id, None, PREPARATION_TIME)
+
+
+def delivering(runtime: SerializedObjectRuntime) -> list[str]:
+    """The drivers that have a delivery assigned."""
+    return [f"driver-{i}" for i in range(ORDERS)
+            if runtime.context(driver_digital_twin.notify_delivery_pickup, f"driver-{i}").state.get(
+                driver_digital_twin.DRIVER_STATUS) == b'"DELIVERING"']
+
+
+async def main():
+    runtime = SerializedObjectRuntime()
+    order_workflow.restaurant_client = BenchmarkRestaurant(runtime)  # type: ignore
+
+    for i in range(ORDERS):
+        runtime.context(driver_digital_twin.set_driver_available, f"driver-{i}").set(
+            driver_digital_twin.DRIVER_LOCATION, geo.random_location(), serde=LOCATION_SERDE)
+        runtime.send(driver_digital_twin.set_driver_available, f"driver-{i}", DEMO_REGION)
+    await runtime.drain()
+    runtime.reset_metrics()
+
+    start = time.perf_counter()
+    # The payment client logs every payment
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(ORDERS):
+            runtime.send(order_workflow.run, f"order-{i}", {
+                "id": f"order-{i}",
+                "restaurant_id": "restaurant-1",
+                "products": [{"product_id": "pizza", "description": "Pizza", "quantity": 1}],
+                "total_cost": 10,
+                "delivery_delay": 0,
+            })
+        await runtime.run_for(PREPARATION_TIME)
+
+        for driver_id in delivering(runtime):
+            runtime.send(driver_digital_twin.notify_delivery_pickup, driver_id, None)
+        await runtime.drain()
+        # With MAX_STACKED_DELIVERIES, a driver delivers all the orders it picked up one after the other
+        while drivers := delivering(runtime):
+            for driver_id in drivers:
+                runtime.send(driver_digital_twin.notify_delivery_delivered, driver_id, None)
+            await runtime.drain()
+    elapsed = time.perf_counter() - start
+    runtime.close()
+
+    delivered = sum(1 for i in range(ORDERS) if runtime.context(order_workflow.run, f"order-{i}").state.get("status")
+                    == b'"DELIVERED"')
+    invocations = runtime.invocations.total()
+    print(f"{ORDERS} orders, {delivered} delivered, {len(runtime.errors)} failed invocations, "
+          f"matching mode {driver_matcher.MATCHING_MODE}")
+    print(f"{invocations} invocations in {elapsed:.1f} s ({invocations / elapsed:.0f} / s), "
+          f"{invocations / ORDERS:.1f} per order")
+    print()
+    print(runtime.report())
+    if runtime.errors:
+        handler, error = runtime.errors[0]
+        print(f"\nFirst failure in {handler}: {error!r}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Deliveries per driver-hour when a driver on its way to a restaurant takes up to MAX_STACKED_DELIVERIES orders
+# of that restaurant, compared to one driver per order.
+# Runs the order workflow, delivery manager, driver matcher and digital twins on the emulated Restate context,
+# with the drivers driven by the fleet simulator (ordering/external/fleet_sim.py) on the virtual clock.
+# Orders come in at ORDERS_PER_MINUTE, spread over RESTAURANTS restaurants: more than the drivers deliver one by one,
+# so that the orders that are still open at the end show how far the drivers fell behind.
+#
+# Run from the app directory: python -m benchmarks.order_stacking
+
+import asyncio
+import contextlib
+import os
+import random
+import time
+from datetime import timedelta
+
+import ordering.delivery_manager as delivery_manager
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.driver_matcher as driver_matcher
+import ordering.external.fleet_sim as fleet_sim
+import ordering.order_workflow as order_workflow
+from ordering.external.driver_mobile_app_sim import MOVE_INTERVAL
+from benchmarks.order_lifecycle import BenchmarkRestaurant
+from benchmarks.state_context import SerializedObjectRuntime
+
+DRIVERS = 50
+RESTAURANTS = 10
+ORDERS_PER_MINUTE = 250
+SIMULATED_TIME = timedelta(minutes=20)
+STACK_SIZES = [1, 2, 3, 4]
+
+HANDLERS = {
+    "driver-digital-twin/set_driver_available": driver_digital_twin.set_driver_available,
+    "driver-digital-twin/notify_delivery_pickup": driver_digital_twin.notify_delivery_pickup,
+    "driver-digital-twin/notify_delivery_delivered": driver_digital_twin.notify_delivery_delivered,
+    "driver-fleet-sim/wait_for_work": fleet_sim.wait_for_work,
+}
+
+
+def fleet_simulator(runtime: SerializedObjectRuntime, fleet: fleet_sim.Fleet) -> fleet_sim.FleetSimulator:
+    """Fleet simulator that sends its requests to the emulated runtime, and gets its deliveries in-process."""
+
+    async def forward_delivery(driver_id, delivery):
+        fleet.assign(driver_id, delivery)
+
+    # The fleet runs in-process, instead of receiving its deliveries over HTTP
+    fleet_sim.forward_delivery = forward_delivery  # type: ignore
+
+    async def publish(locations):
+        for driver_id, location in locations:
+            runtime.send(driver_digital_twin.handle_driver_location_update_event, driver_id, location)
+
+    async def send(handler, driver_id, arg):
+        runtime.send(HANDLERS[handler], driver_id, arg)
+
+    async def call(handler, driver_id, arg):
+        return await runtime.call(HANDLERS[handler], driver_id, arg)
+
+    return fleet_sim.FleetSimulator(fleet, publish, send, call)
+
+
+async def measure(max_stacked_deliveries: int):
+    random.seed(DRIVERS)
+    driver_matcher.MAX_STACKED_DELIVERIES = max_stacked_deliveries
+    # The same restaurant locations for every stack size
+    delivery_manager.FIXED_RESTAURANT_LOCATIONS = True
+
+    runtime = SerializedObjectRuntime()
+    order_workflow.restaurant_client = BenchmarkRestaurant(runtime)  # type: ignore
+    simulator = fleet_simulator(runtime, fleet_sim.Fleet.random(DRIVERS, prefix="driver-"))
+    await simulator.start()
+    await runtime.drain()
+    runtime.reset_metrics()
+
+    ordered_at: dict[str, float] = {}
+    delivery_minutes: list[float] = []
+    orders = 0
+    orders_due = 0.0
+    start = time.perf_counter()
+    # The payment client logs every payment
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(int(SIMULATED_TIME / MOVE_INTERVAL)):
+            orders_due += ORDERS_PER_MINUTE * MOVE_INTERVAL.total_seconds() / 60
+            while orders_due >= 1:
+                orders_due -= 1
+                order_id = f"order-{orders}"
+                orders += 1
+                ordered_at[order_id] = runtime.now
+                runtime.send(order_workflow.run, order_id, {
+                    "id": order_id,
+                    "restaurant_id": f"restaurant-{random.randrange(RESTAURANTS)}",
+                    "products": [{"product_id": "pizza", "description": "Pizza", "quantity": 1}],
+                    "total_cost": 10,
+                    "delivery_delay": 0,
+                })
+            await runtime.run_for(MOVE_INTERVAL)
+            await simulator.tick()
+            await runtime.drain()
+
+            for order_id in [order_id for order_id in ordered_at
+                             if runtime.context(order_workflow.run, order_id).state.get("status") == b'"DELIVERED"']:
+                delivery_minutes.append((runtime.now - ordered_at.pop(order_id)) / 60)
+    elapsed = time.perf_counter() - start
+    runtime.close()
+
+    delivered = len(delivery_minutes)
+    driver_hours = DRIVERS * SIMULATED_TIME.total_seconds() / 3600
+    print(f"{max_stacked_deliveries:>11} | {delivered:>9} | {delivered / driver_hours:>24.1f}"
+          f" | {sum(delivery_minutes) / max(delivered, 1):>20.1f} | {runtime.invocations.total() / max(delivered, 1):>20.0f}"
+          f" | {len(ordered_at):>4} | {len(runtime.errors):>6} | {elapsed:>5.1f}")
+
+
+async def main():
+    print(f"{DRIVERS} drivers, {ORDERS_PER_MINUTE} orders per minute from {RESTAURANTS} restaurants, "
+          f"{SIMULATED_TIME.total_seconds() / 60:.0f} minutes")
+    print(f"{'max stacked':>11} | {'delivered':>9} | {'deliveries / driver-hour':>24} | {'minutes to delivery':>20}"
+          f" | {'invocations / order':>20} | {'open':>4} | {'failed':>6} | {'s':>5}")
+    for max_stacked_deliveries in STACK_SIZES:
+        await measure(max_stacked_deliveries)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Invocations caused by the web UI polling the order status every second, for the lifetime of an order:
+# the order status object calling the order workflow for the status on every poll (the previous implementation),
+# compared to the order workflow pushing every status transition to the order status object.
+# The web UI stand-in itself is not counted, since it stands for the requests of the browser.
+# Both run the current order workflow, so both pay for the status pushes.
+#
+# Run from the app directory: python -m benchmarks.order_status_polling
+
+import asyncio
+import contextlib
+import os
+from datetime import timedelta
+
+from restate import VirtualObject, ObjectContext
+
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.order_status as order_status
+import ordering.order_workflow as order_workflow
+from ordering.types.serde import LOCATION_SERDE
+from ordering.types.types import DEMO_REGION, Status
+from ordering.utils import geo
+from benchmarks.order_lifecycle import BenchmarkRestaurant, PREPARATION_TIME
+from benchmarks.state_context import SerializedObjectRuntime
+
+ORDERS = 1_000
+POLL_INTERVAL = timedelta(seconds=1)
+DELIVERY_TIME = timedelta(seconds=30)
+
+# The previous implementation of order-status/get, which called the workflow for the status
+calling_order_status = VirtualObject("order-status-calling")
+
+
+@calling_order_status.handler()
+async def get(ctx: ObjectContext):
+    eta = await ctx.get("eta") or None
+    status = await ctx.workflow_call(order_workflow.get_status, ctx.key(), arg=None) or None
+    return {"eta": eta, "status": status}
+
+
+webui = VirtualObject("webui")
+
+
+@webui.handler()
+async def poll_calling(ctx: ObjectContext):
+    order = await ctx.object_call(get, ctx.key(), arg=None)
+    if order["status"] != Status.DELIVERED:
+        ctx.object_send(poll_calling, ctx.key(), arg=None, send_delay=POLL_INTERVAL)
+
+
+@webui.handler()
+async def poll_cached(ctx: ObjectContext):
+    order = await ctx.object_call(order_status.get, ctx.key(), arg=None)
+    if order["status"] != Status.DELIVERED:
+        ctx.object_send(poll_cached, ctx.key(), arg=None, send_delay=POLL_INTERVAL)
+
+
+async def measure(name: str, poll):
+    runtime = SerializedObjectRuntime()
+    order_workflow.restaurant_client = BenchmarkRestaurant(runtime)  # type: ignore
+    for i in range(ORDERS):
+        runtime.context(driver_digital_twin.set_driver_available, f"driver-{i}").set(
+            driver_digital_twin.DRIVER_LOCATION, geo.random_location(), serde=LOCATION_SERDE)
+        runtime.send(driver_digital_twin.set_driver_available, f"driver-{i}", DEMO_REGION)
+    await runtime.drain()
+    runtime.reset_metrics()
+
+    # The payment client logs every payment
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(ORDERS):
+            runtime.send(order_workflow.run, f"order-{i}", {
+                "id": f"order-{i}",
+                "restaurant_id": "restaurant-1",
+                "products": [{"product_id": "pizza", "description": "Pizza", "quantity": 1}],
+                "total_cost": 10,
+                "delivery_delay": 0,
+            })
+            runtime.send(poll, f"order-{i}", None)
+        await runtime.run_for(PREPARATION_TIME)
+
+        for i in range(ORDERS):
+            runtime.send(driver_digital_twin.notify_delivery_pickup, f"driver-{i}", None)
+        await runtime.run_for(DELIVERY_TIME)
+        for i in range(ORDERS):
+            runtime.send(driver_digital_twin.notify_delivery_delivered, f"driver-{i}", None)
+        await runtime.run_for(POLL_INTERVAL)
+    runtime.close()
+
+    polls = runtime.invocations[f"webui/{poll.__name__}"]
+    poll_invocations = sum(count for handler, count in runtime.invocations.items()
+                           if handler.endswith("/get") or handler.endswith("/get_status"))
+    pushes = runtime.invocations["order-status/set_status"]
+    invocations = runtime.invocations.total() - polls
+    if poll is poll_cached:
+        stale = sum(1 for i in range(ORDERS) if runtime.context(order_status.get, f"order-{i}").state.get("status")
+                    != runtime.context(order_workflow.run, f"order-{i}").state.get("status"))
+        assert stale == 0, f"{stale} cached statuses differ from the workflow"
+    print(f"{name:>8} | {polls / ORDERS:>13.1f} | {poll_invocations / polls:>18.2f}"
+          f" | {pushes / ORDERS:>14.1f} | {invocations / ORDERS:>19.1f} | {len(runtime.errors):>8}")
+
+
+async def main():
+    print(f"{ORDERS} orders, polled every {POLL_INTERVAL.total_seconds():.0f} s until delivered")
+    print(f"{'status':>8} | {'polls / order':>13} | {'invocations / poll':>18}"
+          f" | {'pushes / order':>14} | {'invocations / order':>19} | {'failures':>8}")
+    await measure("calling", poll_calling)
+    await measure("cached", poll_cached)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
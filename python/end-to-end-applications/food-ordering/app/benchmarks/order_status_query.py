@@ -0,0 +1,71 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Cost of one order-status-query/get_statuses request for the status of 10k orders:
+# reading the order workflows one at a time, reading them with bounded concurrency,
+# and reading the order status index.
+# Every invocation takes INVOCATION_LATENCY, to account for the round trips to Restate.
+#
+# Run from the app directory: python -m benchmarks.order_status_query
+
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("ORDER_STATUS_INDEX_SHARDS", "64")
+
+import ordering.order_status as order_status  # noqa: E402
+import ordering.order_status_query as order_status_query  # noqa: E402
+import ordering.order_workflow as order_workflow  # noqa: E402
+from ordering.types.types import Status  # noqa: E402
+from benchmarks.state_context import SerializedObjectRuntime  # noqa: E402
+
+ORDERS = 10_000
+INVOCATION_LATENCY = 0.001
+
+
+async def measure(name: str, concurrency: int, cached: bool):
+    random.seed(ORDERS)
+    runtime = SerializedObjectRuntime(invocation_latency=INVOCATION_LATENCY)
+    statuses = list(Status)
+    for i in range(ORDERS):
+        status = random.choice(statuses)
+        runtime.context(order_workflow.run, f"order-{i}").set("status", status)
+        runtime.send(order_status.set_status, f"order-{i}", status)
+    await runtime.drain()
+    runtime.reset_metrics()
+
+    order_status_query.ORDER_STATUS_QUERY_CONCURRENCY = concurrency
+    order_ids = [f"order-{i}" for i in range(ORDERS)]
+    # The query handler runs directly, so that its journal can be inspected
+    query = runtime.context(order_status_query.get_statuses)
+    start = time.perf_counter()
+    result = await order_status_query.get_statuses(query, {"order_ids": order_ids, "cached": cached})
+    elapsed = time.perf_counter() - start
+    runtime.close()
+
+    assert all(result[f"order-{i}"] == json.loads(runtime.context(order_workflow.run, f"order-{i}").state["status"])
+               for i in range(ORDERS))
+    print(f"{name:>21} | {elapsed * 1000:>7.0f} | {runtime.invocations.total():>11} | {query.journal_entries:>15}"
+          f" | {len(json.dumps(result)):>14}")
+
+
+async def main():
+    print(f"status of {ORDERS} orders, {INVOCATION_LATENCY * 1000:.0f} ms per invocation, "
+          f"{order_status_query.ORDER_STATUS_INDEX_SHARDS} index shards")
+    print(f"{'reads':>21} | {'ms':>7} | {'invocations':>11} | {'journal entries':>15} | {'response bytes':>14}")
+    await measure("workflows, 1 by 1", 1, cached=False)
+    await measure("workflows, 100 by 100", 100, cached=False)
+    await measure("index", 100, cached=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Response time of the restaurant POS's /prepare under a burst of orders:
+# sending the completion callback to Restate before responding (the previous implementation),
+# compared to handing it to the background dispatcher of restaurant/app.py,
+# and to not sending any callback at all, which is the floor set by the Flask development server.
+# The POS and a stand-in for the Restate ingress, which answers the callbacks after INGRESS_LATENCY,
+# run in a separate process. The Flask development server closes the connection after every response,
+# so every request opens a new connection.
+#
+# Run from the app directory: python -m benchmarks.restaurant_callbacks
+
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+INGRESS_PORT = 18081
+RESTAURANT_PORT = 15001
+INGRESS_LATENCY = 0.005
+RATE = 2_000
+ORDERS = 2_000
+CALLBACK_DEADLINE = 60
+
+os.environ["RESTATE_RUNTIME_ENDPOINT"] = f"http://127.0.0.1:{INGRESS_PORT}"
+
+import restaurant.app as restaurant  # noqa: E402
+
+# The previous implementation of /prepare, which sent the callback inline
+inline_app = Flask("inline_restaurant")
+
+
+@inline_app.route("/prepare", methods=["POST"])
+def inline_prepare_order():
+    order_id = request.json["order_id"]
+    requests.post(f"{restaurant.RESTATE_RUNTIME_ENDPOINT}/order-workflow/{order_id}/finishedPreparation/send?delay=5s",
+                  headers={"Content-Type": "application/json"})
+    return jsonify({}), 200
+
+
+no_callback_app = Flask("no_callback_restaurant")
+
+
+@no_callback_app.route("/prepare", methods=["POST"])
+def no_callback_prepare_order():
+    return jsonify({}), 200
+
+
+APPS = {"inline": inline_app, "background": restaurant.app, "none": no_callback_app}
+
+
+class Ingress(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    callbacks = None
+
+    def do_POST(self):
+        time.sleep(INGRESS_LATENCY)
+        with self.callbacks.get_lock():
+            self.callbacks.value += 1
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IngressServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+
+
+def serve(app_name: str, ready, callbacks):
+    Ingress.callbacks = callbacks
+    ingress = IngressServer(("127.0.0.1", INGRESS_PORT), Ingress)
+    threading.Thread(target=ingress.serve_forever, daemon=True).start()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", RESTAURANT_PORT, APPS[app_name], threaded=True)
+    ready.set()
+    # The POS logs every order
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        server.serve_forever()
+
+
+async def post_prepare(order_id: str) -> float:
+    body = json.dumps({"order_id": order_id}).encode()
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", RESTAURANT_PORT)
+    writer.write(b"POST /prepare HTTP/1.1\r\nHost: restaurant\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+    response = await reader.read()
+    assert response.startswith(b"HTTP/1.1 200"), response
+    writer.close()
+    return time.perf_counter() - start
+
+
+async def burst(name: str, callbacks):
+    latencies = []
+
+    async def order(i: int, send_at: float):
+        await asyncio.sleep(max(0.0, send_at - time.perf_counter()))
+        latencies.append(await post_prepare(f"order-{i}"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(order(i, start + i / RATE) for i in range(ORDERS)))
+    elapsed = time.perf_counter() - start
+    # Wait for the background callbacks to reach the ingress
+    while name != "none" and callbacks.value < ORDERS and time.perf_counter() - start < CALLBACK_DEADLINE:
+        await asyncio.sleep(0.01)
+    callbacks_elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"{name:>10} | {ORDERS / elapsed:>10.0f} | {statistics.median(latencies) * 1000:>7.1f}"
+          f" | {p99 * 1000:>7.1f} | {callbacks.value:>9} | {callbacks_elapsed:>13.1f}")
+
+
+async def main():
+    print(f"{ORDERS} orders sent at {RATE} / s, {INGRESS_LATENCY * 1000:.0f} ms callback latency")
+    print(f"{'callback':>10} | {'orders / s':>10} | {'p50 ms':>7} | {'p99 ms':>7} | {'callbacks':>9} | {'all done in s':>13}")
+    for app_name in APPS:
+        ready = multiprocessing.Event()
+        callbacks = multiprocessing.Value("i", 0)
+        server = multiprocessing.Process(target=serve, args=(app_name, ready, callbacks), daemon=True)
+        server.start()
+        ready.wait()
+        await burst(app_name, callbacks)
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
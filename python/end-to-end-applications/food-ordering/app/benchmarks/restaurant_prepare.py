@@ -0,0 +1,113 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Orders per second that one worker can send to the restaurant POS (restaurant/app.py, running locally):
+# a blocking requests.post with a new connection per order (the previous implementation),
+# compared to the pooled async RestaurantClient.
+# The POS and a stand-in for the Restate ingress, which accepts the POS's callbacks, run in a separate process.
+# The longest stall of the worker's event loop shows how long all other handlers of the worker had to wait.
+#
+# Run from the app directory: python -m benchmarks.restaurant_prepare
+
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from werkzeug.serving import make_server
+
+INGRESS_PORT = 18080
+RESTAURANT_PORT = 15000
+ORDERS = 2_000
+CONCURRENCY = 100
+
+os.environ["RESTATE_RUNTIME_ENDPOINT"] = f"http://127.0.0.1:{INGRESS_PORT}"
+os.environ["RESTAURANT_ENDPOINT"] = f"http://127.0.0.1:{RESTAURANT_PORT}"
+
+from restaurant.app import app as restaurant_app  # noqa: E402
+from ordering.clients.restaurant_client import RestaurantClient  # noqa: E402
+
+
+class Ingress(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(ready):
+    ingress = ThreadingHTTPServer(("127.0.0.1", INGRESS_PORT), Ingress)
+    threading.Thread(target=ingress.serve_forever, daemon=True).start()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    restaurant = make_server("127.0.0.1", RESTAURANT_PORT, restaurant_app, threaded=True)
+    ready.set()
+    # The POS logs every order
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        restaurant.serve_forever()
+
+
+def blocking_prepare(order_id: str) -> None:
+    requests.post(f"{os.environ['RESTAURANT_ENDPOINT']}/prepare", json={"order_id": order_id},
+                  headers={"Content-Type": "application/json"})
+
+
+async def run_orders(name: str, prepare):
+    orders = iter(range(ORDERS))
+    max_stall = 0.0
+
+    async def workflow():
+        for order in orders:
+            await prepare(f"order-{order}")
+
+    async def monitor_event_loop():
+        nonlocal max_stall
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(0)
+            max_stall = max(max_stall, time.perf_counter() - before)
+
+    monitor = asyncio.create_task(monitor_event_loop())
+    start = time.perf_counter()
+    await asyncio.gather(*(workflow() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    monitor.cancel()
+    print(f"{name:>8} | {ORDERS / elapsed:>10.0f} | {max_stall * 1000:>23.1f}")
+
+
+async def main():
+    ready = multiprocessing.Event()
+    servers = multiprocessing.Process(target=serve, args=(ready,), daemon=True)
+    servers.start()
+    ready.wait()
+    print(f"{ORDERS} orders, {CONCURRENCY} concurrent workflows in one worker")
+    print(f"{'client':>8} | {'orders / s':>10} | {'max event loop stall ms':>23}")
+
+    async def blocking(order_id: str):
+        blocking_prepare(order_id)
+
+    await run_orders("blocking", blocking)
+
+    client = RestaurantClient()
+    await run_orders("pooled", client.prepare)
+    await client.close()
+    servers.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
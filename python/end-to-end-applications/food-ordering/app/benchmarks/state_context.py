@@ -0,0 +1,457 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import time
+import types
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from restate.exceptions import TerminalError
+from restate.handler import handler_from_callable
+from restate.serde import JsonSerde, Serde
+
+# The handler ("<service>/<handler>") of the running invocation, to attribute the cost of the context calls
+current_handler: ContextVar[Optional[str]] = ContextVar("current_handler", default=None)
+
+
+@dataclass
+class HandlerMetrics:
+    invocations: int = 0
+    failures: int = 0
+    # Time spent running the handler code on the event loop thread, without the time spent waiting
+    cpu_seconds: float = 0.0
+    journal_entries: int = 0
+    journal_bytes: int = 0
+    state_bytes_read: int = 0
+    state_bytes_written: int = 0
+
+
+class InMemoryObjectContext:
+    """
+    Stand-in for the Restate context of the handlers of a Service, Virtual Object or Workflow,
+    for benchmarking handlers without a Restate server.
+    Values are stored serialized, like Restate does, so that the state bytes read and written can be counted.
+    Every context call counts as one journal entry, and its payload (state values, run results, call arguments,
+    awakeable and promise values) as journal bytes.
+
+    Without a runtime, only the K/V state and ctx.run are available, and the messages that get sent are only recorded.
+    """
+
+    def __init__(self, key: str, runtime: Optional["SerializedObjectRuntime"] = None, service: str = ""):
+        self._key = key
+        self.service = service
+        self.runtime = runtime
+        self.state: dict[str, bytes] = {}
+        self.resolved_awakeables: dict[str, Any] = runtime.resolved_awakeables if runtime else {}
+        self.sent: list[tuple[Any, str, Any]] = []
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.state_writes = 0
+        self.journal_entries = 0
+        self.journal_bytes = 0
+
+    def journal(self, payload: int = 0, read: int = 0, written: int = 0):
+        self.journal_entries += 1
+        self.journal_bytes += payload
+        self.bytes_read += read
+        self.bytes_written += written
+        if self.runtime is not None:
+            self.runtime.record_context_call(payload, read, written)
+
+    def _runtime(self) -> "SerializedObjectRuntime":
+        assert self.runtime is not None, "this context call needs a SerializedObjectRuntime"
+        return self.runtime
+
+    def key(self) -> str:
+        return self._key
+
+    # K/V state
+
+    async def get(self, name: str, serde: Serde = JsonSerde()) -> Optional[Any]:
+        buf = self.state.get(name)
+        if buf is None:
+            self.journal()
+            return None
+        self.journal(len(buf), read=len(buf))
+        return serde.deserialize(buf)
+
+    async def state_keys(self) -> list[str]:
+        self.journal()
+        return list(self.state)
+
+    def set(self, name: str, value: Any, serde: Serde = JsonSerde()):
+        buf = bytes(serde.serialize(value))
+        self.journal(len(buf), written=len(buf))
+        self.state_writes += 1
+        self.state[name] = buf
+
+    def clear(self, name: str):
+        self.journal()
+        if self.state.pop(name, None) is not None:
+            self.state_writes += 1
+
+    def clear_all(self):
+        self.journal()
+        self.state_writes += len(self.state)
+        self.state.clear()
+
+    # Side effects and timers
+
+    async def run(self, name: str, action: Callable[[], Any], serde: Serde = JsonSerde(),
+                  max_attempts: Optional[int] = None, max_retry_duration: Optional[timedelta] = None) -> Any:
+        result = await action() if inspect.iscoroutinefunction(action) else action()
+        # The result gets journaled, so that the action does not run again on retries
+        self.journal(len(serde.serialize(result)))
+        return result
+
+    def sleep(self, delta: timedelta) -> Awaitable[None]:
+        self.journal()
+        return self._runtime().sleep(delta)
+
+    # Calls and messages
+
+    def service_call(self, handler, arg: Any) -> Awaitable[Any]:
+        return self._call(handler, "", arg)
+
+    def service_send(self, handler, arg: Any, send_delay: Optional[timedelta] = None):
+        self._send(handler, "", arg, send_delay)
+
+    def object_call(self, handler, key: str, arg: Any) -> Awaitable[Any]:
+        return self._call(handler, key, arg)
+
+    def object_send(self, handler, key: str, arg: Any, send_delay: Optional[timedelta] = None):
+        self._send(handler, key, arg, send_delay)
+
+    def workflow_call(self, handler, key: str, arg: Any) -> Awaitable[Any]:
+        return self._call(handler, key, arg)
+
+    def workflow_send(self, handler, key: str, arg: Any, send_delay: Optional[timedelta] = None):
+        self._send(handler, key, arg, send_delay)
+
+    def _call(self, handler, key: str, arg: Any) -> Awaitable[Any]:
+        self.journal(_input_size(handler, arg))
+        return self._runtime().call(handler, key, arg)
+
+    def _send(self, handler, key: str, arg: Any, send_delay: Optional[timedelta]):
+        self.journal(_input_size(handler, arg))
+        if self.runtime is None:
+            self.sent.append((handler, key, arg))
+        else:
+            self.runtime.send(handler, key, arg, send_delay)
+
+    # Awakeables and workflow promises
+
+    def awakeable(self, serde: Serde = JsonSerde()) -> tuple[str, Awaitable[Any]]:
+        self.journal()
+        return self._runtime().awakeable(serde)
+
+    def resolve_awakeable(self, name: str, value: Any, serde: Serde = JsonSerde()):
+        buf = bytes(serde.serialize(value))
+        self.journal(len(buf))
+        self.resolved_awakeables[name] = value
+        if self.runtime is not None:
+            self.runtime.resolve_awakeable(name, buf)
+
+    def reject_awakeable(self, name: str, failure_message: str, failure_code: int = 500):
+        self.journal(len(failure_message))
+        self._runtime().reject_awakeable(name, TerminalError(failure_message, failure_code))
+
+    def promise(self, name: str, serde: Serde = JsonSerde()) -> "InMemoryPromise":
+        return InMemoryPromise(self, name, serde)
+
+
+class InMemoryPromise:
+    """Durable promise of a workflow, shared by the run handler and the shared handlers of the same workflow key."""
+
+    def __init__(self, ctx: InMemoryObjectContext, name: str, serde: Serde):
+        self.ctx = ctx
+        self.serde = serde
+        assert ctx.runtime is not None, "promises need a SerializedObjectRuntime"
+        self.runtime = ctx.runtime
+        self.future = self.runtime.promise(ctx.service, ctx.key(), name)
+
+    async def resolve(self, value: Any):
+        buf = bytes(self.serde.serialize(value))
+        self.ctx.journal(len(buf))
+        self.runtime.complete(self.future, self.serde.deserialize(buf))
+
+    async def reject(self, message: str, code: int = 500):
+        self.ctx.journal(len(message))
+        self.runtime.complete(self.future, TerminalError(message, code))
+
+    async def peek(self) -> Optional[Any]:
+        self.ctx.journal()
+        return self.future.result() if self.future.done() else None
+
+    def value(self) -> Awaitable[Any]:
+        self.ctx.journal()
+        return self.runtime.wait(self.future)
+
+
+class SerializedObjectRuntime:
+    """
+    Runs the handlers of Services, Virtual Objects and Workflows like Restate does:
+    the exclusive handlers of an object, and the run handler of a workflow, one invocation at a time per key,
+    and everything else concurrently.
+    Every invocation holds its key for `invocation_latency` seconds, to account for the round trips to Restate.
+    Arguments and results are passed serialized with the serdes of the handler.
+    The run handler of a workflow only runs once per key: later calls get the result of the first run.
+
+    Delayed sends and sleeps use a virtual clock, which only advances in `run_for`,
+    so that minutes of simulated time run in a fraction of a second.
+
+    The cost of every handler is tracked in `metrics`, and `report` lists it per invocation.
+    Failed invocations are not retried: they are counted, and their errors kept in `errors`.
+    """
+
+    def __init__(self, invocation_latency: float = 0.0):
+        self.invocation_latency = invocation_latency
+        self.now = 0.0
+        self.contexts: dict[tuple[str, str], InMemoryObjectContext] = {}
+        self.resolved_awakeables: dict[str, Any] = {}
+        self.invocations: Counter[str] = Counter()
+        self.metrics: defaultdict[str, HandlerMetrics] = defaultdict(HandlerMetrics)
+        self.errors: list[tuple[str, Exception]] = []
+        self._inboxes: dict[tuple[str, str], asyncio.Queue] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._timers: list[tuple[float, int, Callable[[], None]]] = []
+        self._awakeables: dict[str, tuple[asyncio.Future, Serde]] = {}
+        self._promises: dict[tuple[str, str, str], asyncio.Future] = {}
+        self._workflow_runs: dict[tuple[str, str], asyncio.Future] = {}
+        self._waiting: set[asyncio.Future] = set()
+        self._ids = itertools.count()
+        # Number of invocations that are queued or running, and not waiting on a call, awakeable, promise or sleep
+        self._runnable = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def context(self, handler, key: str = "") -> InMemoryObjectContext:
+        service = handler_from_callable(handler).service_tag.name
+        if (service, key) not in self.contexts:
+            self.contexts[(service, key)] = InMemoryObjectContext(key, self, service)
+        return self.contexts[(service, key)]
+
+    def send(self, handler, key: str, arg: Any, delay: Optional[timedelta] = None):
+        if delay:
+            self._schedule(delay, lambda: self._enqueue(handler, key, arg, None))
+        else:
+            self._enqueue(handler, key, arg, None)
+
+    def call(self, handler, key: str, arg: Any) -> Awaitable[Any]:
+        result = asyncio.get_running_loop().create_future()
+        self._enqueue(handler, key, arg, result)
+        return self.wait(result)
+
+    def awakeable(self, serde: Serde = JsonSerde()) -> tuple[str, Awaitable[Any]]:
+        awakeable_id = f"prom_{next(self._ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self._awakeables[awakeable_id] = (future, serde)
+        return awakeable_id, self.wait(future)
+
+    def resolve_awakeable(self, awakeable_id: str, buf: bytes):
+        if awakeable_id in self._awakeables:
+            future, serde = self._awakeables.pop(awakeable_id)
+            self.complete(future, serde.deserialize(buf))
+
+    def reject_awakeable(self, awakeable_id: str, error: TerminalError):
+        if awakeable_id in self._awakeables:
+            future, _ = self._awakeables.pop(awakeable_id)
+            self.complete(future, error)
+
+    def promise(self, service: str, key: str, name: str) -> asyncio.Future:
+        if (service, key, name) not in self._promises:
+            self._promises[(service, key, name)] = asyncio.get_running_loop().create_future()
+        return self._promises[(service, key, name)]
+
+    def sleep(self, delta: timedelta) -> Awaitable[None]:
+        done = asyncio.get_running_loop().create_future()
+        self._schedule(delta, lambda: self.complete(done, None))
+        return self.wait(done)
+
+    def wait(self, future: asyncio.Future) -> Awaitable[Any]:
+        """Lets an invocation wait on a future, without counting as running in the meantime."""
+        return self._wait(future)
+
+    def complete(self, future: asyncio.Future, value: Any):
+        """Completes a future that an invocation may be waiting on, with a value or an exception."""
+        if future.done():
+            return
+        if future in self._waiting:
+            # The waiting invocation becomes runnable again
+            self._waiting.remove(future)
+            self._set_runnable(+1)
+        if isinstance(value, BaseException):
+            future.set_exception(value)
+        else:
+            future.set_result(value)
+
+    async def drain(self):
+        """Waits until all invocations, including the ones they sent, have completed or are waiting."""
+        await self._idle.wait()
+
+    async def run_for(self, duration: timedelta):
+        """Runs all invocations, advancing the virtual clock by the given duration."""
+        end = self.now + duration.total_seconds()
+        while True:
+            await self.drain()
+            if not self._timers or self._timers[0][0] > end:
+                break
+            self.now, _, fire = heapq.heappop(self._timers)
+            fire()
+        self.now = end
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def record_context_call(self, payload: int, read: int, written: int):
+        handler = current_handler.get()
+        if handler is not None:
+            metrics = self.metrics[handler]
+            metrics.journal_entries += 1
+            metrics.journal_bytes += payload
+            metrics.state_bytes_read += read
+            metrics.state_bytes_written += written
+
+    def reset_metrics(self):
+        self.invocations.clear()
+        self.metrics.clear()
+        self.errors.clear()
+
+    def report(self) -> str:
+        """The cost per invocation of every handler that ran."""
+        lines = [f"{'handler':<52} | {'invocations':>11} | {'failures':>8} | {'cpu us':>8} | {'journal entries':>15}"
+                 f" | {'journal bytes':>13} | {'state bytes r/w':>15}"]
+        for name, m in sorted(self.metrics.items()):
+            n = max(m.invocations, 1)
+            state_bytes = f"{m.state_bytes_read / n:.0f}/{m.state_bytes_written / n:.0f}"
+            lines.append(f"{name:<52} | {m.invocations:>11} | {m.failures:>8} | {m.cpu_seconds / n * 1e6:>8.1f}"
+                         f" | {m.journal_entries / n:>15.1f} | {m.journal_bytes / n:>13.0f} | {state_bytes:>15}")
+        return "\n".join(lines)
+
+    async def _wait(self, future: asyncio.Future) -> Any:
+        if not future.done():
+            self._waiting.add(future)
+            self._set_runnable(-1)
+        return await future
+
+    def _set_runnable(self, delta: int):
+        self._runnable += delta
+        if self._runnable == 0:
+            self._idle.set()
+        else:
+            self._idle.clear()
+
+    def _schedule(self, delay: timedelta, fire: Callable[[], None]):
+        heapq.heappush(self._timers, (self.now + delay.total_seconds(), next(self._ids), fire))
+
+    def _start(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _enqueue(self, handler, key: str, arg: Any, result: Optional[asyncio.Future]):
+        target = handler_from_callable(handler)
+        ctx = self.context(handler, key)
+        # Arguments are passed serialized, like Restate does
+        if target.arity == 2:
+            input_serde = target.handler_io.input_serde
+            arg = input_serde.deserialize(input_serde.serialize(arg))
+
+        if target.kind == "workflow":
+            # Calls to the run handler of a workflow attach to its only run
+            run_key = (target.service_tag.name, key)
+            first_run = run_key not in self._workflow_runs
+            if first_run:
+                self._workflow_runs[run_key] = asyncio.get_running_loop().create_future()
+            if result is not None:
+                caller = result
+                self._workflow_runs[run_key].add_done_callback(
+                    lambda run: self.complete(caller, run.exception() or run.result()))
+            if not first_run:
+                return
+            result = self._workflow_runs[run_key]
+
+        self._set_runnable(+1)
+        if target.service_tag.kind == "service" or target.kind == "shared":
+            self._start(self._invoke(ctx, handler, arg, result))
+            return
+
+        object_key = (target.service_tag.name, key)
+        if object_key not in self._inboxes:
+            self._inboxes[object_key] = asyncio.Queue()
+            self._start(self._run_exclusive(ctx, self._inboxes[object_key]))
+        self._inboxes[object_key].put_nowait((handler, arg, result))
+
+    async def _run_exclusive(self, ctx: InMemoryObjectContext, inbox: asyncio.Queue):
+        while True:
+            handler, arg, result = await inbox.get()
+            await self._invoke(ctx, handler, arg, result)
+
+    async def _invoke(self, ctx: InMemoryObjectContext, handler, arg: Any, result: Optional[asyncio.Future]):
+        try:
+            if self.invocation_latency:
+                await asyncio.sleep(self.invocation_latency)
+            target = handler_from_callable(handler)
+            name = f"{target.service_tag.name}/{target.name}"
+            metrics = self.metrics[name]
+            metrics.invocations += 1
+            self.invocations[name] += 1
+            token = current_handler.set(name)
+            try:
+                output = await _timed(handler(ctx, arg) if target.arity == 2 else handler(ctx), metrics)
+                if result is not None:
+                    output_serde = target.handler_io.output_serde
+                    self.complete(result, output_serde.deserialize(output_serde.serialize(output)))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                metrics.failures += 1
+                self.errors.append((name, e))
+                if result is not None:
+                    self.complete(result, e)
+            finally:
+                current_handler.reset(token)
+        finally:
+            self._set_runnable(-1)
+
+
+def _input_size(handler, arg: Any) -> int:
+    target = handler_from_callable(handler)
+    return len(target.handler_io.input_serde.serialize(arg)) if target.arity == 2 else 0
+
+
+@types.coroutine
+def _timed(coroutine, metrics: HandlerMetrics):
+    """Runs the coroutine, adding the thread time of every step until it suspends to the CPU time of the handler."""
+    value: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        start = time.thread_time()
+        try:
+            yielded = coroutine.throw(error) if error is not None else coroutine.send(value)
+        except StopIteration as stop:
+            metrics.cpu_seconds += time.thread_time() - start
+            return stop.value
+        except BaseException:
+            metrics.cpu_seconds += time.thread_time() - start
+            raise
+        metrics.cpu_seconds += time.thread_time() - start
+        try:
+            value, error = (yield yielded), None
+        except BaseException as e:  # pylint: disable=broad-exception-caught
+            value, error = None, e
@@ -0,0 +1,118 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Fan-out of the status stream sidecar (ordering/status_stream.py), called in-process over ASGI:
+# every order has one subscribed client, and goes through all status transitions of the order workflow.
+# Some orders have a second client that never reads its stream, and get ETA updates while in delivery.
+# The stalled clients must neither hold up the other clients nor buffer more than STATUS_STREAM_CLIENT_BUFFER events.
+#
+# Run from the app directory: python -m benchmarks.status_stream_fanout
+
+import asyncio
+import json
+import time
+
+from ordering import status_stream
+from ordering.types.types import Status
+
+ORDERS = 50_000
+STALLED_CLIENTS = 1_000
+ETA_UPDATES = 50
+STATUSES = [Status.CREATED, Status.SCHEDULED, Status.IN_PREPARATION, Status.SCHEDULING_DELIVERY,
+            Status.WAITING_FOR_DRIVER, Status.IN_DELIVERY, Status.DELIVERED]
+
+
+class Client:
+    received = 0
+    all_received = asyncio.Event()
+
+    def __init__(self, order_id: str, stalled: bool = False):
+        self.order_id = order_id
+        self.stalled = stalled
+        self.events: list[dict] = []
+        self.disconnected = asyncio.Event()
+        self.task = asyncio.create_task(status_stream.app(
+            {"type": "http", "method": "GET", "path": f"/orders/{order_id}/events"}, self.receive, self.send))
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] != "http.response.body":
+            return
+        if self.stalled:
+            await asyncio.Future()
+        for line in message["body"].split(b"\n"):
+            if line.startswith(b"data: "):
+                self.events.append(json.loads(line[len(b"data: "):]))
+        Client.received += 1
+        if Client.received == ORDERS:
+            Client.all_received.set()
+
+
+async def publish(order_id: str, update: dict):
+    body = json.dumps(update).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    await status_stream.app({"type": "http", "method": "POST", "path": f"/orders/{order_id}"}, receive, send)
+
+
+async def main():
+    clients = [Client(f"order-{i}") for i in range(ORDERS)]
+    stalled = [Client(f"order-{i}", stalled=True) for i in range(STALLED_CLIENTS)]
+    await asyncio.sleep(0)
+
+    print(f"{ORDERS} orders with a subscribed client, {STALLED_CLIENTS} of them with a second client that stalls"
+          f" and {ETA_UPDATES} ETA updates")
+    print(f"{'status':>19} | {'publish ms':>10} | {'delivered ms':>12} | {'events / s':>10}")
+    publish_time = delivery_time = 0.0
+    for status in STATUSES:
+        if status == Status.DELIVERED:
+            for eta in range(ETA_UPDATES):
+                for i in range(STALLED_CLIENTS):
+                    await publish(f"order-{i}", {"eta": eta})
+            await asyncio.sleep(0.1)
+        Client.received = 0
+        Client.all_received.clear()
+        start = time.perf_counter()
+        for i in range(ORDERS):
+            await publish(f"order-{i}", {"status": status})
+        published = time.perf_counter()
+        await Client.all_received.wait()
+        delivered = time.perf_counter()
+        publish_time += published - start
+        delivery_time += delivered - start
+        print(f"{status.value:>19} | {(published - start) * 1000:>10.1f} | {(delivered - start) * 1000:>12.1f}"
+              f" | {ORDERS / (delivered - start):>10.0f}")
+
+    await asyncio.gather(*(client.task for client in clients))
+    assert all(client.events[-1]["status"] == Status.DELIVERED for client in clients)
+    buffered = [len(subscription.events) for subscriptions in status_stream.broker.subscriptions.values()
+                for subscription in subscriptions]
+    dropped = sum(subscription.dropped for subscriptions in status_stream.broker.subscriptions.values()
+                  for subscription in subscriptions)
+    print()
+    print(f"{ORDERS * len(STATUSES) / delivery_time:.0f} events / s delivered, "
+          f"{ORDERS * len(STATUSES) / publish_time:.0f} publishes / s")
+    print(f"every client received the final status; stalled clients buffer at most {max(buffered)} events "
+          f"(limit {status_stream.STATUS_STREAM_CLIENT_BUFFER}), {dropped} events dropped")
+    print(f"polling every second instead would cost Restate {ORDERS} order-status/get invocations / s")
+
+    for client in stalled:
+        client.task.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,39 @@
+import asyncio
+
 import restate
 
+import ordering.clients.kafka_client as kafka_client
+
+from ordering.delivery_admission import delivery_admission
 from ordering.delivery_manager import delivery_manager
 from ordering.driver_digital_twin import driver_digital_twin
 from ordering.driver_matcher import driver_matcher
 from ordering.external.driver_mobile_app_sim import mobile_app_object
-from ordering.order_workflow import order_workflow
-from ordering.order_status import order_status
+from ordering.external.fleet_sim import fleet_client, fleet_sim_object
+from ordering.fleet_aggregates import fleet_aggregates
+from ordering.order_workflow import order_workflow, restaurant_client
+from ordering.order_status import order_status, status_stream_client
+from ordering.order_status_index import order_status_index
+from ordering.order_status_query import order_status_query
+from ordering.utils.asgi import lifespan
+
+restate_app = restate.app([order_workflow, delivery_manager, driver_digital_twin, driver_matcher, mobile_app_object, order_status,
+                           order_status_query, order_status_index, fleet_sim_object, delivery_admission,
+                           fleet_aggregates])
+
+
+async def close_clients():
+    await asyncio.gather(restaurant_client.close(), status_stream_client.close(), fleet_client.close())
+
+
+async def app(scope, receive, send):
+    # The Restate app does not handle the lifespan of the server,
+    # which closes the connections that the worker keeps alive when it shuts down
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send, on_shutdown=close_clients)
+    else:
+        await restate_app(scope, receive, send)
+
 
-app = restate.app([order_workflow, delivery_manager, driver_digital_twin, driver_matcher, mobile_app_object, order_status])
\ No newline at end of file
+# Connect to Kafka in the background, so that the first location updates do not get dropped while connecting
+kafka_client.warm_up()
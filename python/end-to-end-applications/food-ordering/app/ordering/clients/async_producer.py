@@ -0,0 +1,75 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+
+class AsyncProducer:
+    """
+    Lets async handlers await the acknowledgement of a Kafka record without blocking the event loop.
+
+    The records are handed to the KafkaProducer, which batches them across handlers on its sender thread
+    (see its linger_ms and batch_size settings). They are handed over on a thread of their own, since the KafkaProducer
+    blocks the caller while its buffer is full; a single thread keeps the records in the order they were sent.
+    The acknowledgement is passed back to the event loop via a callback.
+    At most `max_in_flight` records wait for their acknowledgement at the same time: further sends wait for a free slot.
+    """
+
+    def __init__(self, producer, max_in_flight: int):
+        self.producer = producer
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-send")
+
+    async def send(self, topic: str, key: Any, value: Any):
+        async with self._in_flight:
+            loop = asyncio.get_running_loop()
+            acknowledged = loop.create_future()
+            # KafkaProducer.send blocks for up to max_block_ms while the buffer is full or the topic metadata is missing
+            self._sender.submit(self._send, loop, acknowledged, topic, key, value)
+            return await acknowledged
+
+    def _send(self, loop: asyncio.AbstractEventLoop, acknowledged: asyncio.Future, topic: str, key: Any, value: Any):
+        try:
+            record = self.producer.send(topic, key=key, value=value)
+        except Exception as error:
+            loop.call_soon_threadsafe(_set_exception, acknowledged, error)
+            return
+        record.add_callback(lambda metadata: loop.call_soon_threadsafe(_set_result, acknowledged, metadata))
+        record.add_errback(lambda error: loop.call_soon_threadsafe(_set_exception, acknowledged, error))
+
+    async def send_batch(self, topic: str, records: list[tuple[Any, Any]]) -> int:
+        """
+        Hands all records to the producer at once, and waits until they are all acknowledged.
+        Cheaper than one send per record for large batches, since it does not track every record on the event loop.
+        Returns the number of records that failed.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self._send_batch, topic, records)
+
+    def _send_batch(self, topic: str, records: list[tuple[Any, Any]]) -> int:
+        sent = [self.producer.send(topic, key=key, value=value) for key, value in records]
+        self.producer.flush()
+        return sum(1 for record in sent if record.failed())
+
+    def close(self, timeout: Optional[float] = None):
+        # Deliver the records that are still buffered before shutting down
+        self.producer.flush(timeout=timeout)
+        self.producer.close(timeout=timeout)
+        self._sender.shutdown(wait=False)
+
+
+def _set_result(future: asyncio.Future, value: Any):
+    if not future.done():
+        future.set_result(value)
+
+
+def _set_exception(future: asyncio.Future, error: BaseException):
+    if not future.done():
+        future.set_exception(error)
@@ -1,25 +1,125 @@
+import asyncio
+import atexit
 import json
 import os
+import threading
+import time
+from typing import Optional
 
 from kafka import KafkaProducer
-from kafka.errors import KafkaError
+from kafka.errors import KafkaError, KafkaTimeoutError
+
+from ordering.clients.async_producer import AsyncProducer
+from ordering.types.types import Location
 
 KAFKA_BOOTSTRAP_SERVERS = os.environ.get("KAFKA_BOOTSTRAP_SERVERS") or "localhost:9092"
 KAFKA_TOPIC = "driver-updates"
 
-producer = KafkaProducer(
-    bootstrap_servers=[KAFKA_BOOTSTRAP_SERVERS],
-    key_serializer=lambda m: m.encode('utf-8'),
-    value_serializer=lambda m: json.dumps(m).encode('utf-8')
-)
+# The producer batches the location updates of all drivers: it waits up to KAFKA_LINGER_MS for a batch to fill up
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "5"))
+KAFKA_BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", "65536"))
+# Bounds the number of location updates waiting for an acknowledgement, and the memory used to buffer them
+KAFKA_MAX_IN_FLIGHT = int(os.getenv("KAFKA_MAX_IN_FLIGHT", "10000"))
+KAFKA_BUFFER_MEMORY = int(os.getenv("KAFKA_BUFFER_MEMORY", str(32 * 1024 * 1024)))
+KAFKA_CLOSE_TIMEOUT_SECONDS = 10
+
+# Seconds between attempts to connect the producer while the broker is not reachable
+KAFKA_CONNECT_RETRY_SECONDS = float(os.getenv("KAFKA_CONNECT_RETRY_SECONDS", "5"))
+# Seconds a send waits for the producer to connect, before it fails and Restate retries the ctx.run that sends it
+KAFKA_CONNECT_TIMEOUT_SECONDS = float(os.getenv("KAFKA_CONNECT_TIMEOUT_SECONDS", "5"))
+KAFKA_CONNECT_POLL_SECONDS = 0.05
+
+# The producer is shared by all handlers of the process. It gets created on a background thread, rather than on import,
+# so that the app starts without waiting for the broker, and serves the other handlers while the broker is down.
+_producer: Optional[AsyncProducer] = None
+_connecting = threading.Lock()
+_connected = threading.Event()
+
+
+def warm_up():
+    """Starts connecting the producer on a background thread, unless it is already connecting or connected."""
+    if _connected.is_set() or not _connecting.acquire(blocking=False):
+        return
+    threading.Thread(target=_connect, name="kafka-producer-warm-up", daemon=True).start()
+
+
+def _connect():
+    global _producer
+    try:
+        while True:
+            try:
+                producer = _create_producer()
+            except KafkaError as e:
+                print(f"Failed to connect to Kafka, retrying in {KAFKA_CONNECT_RETRY_SECONDS} s: {e!r}")
+                time.sleep(KAFKA_CONNECT_RETRY_SECONDS)
+                continue
+            atexit.register(producer.close, KAFKA_CLOSE_TIMEOUT_SECONDS)
+            _producer = producer
+            _connected.set()
+            return
+    finally:
+        _connecting.release()
+
 
+def _create_producer() -> AsyncProducer:
+    return AsyncProducer(
+        KafkaProducer(
+            bootstrap_servers=[KAFKA_BOOTSTRAP_SERVERS],
+            key_serializer=lambda m: m.encode('utf-8'),
+            value_serializer=lambda m: json.dumps(m).encode('utf-8'),
+            linger_ms=KAFKA_LINGER_MS,
+            batch_size=KAFKA_BATCH_SIZE,
+            # Newer kafka-python versions dropped the setting, and bound the buffered records with max_block_ms instead
+            **({"buffer_memory": KAFKA_BUFFER_MEMORY} if "buffer_memory" in KafkaProducer.DEFAULT_CONFIG else {})
+        ),
+        max_in_flight=KAFKA_MAX_IN_FLIGHT
+    )
 
-def send_location_to_kafka(driver_id: str, location: dict):
-    future = producer.send(KAFKA_TOPIC, key=driver_id, value=location)
+
+def get_producer() -> Optional[AsyncProducer]:
+    """The shared producer, or None while it is not connected yet, in which case it starts connecting."""
+    if _producer is None:
+        warm_up()
+    return _producer
+
+
+def wait_until_connected(timeout: Optional[float] = None) -> bool:
+    """Blocks until the producer is connected, and returns False on timeout."""
+    warm_up()
+    return _connected.wait(timeout)
+
+
+async def connected_producer(timeout: float = KAFKA_CONNECT_TIMEOUT_SECONDS) -> AsyncProducer:
+    """
+    The shared producer, waiting up to timeout seconds for it to connect.
+    Raises KafkaTimeoutError if it is not connected by then, so that Restate retries the ctx.run of the send,
+    instead of journaling an update that never got sent.
+    """
+    deadline = time.monotonic() + timeout
+    producer = get_producer()
+    while producer is None:
+        if time.monotonic() >= deadline:
+            raise KafkaTimeoutError(f"Kafka producer not connected after {timeout} s")
+        # Poll rather than block on the connected event, so that the other handlers keep running in the meantime
+        await asyncio.sleep(KAFKA_CONNECT_POLL_SECONDS)
+        producer = _producer
+    return producer
+
+
+async def send_location_to_kafka(driver_id: str, location: Location):
+    producer = await connected_producer()
     try:
-        record_metadata = future.get(timeout=10)
+        record_metadata = await producer.send(KAFKA_TOPIC, key=driver_id, value=location)
     except KafkaError as e:
         print(f"Failed to send location update for driver {driver_id}: {e}")
     else:
         print(
             f"Successfully sent location update for driver {driver_id} to {record_metadata.topic}")
+
+
+async def send_locations_to_kafka(locations: list[tuple[str, Location]]):
+    """Sends the location updates of many drivers, as (driver id, location) pairs, in one batch."""
+    producer = await connected_producer()
+    failed = await producer.send_batch(KAFKA_TOPIC, locations)
+    if failed:
+        print(f"Failed to send {failed} of {len(locations)} location updates")
@@ -8,21 +8,47 @@
 # https://github.com/restatedev/examples/
 
 import os
-import requests
+from typing import Optional
+
+import httpx
 
 RESTAURANT_ENDPOINT = os.getenv("RESTAURANT_ENDPOINT", "http://localhost:5000")
 RESTAURANT_TOKEN = os.getenv("RESTAURANT_TOKEN")
 
+# The connections to the restaurant are kept alive and shared by all the workflows of the worker.
+# HTTP/2 gets negotiated for https endpoints, which then multiplex all requests over a single connection.
+RESTAURANT_HTTP2 = os.getenv("RESTAURANT_HTTP2", "true").lower() == "true"
+RESTAURANT_MAX_CONNECTIONS = int(os.getenv("RESTAURANT_MAX_CONNECTIONS", "100"))
+RESTAURANT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("RESTAURANT_MAX_KEEPALIVE_CONNECTIONS", "20"))
+RESTAURANT_TIMEOUT_SECONDS = float(os.getenv("RESTAURANT_TIMEOUT_SECONDS", "10"))
+
 
 class RestaurantClient:
-    def prepare(self, order_id: str) -> None:
-        headers = {
-            "Content-Type": "application/json",
-        }
-        if RESTAURANT_TOKEN:
-            headers["Authorization"] = f"Bearer {RESTAURANT_TOKEN}"
-        requests.post(
-            f"{RESTAURANT_ENDPOINT}/prepare",
-            json={"order_id": order_id},
-            headers=headers
-        )
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        # Created on first use, so that it belongs to the event loop of the worker
+        if self._client is None:
+            headers = {"Content-Type": "application/json"}
+            if RESTAURANT_TOKEN:
+                headers["Authorization"] = f"Bearer {RESTAURANT_TOKEN}"
+            self._client = httpx.AsyncClient(
+                base_url=RESTAURANT_ENDPOINT,
+                headers=headers,
+                http2=RESTAURANT_HTTP2,
+                limits=httpx.Limits(max_connections=RESTAURANT_MAX_CONNECTIONS,
+                                    max_keepalive_connections=RESTAURANT_MAX_KEEPALIVE_CONNECTIONS),
+                timeout=RESTAURANT_TIMEOUT_SECONDS
+            )
+        return self._client
+
+    async def prepare(self, order_id: str) -> None:
+        response = await self._http_client().post("/prepare", json={"order_id": order_id})
+        # Failing the ctx.run makes Restate retry the request
+        response.raise_for_status()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,49 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import os
+from typing import Optional
+
+import httpx
+
+from ordering.types.types import OrderStatusUpdate
+
+# The status stream sidecar (ordering/status_stream.py); publishing is disabled when not set
+STATUS_STREAM_ENDPOINT = os.getenv("STATUS_STREAM_ENDPOINT")
+STATUS_STREAM_TIMEOUT_SECONDS = float(os.getenv("STATUS_STREAM_TIMEOUT_SECONDS", "2"))
+
+
+class StatusStreamClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def enabled(self) -> bool:
+        return STATUS_STREAM_ENDPOINT is not None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        # Created on first use, so that it belongs to the event loop of the worker
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=STATUS_STREAM_ENDPOINT or "",
+                                             timeout=STATUS_STREAM_TIMEOUT_SECONDS)
+        return self._client
+
+    async def publish(self, order_id: str, update: OrderStatusUpdate) -> None:
+        # The stream is best effort: clients that miss an update get the full status with the next one,
+        # so a failure must not block the order status object with retries
+        try:
+            response = await self._http_client().post(f"/orders/{order_id}", json=update)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Failed to publish the status of order {order_id}: {e!r}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,48 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import os
+from datetime import timedelta
+
+from restate import ObjectContext, ObjectSharedContext, VirtualObject
+
+from ordering.types.types import ShardBacklogSize
+
+# How long the order workflow waits before asking again whether the region takes new deliveries
+ADMISSION_RETRY_INTERVAL = timedelta(milliseconds=int(os.getenv("DELIVERY_ADMISSION_RETRY_MS", "5000")))
+# How long the order workflow holds a delivery back at most, before it rejects the order
+ADMISSION_MAX_WAIT = timedelta(milliseconds=int(os.getenv("DELIVERY_ADMISSION_MAX_WAIT_MS", "60000")))
+
+# One object per region, keeping the number of deliveries waiting for a driver in every driver matcher shard,
+# so that the order workflow can hold back new deliveries while the region has too many of them.
+delivery_admission = VirtualObject("delivery-admission")
+
+SHARD_BACKLOGS = "SHARD_BACKLOGS"
+
+
+# Called by the driver matcher shards when the size of their backlog changes
+@delivery_admission.handler()
+async def set_shard_backlog(ctx: ObjectContext, backlog: ShardBacklogSize):
+    backlogs: dict[str, int] = await ctx.get(SHARD_BACKLOGS) or {}
+    if backlog["pending_deliveries"]:
+        backlogs[backlog["shard"]] = backlog["pending_deliveries"]
+    else:
+        backlogs.pop(backlog["shard"], None)
+
+    if backlogs:
+        ctx.set(SHARD_BACKLOGS, backlogs)
+    else:
+        ctx.clear(SHARD_BACKLOGS)
+
+
+@delivery_admission.handler(kind="shared")
+async def get_backlog(ctx: ObjectSharedContext) -> int:
+    """Number of deliveries waiting for a driver in the region."""
+    backlogs: dict[str, int] = await ctx.get(SHARD_BACKLOGS) or {}
+    return sum(backlogs.values())
@@ -1,25 +1,38 @@
+import os
+
 from restate import VirtualObject, ObjectContext
 from restate.exceptions import TerminalError
 
-from ordering.order_workflow import Order
 import ordering.order_workflow as order_workflow
 import ordering.driver_matcher as driver_matcher
 import ordering.driver_digital_twin as driver_digital_twin
 import ordering.order_status as order_status
 from ordering.utils import geo
-from ordering.types.types import DeliveryInformation, Location
+from ordering.types.types import DeliveryInformation, Location, Order, StackedLocation
+from ordering.types.serde import CONTENT_TYPE, DELIVERY_INFORMATION_SERDE, LOCATION_SERDE
 
 from ordering.types.types import DEMO_REGION
 
 delivery_manager = VirtualObject("delivery-manager")
 
 DELIVERY_INFO = "DELIVERY_INFO"
+LAST_ETA = "LAST_ETA"
+
+# Location updates are coalesced: the customer's ETA only gets updated when it changed by at least this much,
+# and the digital twin forwards the driver's location at most once per interval.
+ETA_UPDATE_THRESHOLD_MILLIS = int(os.getenv("ETA_UPDATE_THRESHOLD_MS", "5000"))
+LOCATION_UPDATE_MIN_INTERVAL_MILLIS = int(os.getenv("LOCATION_UPDATE_MIN_INTERVAL_MS", "5000"))
+
+# Orders of the demo come from random restaurant locations. Stacking needs the orders of a restaurant to share
+# its location, so with stacking every restaurant gets a fixed location, derived from its id.
+FIXED_RESTAURANT_LOCATIONS = os.getenv("FIXED_RESTAURANT_LOCATIONS",
+                                       str(driver_matcher.MAX_STACKED_DELIVERIES > 1)).lower() == "true"
 
 
 @delivery_manager.handler()
 async def start(ctx: ObjectContext, order: Order):
     restaurant_location, customer_location = await ctx.run("locations", lambda: [
-        geo.random_location(),
+        geo.restaurant_location(order["restaurant_id"]) if FIXED_RESTAURANT_LOCATIONS else geo.random_location(),
         geo.random_location()
     ])
 
@@ -30,58 +43,108 @@ async def start(ctx: ObjectContext, order: Order):
         "restaurant_location": restaurant_location,
         "customer_location": customer_location,
         "order_picked_up": False,
+        # The restaurant-to-customer leg of the ETA never changes
+        "restaurant_to_customer_eta_millis": geo.calculate_eta_millis(restaurant_location, customer_location),
     }
-    ctx.set(DELIVERY_INFO, delivery_info)
-
-    # Acquire a driver
-    driver_promise_id, driver_promise = ctx.awakeable()
-
-    ctx.object_send(driver_matcher.request_driver_for_delivery, DEMO_REGION, {"promise_id": driver_promise_id})
-
-    # Wait until the driver pool service has located a driver
-    driver_id = await driver_promise
-
-    # Assign the driver to the job
-    await ctx.object_call(driver_digital_twin.assign_delivery_job, driver_id, {
-        "delivery_id": ctx.key(),
-        "restaurant_id": order["restaurant_id"],
-        "restaurant_location": delivery_info["restaurant_location"],
-        "customer_location": delivery_info["customer_location"],
-    })
+    ctx.set(DELIVERY_INFO, delivery_info, serde=DELIVERY_INFORMATION_SERDE)
+
+    while True:
+        # Acquire a driver
+        driver_promise_id, driver_promise = ctx.awakeable()
+
+        matcher_key = driver_matcher.shard_key(DEMO_REGION, restaurant_location)
+        ctx.object_send(driver_matcher.request_driver_for_delivery, matcher_key, {
+            "promise_id": driver_promise_id,
+            "restaurant_location": restaurant_location,
+        })
+
+        # Wait until the driver pool service has located a driver
+        try:
+            driver_id = await driver_promise
+        except TerminalError:
+            # The driver matcher dropped the request: its backlog was full, or no driver came in time
+            ctx.clear(DELIVERY_INFO)
+            ctx.workflow_send(order_workflow.signal_no_driver, order["id"], arg=None)
+            return
+
+        # Assign the driver to the job
+        try:
+            await ctx.object_call(driver_digital_twin.assign_delivery_job, driver_id, {
+                "delivery_id": ctx.key(),
+                "restaurant_id": order["restaurant_id"],
+                "restaurant_location": delivery_info["restaurant_location"],
+                "customer_location": delivery_info["customer_location"],
+            })
+            break
+        except TerminalError:
+            if driver_matcher.MAX_STACKED_DELIVERIES == 1:
+                raise
+            # The driver of the restaurant's stack left the restaurant in the meantime: ask for another driver
 
     await ctx.workflow_call(order_workflow.selected_driver, order["id"], arg=None)
 
 
 @delivery_manager.handler()
 async def notify_delivery_pickup(ctx: ObjectContext):
-    delivery = await ctx.get(DELIVERY_INFO)
+    delivery = await ctx.get(DELIVERY_INFO, serde=DELIVERY_INFORMATION_SERDE)
     if delivery is None:
         raise TerminalError("No delivery information found")
 
     delivery["order_picked_up"] = True
-    ctx.set(DELIVERY_INFO, delivery)
+    ctx.set(DELIVERY_INFO, delivery, serde=DELIVERY_INFORMATION_SERDE)
 
     ctx.workflow_send(order_workflow.signal_driver_at_restaurant, delivery["order_id"], arg=None)
 
 
 @delivery_manager.handler()
 async def notify_delivery_delivered(ctx: ObjectContext):
-    delivery = await ctx.get(DELIVERY_INFO)
+    delivery = await ctx.get(DELIVERY_INFO, serde=DELIVERY_INFORMATION_SERDE)
     if delivery is None:
         raise TerminalError("No delivery information found")
     ctx.clear(DELIVERY_INFO)
+    ctx.clear(LAST_ETA)
 
     ctx.workflow_send(order_workflow.signal_delivery_finished, delivery["order_id"], arg=None)
 
 
-@delivery_manager.handler("handleDriverLocationUpdate")
+@delivery_manager.handler("handleDriverLocationUpdate", accept=CONTENT_TYPE, input_serde=LOCATION_SERDE)
 async def handle_driver_location_update(ctx: ObjectContext, location: Location):
-    delivery = await ctx.get(DELIVERY_INFO)
+    delivery = await ctx.get(DELIVERY_INFO, serde=DELIVERY_INFORMATION_SERDE)
+    if delivery is None:
+        raise TerminalError("No delivery information found")
+    await update_eta(ctx, delivery, calculate_eta_millis(delivery, location, []))
 
-    if delivery["order_picked_up"]:
-        eta = geo.calculate_eta_millis(location, delivery["customer_location"])
-    else:
-        eta = (geo.calculate_eta_millis(location, delivery["restaurant_location"]) +
-               geo.calculate_eta_millis(delivery["restaurant_location"], delivery["customer_location"]))
 
+@delivery_manager.handler()
+async def handle_stacked_location_update(ctx: ObjectContext, update: StackedLocation):
+    """Location update of a driver with a stack of deliveries, who stops at the customers in stops_before first."""
+    delivery = await ctx.get(DELIVERY_INFO, serde=DELIVERY_INFORMATION_SERDE)
+    if delivery is None:
+        raise TerminalError("No delivery information found")
+    await update_eta(ctx, delivery, calculate_eta_millis(delivery, update["location"], update["stops_before"]))
+
+
+def calculate_eta_millis(delivery: DeliveryInformation, location: Location, stops_before: list[Location]) -> float:
+    if delivery["order_picked_up"]:
+        return geo.calculate_route_eta_millis([location, *stops_before, delivery["customer_location"]])
+    if not stops_before:
+        return geo.calculate_eta_millis(location, delivery["restaurant_location"]) + \
+            restaurant_to_customer_eta_millis(delivery)
+    return geo.calculate_route_eta_millis(
+        [location, delivery["restaurant_location"], *stops_before, delivery["customer_location"]])
+
+
+def restaurant_to_customer_eta_millis(delivery: DeliveryInformation) -> float:
+    eta = delivery.get("restaurant_to_customer_eta_millis")
+    if eta is None:
+        # Deliveries that were stored before the ETA of the leg was stored with them
+        return geo.calculate_eta_millis(delivery["restaurant_location"], delivery["customer_location"])
+    return eta
+
+
+async def update_eta(ctx: ObjectContext, delivery: DeliveryInformation, eta: float):
+    last_eta = await ctx.get(LAST_ETA)
+    if last_eta is not None and abs(eta - last_eta) < ETA_UPDATE_THRESHOLD_MILLIS:
+        return
+    ctx.set(LAST_ETA, eta)
     ctx.object_send(order_status.set_eta, delivery["order_id"], eta)
@@ -7,16 +7,31 @@
 # in the root directory of this repository or package or at
 # https://github.com/restatedev/examples/
 
+import time
+from typing import Optional
+
 from restate import VirtualObject, ObjectContext
 from restate.exceptions import TerminalError
-from ordering.types.types import Location, DriverStatus, DeliveryRequest
+from ordering.types.types import Location, DriverStatus, DeliveryRequest, AvailableDriver, ForwardedLocation, \
+    RestaurantStack, StackedLocation, DriverStatusChange, DEMO_REGION
+from ordering.types.serde import CONTENT_TYPE, DELIVERY_REQUEST_SERDE, LOCATION_SERDE
+from ordering.utils import geo
 import ordering.driver_matcher as driver_matcher
 import ordering.delivery_manager as delivery_manager
+import ordering.fleet_aggregates as fleet_aggregates
 driver_digital_twin = VirtualObject("driver-digital-twin")
 
 DRIVER_STATUS = "driver-status"
 ASSIGNED_DELIVERY = "assigned-delivery"
 DRIVER_LOCATION = "driver-location"
+WORK_AWAKEABLE = "work-awakeable"
+LAST_FORWARDED_LOCATION = "last-forwarded-location"
+# With stacking, the deliveries the driver does after the assigned one, all from the same restaurant
+STACKED_DELIVERIES = "stacked-deliveries"
+PICKED_UP = "picked-up"
+# With the fleet aggregates, the region the driver is counted in, and its cell on the heatmap of available drivers
+DRIVER_REGION = "driver-region"
+HEATMAP_CELL = "heatmap-cell"
 DriverDeliveryMatcherObject = "driver-delivery-matcher"
 DeliveryManagerObject = "delivery-manager"
 
@@ -24,47 +39,174 @@ DeliveryManagerObject = "delivery-manager"
 @driver_digital_twin.handler()
 async def set_driver_available(ctx: ObjectContext, region: str):
     await check_if_driver_in_expected_state(DriverStatus.IDLE, ctx)
-    ctx.set(DRIVER_STATUS, DriverStatus.WAITING_FOR_WORK)
-    ctx.object_send(driver_matcher.set_driver_available, region, ctx.key())
+    current_location = await ctx.get(DRIVER_LOCATION, serde=LOCATION_SERDE)
+    await set_status(ctx, DriverStatus.WAITING_FOR_WORK, region, current_location)
+    ctx.object_send(driver_matcher.set_driver_available, driver_matcher.shard_key(region, current_location),
+                    AvailableDriver(driver_id=ctx.key(), location=current_location))
 
 
 @driver_digital_twin.handler()
 async def get_assigned_delivery(ctx: ObjectContext):
-    return await ctx.get(ASSIGNED_DELIVERY)
+    return await ctx.get(ASSIGNED_DELIVERY, serde=DELIVERY_REQUEST_SERDE)
 
 
 @driver_digital_twin.handler()
+async def notify_when_assigned(ctx: ObjectContext, awakeable_id: str):
+    # The driver's mobile app waits on this awakeable, instead of polling for work
+    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY, serde=DELIVERY_REQUEST_SERDE)
+    if assigned_delivery:
+        ctx.resolve_awakeable(awakeable_id, assigned_delivery)
+        return
+    ctx.set(WORK_AWAKEABLE, awakeable_id)
+
+
+@driver_digital_twin.handler(accept=CONTENT_TYPE, input_serde=DELIVERY_REQUEST_SERDE)
 async def assign_delivery_job(ctx: ObjectContext, delivery_request: DeliveryRequest):
+    if driver_matcher.MAX_STACKED_DELIVERIES > 1 and await ctx.get(DRIVER_STATUS) == DriverStatus.DELIVERING:
+        await stack_delivery_job(ctx, delivery_request)
+        return
+
     await check_if_driver_in_expected_state(DriverStatus.WAITING_FOR_WORK, ctx)
-    ctx.set(DRIVER_STATUS, DriverStatus.DELIVERING)
-    ctx.set(ASSIGNED_DELIVERY, delivery_request)
-    current_location = await ctx.get(DRIVER_LOCATION)
+    await set_status(ctx, DriverStatus.DELIVERING)
+    ctx.set(ASSIGNED_DELIVERY, delivery_request, serde=DELIVERY_REQUEST_SERDE)
+
+    work_awakeable = await ctx.get(WORK_AWAKEABLE)
+    if work_awakeable:
+        ctx.clear(WORK_AWAKEABLE)
+        ctx.resolve_awakeable(work_awakeable, delivery_request)
+
+    current_location = await ctx.get(DRIVER_LOCATION, serde=LOCATION_SERDE)
     if current_location:
-        ctx.object_send(delivery_manager.handle_driver_location_update, delivery_request["delivery_id"], current_location)
+        ctx.clear(LAST_FORWARDED_LOCATION)
+        await forward_location(ctx, delivery_request, current_location)
+
+
+async def stack_delivery_job(ctx: ObjectContext, delivery_request: DeliveryRequest):
+    """Adds a delivery of the same restaurant to the driver's stack, while the driver is on its way to the restaurant."""
+    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY, serde=DELIVERY_REQUEST_SERDE)
+    stacked_deliveries: list[DeliveryRequest] = await ctx.get(STACKED_DELIVERIES) or []
+    if assigned_delivery is None or await ctx.get(PICKED_UP) \
+            or assigned_delivery["restaurant_location"] != delivery_request["restaurant_location"] \
+            or len(stacked_deliveries) + 1 >= driver_matcher.MAX_STACKED_DELIVERIES:
+        raise TerminalError(f"Driver cannot take delivery {delivery_request['delivery_id']} anymore")
+    stacked_deliveries.append(delivery_request)
+    ctx.set(STACKED_DELIVERIES, stacked_deliveries)
+
+    current_location = await ctx.get(DRIVER_LOCATION, serde=LOCATION_SERDE)
+    if current_location:
+        ctx.clear(LAST_FORWARDED_LOCATION)
+        await forward_location(ctx, assigned_delivery, current_location)
 
 
 @driver_digital_twin.handler()
 async def notify_delivery_pickup(ctx: ObjectContext):
     await check_if_driver_in_expected_state(DriverStatus.DELIVERING, ctx)
-    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY)
+    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY, serde=DELIVERY_REQUEST_SERDE)
+    if assigned_delivery is None:
+        raise TerminalError("No assigned delivery found")
     ctx.object_send(delivery_manager.notify_delivery_pickup, assigned_delivery["delivery_id"], arg=None)
+    if driver_matcher.MAX_STACKED_DELIVERIES == 1:
+        return
+
+    ctx.set(PICKED_UP, True)
+    for delivery in await ctx.get(STACKED_DELIVERIES) or []:
+        ctx.object_send(delivery_manager.notify_delivery_pickup, delivery["delivery_id"], arg=None)
+    restaurant_location = assigned_delivery["restaurant_location"]
+    ctx.object_send(driver_matcher.close_stack, driver_matcher.shard_key(DEMO_REGION, restaurant_location),
+                    RestaurantStack(driver_id=ctx.key(), restaurant_location=restaurant_location, free_slots=0))
 
 
 @driver_digital_twin.handler()
-async def notify_delivery_delivered(ctx: ObjectContext):
+async def notify_delivery_delivered(ctx: ObjectContext) -> Optional[DeliveryRequest]:
+    """Returns the next delivery of the driver's stack, or None when the driver is done."""
     await check_if_driver_in_expected_state(DriverStatus.DELIVERING, ctx)
-    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY)
-    ctx.clear(ASSIGNED_DELIVERY)
+    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY, serde=DELIVERY_REQUEST_SERDE)
+    if assigned_delivery is None:
+        raise TerminalError("No assigned delivery found")
+    ctx.clear(LAST_FORWARDED_LOCATION)
     ctx.object_send(delivery_manager.notify_delivery_delivered, assigned_delivery["delivery_id"], arg=None)
-    ctx.set(DRIVER_STATUS, DriverStatus.IDLE)
+
+    stacked_deliveries: list[DeliveryRequest] = []
+    if driver_matcher.MAX_STACKED_DELIVERIES > 1:
+        stacked_deliveries = await ctx.get(STACKED_DELIVERIES) or []
+    if stacked_deliveries:
+        next_delivery = stacked_deliveries.pop(0)
+        ctx.set(ASSIGNED_DELIVERY, next_delivery, serde=DELIVERY_REQUEST_SERDE)
+        if stacked_deliveries:
+            ctx.set(STACKED_DELIVERIES, stacked_deliveries)
+        else:
+            ctx.clear(STACKED_DELIVERIES)
+        return next_delivery
+
+    ctx.clear(ASSIGNED_DELIVERY)
+    ctx.clear(PICKED_UP)
+    await set_status(ctx, DriverStatus.IDLE)
+    return None
 
 
 @driver_digital_twin.handler("handleDriverLocationUpdateEvent")
 async def handle_driver_location_update_event(ctx: ObjectContext, location: Location):
-    ctx.set(DRIVER_LOCATION, location)
-    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY)
+    ctx.set(DRIVER_LOCATION, location, serde=LOCATION_SERDE)
+    assigned_delivery = await ctx.get(ASSIGNED_DELIVERY, serde=DELIVERY_REQUEST_SERDE)
     if assigned_delivery:
+        await forward_location(ctx, assigned_delivery, location)
+
+
+async def forward_location(ctx: ObjectContext, assigned_delivery: DeliveryRequest, location: Location):
+    now = await ctx.run("timestamp", lambda: round(time.time() * 1000))
+    last_forwarded: ForwardedLocation | None = await ctx.get(LAST_FORWARDED_LOCATION)
+    if last_forwarded is not None:
+        # Moving less than the ETA threshold cannot change the ETA by more than the threshold
+        too_recent = now - last_forwarded["timestamp_millis"] < delivery_manager.LOCATION_UPDATE_MIN_INTERVAL_MILLIS
+        too_close = geo.calculate_eta_millis(last_forwarded["location"], location) < \
+            delivery_manager.ETA_UPDATE_THRESHOLD_MILLIS
+        if too_recent or too_close:
+            return
+
+    ctx.set(LAST_FORWARDED_LOCATION, ForwardedLocation(location=location, timestamp_millis=now))
+    stacked_deliveries: list[DeliveryRequest] = []
+    if driver_matcher.MAX_STACKED_DELIVERIES > 1:
+        stacked_deliveries = await ctx.get(STACKED_DELIVERIES) or []
+    if not stacked_deliveries:
         ctx.object_send(delivery_manager.handle_driver_location_update, assigned_delivery["delivery_id"], location)
+        return
+
+    # Every delivery of the stack gets the ETA of its own stop, after the customers before it
+    deliveries = [assigned_delivery] + stacked_deliveries
+    for i, delivery in enumerate(deliveries):
+        ctx.object_send(delivery_manager.handle_stacked_location_update, delivery["delivery_id"],
+                        StackedLocation(location=location,
+                                        stops_before=[before["customer_location"] for before in deliveries[:i]]))
+
+
+async def set_status(ctx: ObjectContext, status: DriverStatus, region: Optional[str] = None,
+                     location: Optional[Location] = None):
+    """Sets the driver's status, and counts the transition in the fleet aggregates of the driver's region."""
+    if fleet_aggregates.FLEET_AGGREGATES:
+        counted_region: Optional[str] = await ctx.get(DRIVER_REGION)
+        previous_status = await ctx.get(DRIVER_STATUS) if counted_region else None
+        previous_cell: Optional[str] = await ctx.get(HEATMAP_CELL)
+        # Only available drivers are on the heatmap: they stay where they are until they get a delivery
+        cell = fleet_aggregates.heatmap_cell(location) \
+            if status == DriverStatus.WAITING_FOR_WORK and location is not None else None
+        if cell is not None:
+            ctx.set(HEATMAP_CELL, cell)
+        elif previous_cell is not None:
+            ctx.clear(HEATMAP_CELL)
+
+        if region is not None and region != counted_region:
+            # The driver moves to another region: it leaves the counts of the previous one
+            if counted_region:
+                ctx.object_send(fleet_aggregates.count_status_change, counted_region, DriverStatusChange(
+                    previous_status=previous_status, status=None, previous_cell=previous_cell, cell=None))
+                previous_status, previous_cell = None, None
+            ctx.set(DRIVER_REGION, region)
+            counted_region = region
+        # Drivers that have not been available since the aggregates were enabled are not counted yet
+        if counted_region:
+            ctx.object_send(fleet_aggregates.count_status_change, counted_region, DriverStatusChange(
+                previous_status=previous_status, status=status, previous_cell=previous_cell, cell=cell))
+    ctx.set(DRIVER_STATUS, status)
 
 
 async def check_if_driver_in_expected_state(expected_status: DriverStatus, ctx: ObjectContext):
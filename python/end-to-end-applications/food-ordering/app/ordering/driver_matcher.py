@@ -1,44 +1,487 @@
+import math
+import os
+import time
+from datetime import timedelta
+
 from restate import VirtualObject, ObjectContext
 
-from ordering.types.types import PendingDelivery
+import ordering.delivery_admission as delivery_admission
+from ordering.types.types import AvailableDriver, LocatedDriver, Location, PendingDelivery, RestaurantStack, \
+    ShardBacklog, ShardBacklogSize
+from ordering.utils import geo
+from ordering.utils.assignment import min_cost_assignment
+from ordering.utils.state_queue import StateQueue
+
+# "fifo": hand out the driver that has been waiting the longest
+# "nearest": hand out the available driver closest to the restaurant
+# "batch": collect deliveries and drivers for BATCH_WINDOW, then assign them with the lowest total ETA
+MATCHING_MODE = os.getenv("DRIVER_MATCHING_MODE", "fifo")
+BATCH_WINDOW = timedelta(milliseconds=int(os.getenv("DRIVER_MATCHER_BATCH_WINDOW_MS", "2000")))
+MAX_BATCH_SIZE = int(os.getenv("DRIVER_MATCHER_MAX_BATCH_SIZE", "200"))
+
+# Each region is split in SHARDS_PER_SIDE x SHARDS_PER_SIDE matcher objects.
+# Restate runs the calls for one object key one at a time, so this is the number of matches that can run in parallel.
+SHARDS_PER_SIDE = int(os.getenv("DRIVER_MATCHER_SHARDS_PER_SIDE", "4"))
+# Number of rings of neighboring shards a shard without drivers can take drivers from, by default the adjacent shards.
+# Every ring adds invocations to the requests that find no driver, which is most of them when drivers are scarce.
+# Deliveries that still find no driver wait in the backlog of their shard, which is passed on ring by ring
+# until it reaches a shard with an idle driver to lend.
+OVERFLOW_RINGS = int(os.getenv("DRIVER_MATCHER_OVERFLOW_RINGS", "1"))
+
+# A driver on its way to a restaurant takes up to MAX_STACKED_DELIVERIES deliveries of that restaurant.
+# 1 disables stacking: every delivery gets its own driver.
+MAX_STACKED_DELIVERIES = int(os.getenv("MAX_STACKED_DELIVERIES", "1"))
+
+# Deliveries that wait longer than this for a driver are dropped, and their delivery manager gets told. 0 keeps them.
+PENDING_DELIVERY_TTL = timedelta(seconds=int(os.getenv("DRIVER_MATCHER_PENDING_TTL_SECONDS", "0")))
+# At most this many deliveries wait for a driver per region. 0 for no limit.
+# The order workflow holds back new deliveries while the region is at the limit, and a shard rejects the requests
+# that would take its own backlog above its share of it.
+MAX_BACKLOG = int(os.getenv("DRIVER_MATCHER_MAX_BACKLOG", "0"))
 
 driver_matcher = VirtualObject("driver-delivery-matcher")
 
 PENDING_DELIVERIES = "PENDING_DELIVERIES"
 AVAILABLE_DRIVERS = "AVAILABLE_DRIVERS"
+LOCATED_DRIVERS_COUNT = "LOCATED_DRIVERS_COUNT"
+NEIGHBORS_WITH_BACKLOG = "NEIGHBORS_WITH_BACKLOG"
+HAS_BACKLOG = "HAS_BACKLOG"
+RELAYED_BACKLOGS = "RELAYED_BACKLOGS"
+BATCH_SCHEDULED = "BATCH_SCHEDULED"
+STACK = "STACK"
+REPORTED_BACKLOG = "REPORTED_BACKLOG"
+EVICTION_SCHEDULED = "EVICTION_SCHEDULED"
 
 
 @driver_matcher.handler()
-async def set_driver_available(ctx: ObjectContext, driver_id: str):
-    pending_deliveries: list[PendingDelivery] = await ctx.get(PENDING_DELIVERIES) or []
-    if len(pending_deliveries) > 0:
-        next_delivery = pending_deliveries.pop(0)
-        ctx.set(PENDING_DELIVERIES, pending_deliveries)
+async def set_driver_available(ctx: ObjectContext, driver: AvailableDriver):
+    if MATCHING_MODE == "batch" and "overflow_shards" not in driver:
+        # The driver is assigned with the next batch of its own shard
+        await add_available_driver(ctx, driver)
+        await schedule_batch(ctx)
+        return
+
+    pending_deliveries = StateQueue(ctx, PENDING_DELIVERIES)
+    next_delivery: PendingDelivery | None = await pending_deliveries.pop()
+    if next_delivery is not None:
+        pending_count = await pending_deliveries.size()
+        if pending_count == 0:
+            await update_backlog(ctx, False)
+        elif driver.get("overflow_shards"):
+            # Still deliveries waiting: ask the shard this driver came from for another one
+            ctx.object_send(set_neighbor_backlog, driver["overflow_shards"][-1],
+                            ShardBacklog(shard=ctx.key(), has_pending_deliveries=True))
+        await report_backlog_size(ctx, pending_count)
 
-        # Notify that delivery is ongoing
-        ctx.resolve_awakeable(next_delivery["promise_id"], driver_id)
+        assign_driver(ctx, next_delivery, driver["driver_id"])
+        return
+
+    if "overflow_shards" not in driver:
+        # The driver arrives in its own shard: first visit the neighbors that have deliveries waiting
+        neighbors_with_backlog: list[str] = await ctx.get(NEIGHBORS_WITH_BACKLOG) or []
+        driver["overflow_shards"] = neighbors_with_backlog + [ctx.key()] if neighbors_with_backlog else []
+
+    # otherwise try the next shard, the last one is the driver's own shard
+    if driver["overflow_shards"]:
+        ctx.object_send(set_driver_available, driver["overflow_shards"].pop(0), driver)
         return
 
     # otherwise remember driver as available
-    available_drivers: list[str] = await ctx.get(AVAILABLE_DRIVERS) or []
-    available_drivers.append(driver_id)
-    ctx.set(AVAILABLE_DRIVERS, available_drivers)
+    await add_available_driver(ctx, driver)
 
 
 @driver_matcher.handler()
 async def request_driver_for_delivery(ctx: ObjectContext, request: PendingDelivery):
+    if "overflow_shards" not in request and await take_stacked_driver(ctx, request):
+        return
+
+    if MATCHING_MODE == "batch":
+        if await add_pending_delivery(ctx, request):
+            await schedule_batch(ctx)
+        return
+
+    if "overflow_shards" not in request:
+        # The request arrives in its own shard: if there is no driver here, try the neighbors and then come back
+        neighbors = neighbor_shards(ctx.key())
+        request["overflow_shards"] = neighbors + [ctx.key()] if neighbors else []
+
     # if a driver is available, assign the delivery right away
-    available_drivers: list[str] = await ctx.get(AVAILABLE_DRIVERS) or []
-    if len(available_drivers) > 0:
-        # Remove driver from the pool
-        next_available_driver = available_drivers.pop(0)
-        ctx.set(AVAILABLE_DRIVERS, available_drivers)
+    next_available_driver = await take_available_driver(ctx, request.get("restaurant_location"))
+    if next_available_driver is not None:
+        assign_driver(ctx, request, next_available_driver["driver_id"])
+        return
 
-        # Notify that delivery is ongoing
-        ctx.resolve_awakeable(request["promise_id"], next_available_driver)
+    # otherwise try to take a driver from the next shard, the last one is the request's own shard
+    if request["overflow_shards"]:
+        ctx.object_send(request_driver_for_delivery, request["overflow_shards"].pop(0), request)
         return
 
     # otherwise store the delivery request until a new driver becomes available
-    pending_deliveries: list[PendingDelivery] = await ctx.get(PENDING_DELIVERIES) or []
-    pending_deliveries.append(request)
-    ctx.set(PENDING_DELIVERIES, pending_deliveries)
+    del request["overflow_shards"]
+    if await add_pending_delivery(ctx, request):
+        await update_backlog(ctx, True)
+
+
+@driver_matcher.handler()
+async def assign_batch(ctx: ObjectContext):
+    ctx.clear(BATCH_SCHEDULED)
+    pending_deliveries = StateQueue(ctx, PENDING_DELIVERIES)
+    available_drivers = StateQueue(ctx, AVAILABLE_DRIVERS)
+
+    # Take the oldest deliveries, at most as many as there are drivers, so that every one of them gets a driver.
+    # The drivers stay in the queue: only the assigned ones are removed, the others keep their place for the next batch.
+    drivers: list[AvailableDriver] = await available_drivers.peek_many(MAX_BATCH_SIZE)
+    deliveries: list[PendingDelivery] = await pending_deliveries.pop_many(len(drivers))
+
+    if deliveries:
+        center = shard_center(ctx.key())
+        eta = geo.calculate_eta_millis_matrix(
+            [delivery.get("restaurant_location", center) for delivery in deliveries],
+            [driver["location"] or center for driver in drivers])
+        delivery_indices, driver_indices = min_cost_assignment(eta)
+
+        for delivery_index, driver_index in zip(delivery_indices, driver_indices):
+            assign_driver(ctx, deliveries[delivery_index], drivers[driver_index]["driver_id"])
+
+        await available_drivers.remove_many(set(driver_indices.tolist()))
+
+    pending_count = await pending_deliveries.size()
+    deliveries_left = pending_count > 0
+    drivers_left = await available_drivers.size() > 0
+    await update_backlog(ctx, deliveries_left and not drivers_left)
+    await report_backlog_size(ctx, pending_count)
+    if deliveries_left and drivers_left:
+        # More deliveries and drivers than fit in one batch
+        await schedule_batch(ctx)
+
+
+@driver_matcher.handler()
+async def set_neighbor_backlog(ctx: ObjectContext, backlog: ShardBacklog):
+    """
+    A shard (not necessarily an adjacent one) starts or stops having deliveries waiting for a driver.
+    The drivers that become available here visit it first, until its backlog is gone.
+    """
+    neighbors: list[str] = await ctx.get(NEIGHBORS_WITH_BACKLOG) or []
+    relayed: list[str] = await ctx.get(RELAYED_BACKLOGS) or []
+    if not backlog["has_pending_deliveries"]:
+        if backlog["shard"] in neighbors:
+            neighbors.remove(backlog["shard"])
+            ctx.set(NEIGHBORS_WITH_BACKLOG, neighbors)
+        if backlog["shard"] in relayed:
+            relayed.remove(backlog["shard"])
+            ctx.set(RELAYED_BACKLOGS, relayed)
+            relay_backlog(ctx, backlog)
+        return
+
+    if backlog["shard"] not in neighbors:
+        neighbors.append(backlog["shard"])
+        ctx.set(NEIGHBORS_WITH_BACKLOG, neighbors)
+
+    # Lend one of our available drivers; it comes back here if the deliveries got assigned in the meantime
+    driver = await take_available_driver(ctx, shard_center(backlog["shard"]))
+    if driver is not None:
+        driver["overflow_shards"] = [ctx.key()]
+        ctx.object_send(set_driver_available, backlog["shard"], driver)
+        return
+
+    # otherwise pass the backlog on to the next ring of shards around the one that has it
+    if backlog["shard"] not in relayed:
+        relayed.append(backlog["shard"])
+        ctx.set(RELAYED_BACKLOGS, relayed)
+        relay_backlog(ctx, backlog)
+
+
+@driver_matcher.handler()
+async def open_stack(ctx: ObjectContext, stack: RestaurantStack):
+    ctx.set(stack_key(stack["restaurant_location"]), stack)
+
+
+@driver_matcher.handler()
+async def close_stack(ctx: ObjectContext, stack: RestaurantStack):
+    """The driver left the restaurant: later deliveries of the restaurant need another driver."""
+    key = stack_key(stack["restaurant_location"])
+    current: RestaurantStack | None = await ctx.get(key)
+    if current is not None and current["driver_id"] == stack["driver_id"]:
+        ctx.clear(key)
+
+
+@driver_matcher.handler()
+async def evict_stale_deliveries(ctx: ObjectContext):
+    ctx.clear(EVICTION_SCHEDULED)
+    pending_deliveries = StateQueue(ctx, PENDING_DELIVERIES)
+    now = await ctx.run("timestamp", now_millis)
+    if await evict_expired(ctx, pending_deliveries, now) > 0:
+        pending_count = await pending_deliveries.size()
+        if pending_count == 0:
+            await update_backlog(ctx, False)
+        await report_backlog_size(ctx, pending_count)
+
+    # Come back when the next delivery expires
+    head: PendingDelivery | None = await pending_deliveries.peek()
+    if head is not None:
+        expires_at = head.get("expires_at_millis", now + int(PENDING_DELIVERY_TTL.total_seconds() * 1000))
+        await schedule_eviction(ctx, timedelta(milliseconds=expires_at - now))
+
+
+def assign_driver(ctx: ObjectContext, delivery: PendingDelivery, driver_id: str):
+    # Notify that delivery is ongoing
+    ctx.resolve_awakeable(delivery["promise_id"], driver_id)
+    if MAX_STACKED_DELIVERIES == 1 or "restaurant_location" not in delivery:
+        return
+
+    # The driver takes the next deliveries of the restaurant, until it picked up the orders.
+    # The stack is kept by the shard of the restaurant, where the requests for its deliveries arrive.
+    restaurant_location = delivery["restaurant_location"]
+    stack = RestaurantStack(driver_id=driver_id, restaurant_location=restaurant_location,
+                            free_slots=MAX_STACKED_DELIVERIES - 1)
+    restaurant_shard = shard_key(parse_shard_key(ctx.key())[0], restaurant_location)
+    if restaurant_shard == ctx.key():
+        ctx.set(stack_key(restaurant_location), stack)
+    else:
+        ctx.object_send(open_stack, restaurant_shard, stack)
+
+
+async def take_stacked_driver(ctx: ObjectContext, request: PendingDelivery) -> bool:
+    """Assigns the delivery to the driver on its way to the same restaurant, if it has room for it."""
+    if MAX_STACKED_DELIVERIES == 1 or "restaurant_location" not in request:
+        return False
+    key = stack_key(request["restaurant_location"])
+    stack: RestaurantStack | None = await ctx.get(key)
+    if stack is None:
+        return False
+
+    if stack["free_slots"] > 1:
+        stack["free_slots"] -= 1
+        ctx.set(key, stack)
+    else:
+        ctx.clear(key)
+    # Notify that delivery is ongoing
+    ctx.resolve_awakeable(request["promise_id"], stack["driver_id"])
+    return True
+
+
+def stack_key(restaurant_location: Location) -> str:
+    return f"{STACK}_{restaurant_location['long']}_{restaurant_location['lat']}"
+
+
+def now_millis() -> int:
+    return round(time.time() * 1000)
+
+
+async def add_pending_delivery(ctx: ObjectContext, request: PendingDelivery) -> bool:
+    """Adds the delivery to the backlog of the shard, or rejects it if the backlog is full."""
+    pending_deliveries = StateQueue(ctx, PENDING_DELIVERIES)
+    if MAX_BACKLOG == 0 and not PENDING_DELIVERY_TTL:
+        await pending_deliveries.push(request)
+        return True
+
+    pending_count = await pending_deliveries.size()
+    max_pending = shard_max_backlog()
+    if PENDING_DELIVERY_TTL:
+        now = await ctx.run("timestamp", now_millis)
+        if MAX_BACKLOG > 0 and pending_count >= max_pending:
+            # Make room by dropping the deliveries that waited too long already
+            pending_count -= await evict_expired(ctx, pending_deliveries, now)
+        request["expires_at_millis"] = now + int(PENDING_DELIVERY_TTL.total_seconds() * 1000)
+
+    if MAX_BACKLOG > 0 and pending_count >= max_pending:
+        ctx.reject_awakeable(request["promise_id"], "No driver available: too many deliveries are waiting for a driver")
+        return False
+
+    await pending_deliveries.push(request)
+    if PENDING_DELIVERY_TTL:
+        await schedule_eviction(ctx, PENDING_DELIVERY_TTL)
+    await report_backlog_size(ctx, pending_count + 1)
+    return True
+
+
+def shard_max_backlog() -> int:
+    """The share of MAX_BACKLOG of every shard, so that all shards of a region together stay within it."""
+    return max(MAX_BACKLOG // (SHARDS_PER_SIDE * SHARDS_PER_SIDE), 1)
+
+
+async def evict_expired(ctx: ObjectContext, pending_deliveries: StateQueue, now: int) -> int:
+    """Drops the deliveries at the head of the backlog that waited too long, and returns how many."""
+    evicted = 0
+    while True:
+        delivery: PendingDelivery | None = await pending_deliveries.peek()
+        # Deliveries stored before the TTL was set never expire
+        if delivery is None or delivery.get("expires_at_millis", now + 1) > now:
+            return evicted
+        await pending_deliveries.pop()
+        ctx.reject_awakeable(delivery["promise_id"], "No driver available: the delivery waited too long for a driver")
+        evicted += 1
+
+
+async def schedule_eviction(ctx: ObjectContext, delay: timedelta):
+    if not await ctx.get(EVICTION_SCHEDULED):
+        ctx.set(EVICTION_SCHEDULED, True)
+        ctx.object_send(evict_stale_deliveries, ctx.key(), arg=None, send_delay=delay)
+
+
+async def report_backlog_size(ctx: ObjectContext, pending_count: int):
+    """Reports the size of this shard's backlog to the delivery admission object of the region."""
+    if MAX_BACKLOG == 0:
+        return
+    # Report in steps, so that a large backlog limit does not cost a message for every delivery.
+    # Rounded up, so that the sum over the shards of a region never falls below the actual backlog.
+    step = max(shard_max_backlog() // 4, 1)
+    reported = math.ceil(pending_count / step) * step
+    if reported == (await ctx.get(REPORTED_BACKLOG) or 0):
+        return
+    if reported:
+        ctx.set(REPORTED_BACKLOG, reported)
+    else:
+        ctx.clear(REPORTED_BACKLOG)
+
+    region = parse_shard_key(ctx.key())[0]
+    ctx.object_send(delivery_admission.set_shard_backlog, region,
+                    ShardBacklogSize(shard=ctx.key(), pending_deliveries=reported))
+
+
+async def schedule_batch(ctx: ObjectContext):
+    if not await ctx.get(BATCH_SCHEDULED):
+        ctx.set(BATCH_SCHEDULED, True)
+        ctx.object_send(assign_batch, ctx.key(), arg=None, send_delay=BATCH_WINDOW)
+
+
+async def update_backlog(ctx: ObjectContext, has_pending_deliveries: bool):
+    """Lets the neighboring shards know when this shard starts or stops having deliveries waiting for a driver."""
+    if bool(await ctx.get(HAS_BACKLOG)) == has_pending_deliveries:
+        return
+    if has_pending_deliveries:
+        ctx.set(HAS_BACKLOG, True)
+    else:
+        ctx.clear(HAS_BACKLOG)
+
+    for neighbor in neighbor_shards(ctx.key()):
+        ctx.object_send(set_neighbor_backlog, neighbor,
+                        ShardBacklog(shard=ctx.key(), has_pending_deliveries=has_pending_deliveries))
+
+
+def relay_backlog(ctx: ObjectContext, backlog: ShardBacklog):
+    for shard in relay_shards(ctx.key(), backlog["shard"]):
+        ctx.object_send(set_neighbor_backlog, shard, backlog)
+
+
+async def add_available_driver(ctx: ObjectContext, driver: AvailableDriver):
+    if MATCHING_MODE == "nearest" and driver["location"] is not None:
+        await add_to_grid(ctx, driver["driver_id"], driver["location"])
+    else:
+        await StateQueue(ctx, AVAILABLE_DRIVERS).push(AvailableDriver(driver_id=driver["driver_id"],
+                                                                      location=driver["location"]))
+
+
+async def take_available_driver(ctx: ObjectContext, location: Location | None) -> AvailableDriver | None:
+    if MATCHING_MODE == "nearest" and location is not None:
+        nearest = await take_nearest_from_grid(ctx, location)
+        if nearest is not None:
+            return AvailableDriver(driver_id=nearest["driver_id"], location=nearest["location"])
+
+    return await StateQueue(ctx, AVAILABLE_DRIVERS).pop()
+
+
+# A region is split in square shards, each handled by the matcher object with key "<region>/<x>_<y>".
+# When a shard runs out of drivers, its requests overflow to the shards in the surrounding rings,
+# and its backlog is passed on ring by ring until a shard with an idle driver lends it.
+
+def shard_key(region: str, location: Location | None) -> str:
+    """Key of the matcher object for the location, or for the center of the region if the location is unknown."""
+    if location is None:
+        location = Location(long=(geo.long_min + geo.long_max) / 2, lat=(geo.lat_min + geo.lat_max) / 2)
+    x = int((location["long"] - geo.long_min) / (geo.long_max - geo.long_min) * SHARDS_PER_SIDE)
+    y = int((location["lat"] - geo.lat_min) / (geo.lat_max - geo.lat_min) * SHARDS_PER_SIDE)
+    return f"{region}/{clamp_shard(x)}_{clamp_shard(y)}"
+
+
+def clamp_shard(i: int) -> int:
+    return min(max(i, 0), SHARDS_PER_SIDE - 1)
+
+
+def parse_shard_key(key: str) -> tuple[str, int, int]:
+    region, shard = key.rsplit("/", 1)
+    x, y = shard.split("_")
+    return region, int(x), int(y)
+
+
+def shard_center(key: str) -> Location:
+    _, x, y = parse_shard_key(key)
+    return Location(long=geo.long_min + (x + 0.5) * (geo.long_max - geo.long_min) / SHARDS_PER_SIDE,
+                    lat=geo.lat_min + (y + 0.5) * (geo.lat_max - geo.lat_min) / SHARDS_PER_SIDE)
+
+
+def neighbor_shards(key: str) -> list[str]:
+    region, x, y = parse_shard_key(key)
+    return [f"{region}/{nx}_{ny}"
+            for ring in range(1, OVERFLOW_RINGS + 1)
+            for nx, ny in geo.ring_cells((x, y), ring)
+            if 0 <= nx < SHARDS_PER_SIDE and 0 <= ny < SHARDS_PER_SIDE]
+
+
+def relay_shards(key: str, origin: str) -> list[str]:
+    """
+    The adjacent shards one ring further away from the origin shard, that this shard passes the origin's backlog on to.
+    Every shard gets it from a single shard, the adjacent one towards the origin,
+    and the shards up to OVERFLOW_RINGS away get it from the origin itself.
+    """
+    region, x, y = parse_shard_key(key)
+    _, origin_x, origin_y = parse_shard_key(origin)
+    if max(abs(x - origin_x), abs(y - origin_y)) < OVERFLOW_RINGS:
+        return []
+    return [f"{region}/{nx}_{ny}"
+            for nx, ny in geo.ring_cells((x, y), 1)
+            if 0 <= nx < SHARDS_PER_SIDE and 0 <= ny < SHARDS_PER_SIDE
+            and step_towards(nx, origin_x) == x and step_towards(ny, origin_y) == y]
+
+
+def step_towards(i: int, origin: int) -> int:
+    return i - (i > origin) + (i < origin)
+
+
+# Drivers with a known location are indexed by the grid cell they are in.
+# Each cell holds a small list of drivers, so a lookup only loads the cells around the restaurant.
+
+def cell_key(cell: tuple[int, int]) -> str:
+    return f"{AVAILABLE_DRIVERS}_CELL_{cell[0]}_{cell[1]}"
+
+
+async def add_to_grid(ctx: ObjectContext, driver_id: str, location: Location):
+    key = cell_key(geo.grid_cell(location))
+    drivers: list[LocatedDriver] = await ctx.get(key) or []
+    drivers.append(LocatedDriver(driver_id=driver_id, location=location))
+    ctx.set(key, drivers)
+    ctx.set(LOCATED_DRIVERS_COUNT, (await ctx.get(LOCATED_DRIVERS_COUNT) or 0) + 1)
+
+
+async def take_nearest_from_grid(ctx: ObjectContext, target: Location) -> LocatedDriver | None:
+    count = await ctx.get(LOCATED_DRIVERS_COUNT) or 0
+    if count == 0:
+        return None
+
+    center = geo.grid_cell(target)
+    best: tuple[float, str, list[LocatedDriver], int] | None = None
+
+    # Search the rings of cells around the restaurant, from the inside out.
+    # Drivers further out can't beat the best match once it is closer than the next ring.
+    for ring in range(geo.max_ring() + 1):
+        if best is not None and best[0] <= geo.min_eta_millis_to_ring(ring):
+            break
+        for cell in geo.ring_cells(center, ring):
+            key = cell_key(cell)
+            drivers: list[LocatedDriver] = await ctx.get(key) or []
+            for i, driver in enumerate(drivers):
+                eta = geo.calculate_eta_millis(driver["location"], target)
+                if best is None or eta < best[0]:
+                    best = (eta, key, drivers, i)
+
+    if best is None:
+        return None
+
+    _, key, drivers, i = best
+    driver = drivers.pop(i)
+    if drivers:
+        ctx.set(key, drivers)
+    else:
+        ctx.clear(key)
+    ctx.set(LOCATED_DRIVERS_COUNT, count - 1)
+    return driver
@@ -7,6 +7,7 @@
 # in the root directory of this repository or package or at
 # https://github.com/restatedev/examples/blob/main/LICENSE
 from datetime import timedelta
+from functools import partial
 
 from restate import VirtualObject, ObjectContext
 import ordering.utils.geo as geo
@@ -25,7 +26,6 @@ import ordering.driver_digital_twin as driver_digital_twin
 ASSIGNED_DELIVERY = "assigned-delivery"
 CURRENT_LOCATION = "current-location"
 
-POLL_INTERVAL = timedelta(milliseconds=1000)
 MOVE_INTERVAL = timedelta(milliseconds=1000)
 PAUSE_BETWEEN_DELIVERIES = timedelta(milliseconds=2000)
 
@@ -41,21 +41,21 @@ async def start_driver(ctx: ObjectContext):
 
     location = await ctx.run("random_location", lambda: geo.random_location())
     ctx.set(CURRENT_LOCATION, location)
-    await ctx.run("sending_location_to_kafka", lambda: send_location_to_kafka(ctx.key(), location))
+    await ctx.run("sending_location_to_kafka", partial(send_location_to_kafka, ctx.key(), location))
 
     ctx.object_send(driver_digital_twin.set_driver_available, ctx.key(), DEMO_REGION)
-    ctx.object_send(poll_for_work, ctx.key(), arg=None)
+    ctx.object_send(wait_for_work, ctx.key(), arg=None)
 
 
 @mobile_app_object.handler()
-async def poll_for_work(ctx: ObjectContext):
-    optional_assigned_delivery = await ctx.object_call(driver_digital_twin.get_assigned_delivery, ctx.key(), arg=None)
-    if optional_assigned_delivery is None:
-        ctx.object_send(poll_for_work, ctx.key(), arg=None, send_delay=POLL_INTERVAL)
-        return
+async def wait_for_work(ctx: ObjectContext):
+    # Let the digital twin notify us when a delivery gets assigned, and suspend until then
+    work_id, work_promise = ctx.awakeable()
+    ctx.object_send(driver_digital_twin.notify_when_assigned, ctx.key(), work_id)
+    assigned_delivery = await work_promise
 
     delivery = DeliveryState(
-        current_delivery=optional_assigned_delivery,
+        current_delivery=assigned_delivery,
         order_picked_up=False
     )
     ctx.set(ASSIGNED_DELIVERY, delivery)
@@ -74,15 +74,20 @@ async def move(ctx: ObjectContext):
     new_location, arrived = update_location(current_location, next_target)
 
     ctx.set(CURRENT_LOCATION, new_location)
-    await ctx.run("send_location_to_kafka", lambda: send_location_to_kafka(ctx.key(), current_location))
+    await ctx.run("send_location_to_kafka", partial(send_location_to_kafka, ctx.key(), current_location))
 
     if arrived:
         if assigned_delivery["order_picked_up"]:
+            next_delivery = await ctx.object_call(driver_digital_twin.notify_delivery_delivered, ctx.key(), arg=None)
+            if next_delivery is not None:
+                # The next delivery of the stack, which the driver already picked up at the same restaurant
+                ctx.set(ASSIGNED_DELIVERY, DeliveryState(current_delivery=next_delivery, order_picked_up=True))
+                ctx.object_send(move, ctx.key(), arg=None, send_delay=MOVE_INTERVAL)
+                return
             ctx.clear(ASSIGNED_DELIVERY)
-            await ctx.object_call(driver_digital_twin.notify_delivery_delivered, ctx.key(), arg=None)
             await ctx.sleep(PAUSE_BETWEEN_DELIVERIES)
             ctx.object_send(driver_digital_twin.set_driver_available, ctx.key(), DEMO_REGION)
-            ctx.object_send(poll_for_work, ctx.key(), arg=None)
+            ctx.object_send(wait_for_work, ctx.key(), arg=None)
             return
 
         assigned_delivery["order_picked_up"] = True
@@ -0,0 +1,297 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# !!!LOAD TEST TOOL, NOT PART OF THE FOOD ORDERING APP!!! Simulates a whole fleet of drivers in one process,
+# for load tests with many more drivers than driver_mobile_app_sim.py can handle:
+# that one runs one move invocation, and one journaled Kafka send, per moving driver per second.
+#
+# The fleet moves all of its drivers in one NumPy step every MOVE_INTERVAL, in the same steps as update_location,
+# and publishes their locations to Kafka in one batch. It only sends requests to the digital twins
+# when a driver picks up or delivers an order, or becomes available again.
+# Like the mobile app, the drivers learn about their deliveries from an awakeable that the digital twin resolves:
+# the driver-fleet-sim object waits on it, and forwards the delivery to the fleet process.
+#
+# Run the fleet process from the app directory, once the app is registered at Restate:
+# FLEET_SIZE=100000 python -m ordering.external.fleet_sim
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+import numpy as np
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from restate import VirtualObject, ObjectContext
+from restate.exceptions import TerminalError
+
+import ordering.driver_digital_twin as driver_digital_twin
+import ordering.utils.geo as geo
+from ordering.clients.kafka_client import send_locations_to_kafka, wait_until_connected
+from ordering.external.driver_mobile_app_sim import MOVE_INTERVAL, PAUSE_BETWEEN_DELIVERIES
+from ordering.external.location_utils import update_locations_batch
+from ordering.types.types import DEMO_REGION, DeliveryRequest, Location
+from ordering.utils.asgi import lifespan, read_body, respond
+
+FLEET_SIZE = int(os.getenv("FLEET_SIZE", "1000"))
+FLEET_DRIVER_PREFIX = os.getenv("FLEET_DRIVER_PREFIX", "fleet-driver-")
+# The fleet process receives the deliveries of its drivers on FLEET_SIM_BIND, which Restate reaches at FLEET_SIM_ENDPOINT
+FLEET_SIM_BIND = os.getenv("FLEET_SIM_BIND", "0.0.0.0:9082")
+FLEET_SIM_ENDPOINT = os.getenv("FLEET_SIM_ENDPOINT", "http://localhost:9082")
+FLEET_SIM_TIMEOUT_SECONDS = float(os.getenv("FLEET_SIM_TIMEOUT_SECONDS", "5"))
+RESTATE_RUNTIME_ENDPOINT = os.getenv("RESTATE_RUNTIME_ENDPOINT", "http://localhost:8080")
+# Number of requests to Restate that the fleet keeps in flight at once
+FLEET_SIM_INGRESS_CONCURRENCY = int(os.getenv("FLEET_SIM_INGRESS_CONCURRENCY", "100"))
+
+PAUSE_TICKS = round(PAUSE_BETWEEN_DELIVERIES / MOVE_INTERVAL)
+
+# Phases of the drivers of the fleet
+WAITING = 0
+TO_RESTAURANT = 1
+TO_CUSTOMER = 2
+PAUSED = 3
+
+
+class FleetClient:
+    """The connections to the fleet process, kept alive and shared by all the driver-fleet-sim objects of the worker."""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def http_client(self) -> httpx.AsyncClient:
+        # Created on first use, so that it belongs to the event loop of the worker
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=FLEET_SIM_ENDPOINT, timeout=FLEET_SIM_TIMEOUT_SECONDS)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+fleet_client = FleetClient()
+
+fleet_sim_object = VirtualObject("driver-fleet-sim")
+
+
+@fleet_sim_object.handler()
+async def wait_for_work(ctx: ObjectContext):
+    work_id, work_promise = ctx.awakeable()
+    ctx.object_send(driver_digital_twin.notify_when_assigned, ctx.key(), work_id)
+    assigned_delivery = await work_promise
+    await ctx.run("forward_delivery_to_fleet", partial(forward_delivery, ctx.key(), assigned_delivery))
+
+
+async def forward_delivery(driver_id: str, delivery: DeliveryRequest):
+    response = await fleet_client.http_client().post(f"/drivers/{driver_id}/assignment", json=delivery)
+    if response.status_code == 404:
+        raise TerminalError(f"Driver {driver_id} is not part of the fleet")
+    response.raise_for_status()
+
+
+
+@dataclass
+class FleetTick:
+    """The drivers (as indexes into the fleet) that moved, and that changed phase, in one tick."""
+    moved: np.ndarray
+    picked_up: np.ndarray
+    delivered: np.ndarray
+    available: np.ndarray
+
+
+class Fleet:
+    """
+    The locations, deliveries and phases of all drivers, in arrays with one row per driver.
+    Locations are packed like geo.pack_locations does.
+    """
+
+    def __init__(self, driver_ids: list[str], locations: np.ndarray, pause_ticks: int = PAUSE_TICKS):
+        self.driver_ids = driver_ids
+        self.indexes = {driver_id: i for i, driver_id in enumerate(driver_ids)}
+        self.locations = locations
+        self.restaurants = np.zeros_like(locations)
+        self.customers = np.zeros_like(locations)
+        self.phases = np.full(len(driver_ids), WAITING, dtype=np.int8)
+        self.available_at = np.zeros(len(driver_ids), dtype=np.int64)
+        self.pause_ticks = pause_ticks
+        self.ticks = 0
+
+    @classmethod
+    def random(cls, size: int, prefix: str = FLEET_DRIVER_PREFIX) -> "Fleet":
+        return cls([f"{prefix}{i}" for i in range(size)],
+                   geo.pack_locations([geo.random_location() for _ in range(size)]))
+
+    def assign(self, driver_id: str, delivery: DeliveryRequest):
+        i = self.indexes[driver_id]
+        # Restate retries forwarding the delivery until it succeeded, so the driver may already be on its way
+        if self.phases[i] != WAITING:
+            return
+        restaurant, customer = delivery["restaurant_location"], delivery["customer_location"]
+        self.restaurants[i] = restaurant["long"], restaurant["lat"]
+        self.customers[i] = customer["long"], customer["lat"]
+        self.phases[i] = TO_RESTAURANT
+
+    def continue_with(self, driver: int, delivery: DeliveryRequest):
+        """Sends the driver on to the customer of the next delivery of its stack, which it already picked up."""
+        customer = delivery["customer_location"]
+        self.customers[driver] = customer["long"], customer["lat"]
+        self.phases[driver] = TO_CUSTOMER
+
+    def tick(self) -> FleetTick:
+        """Moves every driver with a delivery one step towards the restaurant, or the customer once picked up."""
+        self.ticks += 1
+        moved = np.flatnonzero((self.phases == TO_RESTAURANT) | (self.phases == TO_CUSTOMER))
+        to_customer = self.phases[moved] == TO_CUSTOMER
+        targets = np.where(to_customer[:, np.newaxis], self.customers[moved], self.restaurants[moved])
+        self.locations[moved], arrived = update_locations_batch(self.locations[moved], targets)
+
+        picked_up = moved[arrived & ~to_customer]
+        delivered = moved[arrived & to_customer]
+        available = np.flatnonzero((self.phases == PAUSED) & (self.available_at <= self.ticks))
+        self.phases[picked_up] = TO_CUSTOMER
+        self.phases[delivered] = PAUSED
+        self.available_at[delivered] = self.ticks + self.pause_ticks
+        self.phases[available] = WAITING
+        return FleetTick(moved, picked_up, delivered, available)
+
+    def located(self, drivers: np.ndarray) -> list[tuple[str, Location]]:
+        # Dict literals, since calling the Location TypedDict for every driver is several times slower
+        return [(self.driver_ids[i], {"long": long, "lat": lat})
+                for i, (long, lat) in zip(drivers.tolist(), self.locations[drivers].tolist())]
+
+
+class FleetSimulator:
+    """
+    Moves the fleet every tick, and tells Restate about it.
+    `publish` sends a batch of (driver id, location) pairs to the digital twins of the drivers,
+    `send` sends a request to a handler ("<service>/<handler>") of the object with the given key,
+    and `call` does the same and returns the response.
+    """
+
+    def __init__(self, fleet: Fleet,
+                 publish: Callable[[list[tuple[str, Location]]], Awaitable[Any]],
+                 send: Callable[[str, str, Any], Awaitable[Any]],
+                 call: Callable[[str, str, Any], Awaitable[Any]],
+                 concurrency: int = FLEET_SIM_INGRESS_CONCURRENCY):
+        self.fleet = fleet
+        self.publish = publish
+        self.send = send
+        self.call = call
+        self._in_flight = asyncio.Semaphore(concurrency)
+
+    async def start(self):
+        everyone = np.arange(len(self.fleet.driver_ids))
+        # The digital twins need to know where the drivers are before they become available
+        await self.publish(self.fleet.located(everyone))
+        await self._make_available(everyone)
+
+    async def tick(self) -> FleetTick:
+        tick = self.fleet.tick()
+        if len(tick.moved):
+            await self.publish(self.fleet.located(tick.moved))
+        await self._send_all(tick.picked_up, "driver-digital-twin/notify_delivery_pickup", None)
+        # Drivers with a stack of deliveries get their next delivery back
+        next_deliveries = await self._send_all(tick.delivered, "driver-digital-twin/notify_delivery_delivered", None,
+                                               self.call)
+        for driver, next_delivery in zip(tick.delivered.tolist(), next_deliveries):
+            if next_delivery is not None:
+                self.fleet.continue_with(driver, next_delivery)
+        await self._make_available(tick.available)
+        return tick
+
+    async def run(self):
+        await self.start()
+        interval = MOVE_INTERVAL.total_seconds()
+        next_tick = time.monotonic()
+        while True:
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            start = time.monotonic()
+            tick = await self.tick()
+            elapsed = time.monotonic() - start
+            print(f"Tick {self.fleet.ticks}: {len(tick.moved)} drivers moved, {len(tick.picked_up)} picked up, "
+                  f"{len(tick.delivered)} delivered, {len(tick.available)} available again, in {elapsed * 1000:.0f} ms")
+            if elapsed > interval:
+                print(f"Tick {self.fleet.ticks} took longer than the move interval: the fleet moves slower than real time")
+
+    async def _make_available(self, drivers: np.ndarray):
+        await self._send_all(drivers, "driver-digital-twin/set_driver_available", DEMO_REGION)
+        await self._send_all(drivers, "driver-fleet-sim/wait_for_work", None)
+
+    async def _send_all(self, drivers: np.ndarray, handler: str, arg: Any,
+                        send: Optional[Callable[[str, str, Any], Awaitable[Any]]] = None) -> list[Any]:
+        send = send or self.send
+
+        async def send_one(driver_id: str):
+            async with self._in_flight:
+                return await send(handler, driver_id, arg)
+
+        return await asyncio.gather(*(send_one(self.fleet.driver_ids[i]) for i in drivers.tolist()))
+
+
+class RestateIngress:
+    def __init__(self, endpoint: str = RESTATE_RUNTIME_ENDPOINT):
+        self._client = httpx.AsyncClient(base_url=endpoint, timeout=FLEET_SIM_TIMEOUT_SECONDS)
+
+    async def send(self, handler: str, key: str, arg: Any):
+        await self._post(handler, key, arg, "/send")
+
+    async def call(self, handler: str, key: str, arg: Any) -> Any:
+        return await self._post(handler, key, arg, "")
+
+    async def _post(self, handler: str, key: str, arg: Any, suffix: str) -> Any:
+        service, handler_name = handler.split("/")
+        body = {} if arg is None else {"json": arg}
+        try:
+            response = await self._client.post(f"/{service}/{key}/{handler_name}{suffix}", **body)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Failed to send {handler} for driver {key}: {e!r}")
+            return None
+        return response.json() if response.content else None
+
+
+def assignment_app(fleet: Fleet):
+    """Receives the deliveries of the drivers of the fleet with POST /drivers/{driver_id}/assignment."""
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await lifespan(receive, send)
+            return
+
+        path = scope["path"].strip("/").split("/")
+        if scope["method"] == "POST" and len(path) == 3 and path[0] == "drivers" and path[2] == "assignment" \
+                and path[1] in fleet.indexes:
+            fleet.assign(path[1], json.loads(await read_body(receive)))
+            await respond(send, 202)
+        else:
+            await respond(send, 404)
+
+    return app
+
+
+async def main():
+    fleet = Fleet.random(FLEET_SIZE)
+    ingress = RestateIngress()
+    simulator = FleetSimulator(fleet, send_locations_to_kafka, ingress.send, ingress.call)
+    config = Config()
+    config.bind = [FLEET_SIM_BIND]
+    print(f"Simulating {FLEET_SIZE} drivers, receiving their deliveries on {FLEET_SIM_BIND}")
+    # The digital twins need the first locations of the drivers, which would get dropped while Kafka is connecting
+    await asyncio.get_running_loop().run_in_executor(None, wait_until_connected)
+    await asyncio.gather(serve(assignment_app(fleet), config), simulator.run())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,7 @@
 from typing import Tuple, Any
 
+import numpy as np
+
 from ordering.types.types import Location
 import ordering.utils.geo as geo
 
@@ -15,3 +17,15 @@ def update_location(current: Location, target: Location) -> tuple[Location, bool
 def dim_step(current: float, target: float) -> float:
     step = geo.step()
     return target if abs(target - current) < step else (current + step if target > current else current - step)
+
+
+def update_locations_batch(current_points: np.ndarray, target_points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Moves each of the packed locations (see geo.pack_locations) one step towards the target in the same row.
+    Gives the same results as update_location, bit for bit: the new locations and whether each one arrived.
+    """
+    step = geo.step()
+    moved = np.where(target_points > current_points, current_points + step, current_points - step)
+    new_points = np.where(np.abs(target_points - current_points) < step, target_points, moved)
+    arrived = (new_points == target_points).all(axis=-1)
+    return new_points, arrived
@@ -0,0 +1,62 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import os
+
+from restate import ObjectContext, ObjectSharedContext, VirtualObject
+
+from ordering.types.types import DriverStatusChange, FleetAggregates, Location
+from ordering.utils import geo
+
+# The driver digital twins count every status transition in the fleet aggregates object of their region,
+# so that a dashboard reads the state of the whole fleet with one call. Disabled by default.
+FLEET_AGGREGATES = os.getenv("FLEET_AGGREGATES", "false").lower() == "true"
+# The heatmap of available drivers splits the region in this many cells per side
+HEATMAP_CELLS_PER_SIDE = int(os.getenv("FLEET_HEATMAP_CELLS_PER_SIDE", "8"))
+
+fleet_aggregates = VirtualObject("fleet-aggregates")
+
+DRIVERS_BY_STATUS = "DRIVERS_BY_STATUS"
+AVAILABLE_DRIVERS_BY_CELL = "AVAILABLE_DRIVERS_BY_CELL"
+
+
+def heatmap_cell(location: Location) -> str:
+    x = int((location["long"] - geo.long_min) / (geo.long_max - geo.long_min) * HEATMAP_CELLS_PER_SIDE)
+    y = int((location["lat"] - geo.lat_min) / (geo.lat_max - geo.lat_min) * HEATMAP_CELLS_PER_SIDE)
+    return f"{min(max(x, 0), HEATMAP_CELLS_PER_SIDE - 1)}_{min(max(y, 0), HEATMAP_CELLS_PER_SIDE - 1)}"
+
+
+# Called by the driver digital twins on every status transition, when the aggregates are enabled
+@fleet_aggregates.handler()
+async def count_status_change(ctx: ObjectContext, change: DriverStatusChange):
+    if change["previous_status"] != change["status"]:
+        by_status: dict[str, int] = await ctx.get(DRIVERS_BY_STATUS) or {}
+        add_count(by_status, change["previous_status"], -1)
+        add_count(by_status, change["status"], 1)
+        ctx.set(DRIVERS_BY_STATUS, by_status)
+
+    if change["previous_cell"] != change["cell"]:
+        by_cell: dict[str, int] = await ctx.get(AVAILABLE_DRIVERS_BY_CELL) or {}
+        add_count(by_cell, change["previous_cell"], -1)
+        add_count(by_cell, change["cell"], 1)
+        ctx.set(AVAILABLE_DRIVERS_BY_CELL, by_cell)
+
+
+@fleet_aggregates.handler(kind="shared")
+async def get_fleet(ctx: ObjectSharedContext) -> FleetAggregates:
+    return FleetAggregates(drivers_by_status=await ctx.get(DRIVERS_BY_STATUS) or {},
+                           available_drivers_by_cell=await ctx.get(AVAILABLE_DRIVERS_BY_CELL) or {})
+
+
+def add_count(counts: dict[str, int], key: str | None, delta: int):
+    if key is None:
+        return
+    counts[key] = counts.get(key, 0) + delta
+    if counts[key] == 0:
+        del counts[key]
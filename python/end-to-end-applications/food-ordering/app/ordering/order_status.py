@@ -8,7 +8,12 @@
 # https://github.com/restatedev/examples/
 
 from restate import VirtualObject, ObjectContext
-import order_workflow as order_workflow
+
+from ordering.clients.status_stream_client import StatusStreamClient
+import ordering.order_status_index as order_status_index
+from ordering.types.types import IndexedStatus, OrderStatusUpdate, Status
+
+status_stream_client = StatusStreamClient()
 
 order_status = VirtualObject("order-status")
 
@@ -16,15 +21,39 @@ order_status = VirtualObject("order-status")
 @order_status.handler()
 async def get(ctx: ObjectContext):
     eta = await ctx.get("eta") or None
-    status = await ctx.workflow_call(order_workflow.get_status, ctx.key(), arg=None) or None
+    status = await ctx.get("status") or None
     return {"eta": eta, "status": status}
 
 
+# Called by the order workflow on every status transition
+@order_status.handler()
+async def set_status(ctx: ObjectContext, status: Status):
+    ctx.set("status", status)
+    if order_status_index.ORDER_STATUS_INDEX_SHARDS:
+        ctx.object_send(order_status_index.set_status, order_status_index.index_shard(ctx.key()),
+                        arg=IndexedStatus(order_id=ctx.key(), status=status))
+    await publish(ctx)
+
+
 @order_status.handler()
 async def set_eta(ctx: ObjectContext, eta: int):
     ctx.set("eta", eta)
+    await publish(ctx)
 
 
 @order_status.handler()
 async def event_handler(ctx: ObjectContext, eta: int):
     ctx.set("eta", eta)
+    await publish(ctx)
+
+
+async def publish(ctx: ObjectContext):
+    # Streams every change to the subscribed web UIs, if the status stream sidecar is configured
+    if not status_stream_client.enabled:
+        return
+    update = OrderStatusUpdate(eta=await ctx.get("eta") or None, status=await ctx.get("status") or None)
+
+    async def send():
+        await status_stream_client.publish(ctx.key(), update)
+
+    await ctx.run("publish status", send)
@@ -0,0 +1,58 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import os
+import zlib
+from datetime import timedelta
+from typing import Optional
+
+from restate import ObjectContext, ObjectSharedContext, VirtualObject
+
+from ordering.types.types import IndexedStatus, Status
+
+# The order status index keeps the status of all orders in this many objects, so that a query
+# reads the status of thousands of orders with one call per shard. Disabled when 0.
+ORDER_STATUS_INDEX_SHARDS = int(os.getenv("ORDER_STATUS_INDEX_SHARDS", "0"))
+# Orders that are done stay in the index for this long, and then get cleared from it,
+# so that the index holds the orders in progress and the recently finished ones, rather than every order ever placed.
+# Queries for the cached status of an order that was cleared get None, like for unknown orders.
+ORDER_STATUS_INDEX_RETENTION = timedelta(seconds=int(os.getenv("ORDER_STATUS_INDEX_RETENTION_SECONDS", "3600")))
+
+FINAL_STATUSES = {Status.DELIVERED.value, Status.REJECTED.value, Status.CANCELLED.value}
+
+order_status_index = VirtualObject("order-status-index")
+
+
+def index_shard(order_id: str) -> str:
+    # A stable hash, so that every worker routes an order to the same shard
+    return str(zlib.crc32(order_id.encode()) % ORDER_STATUS_INDEX_SHARDS)
+
+
+# Called by the order status object on every status transition, when the index is enabled
+@order_status_index.handler()
+async def set_status(ctx: ObjectContext, update: IndexedStatus):
+    if update["status"] not in FINAL_STATUSES:
+        ctx.set(update["order_id"], update["status"])
+    elif ORDER_STATUS_INDEX_RETENTION:
+        ctx.set(update["order_id"], update["status"])
+        ctx.object_send(expire_status, ctx.key(), arg=update, send_delay=ORDER_STATUS_INDEX_RETENTION)
+    else:
+        ctx.clear(update["order_id"])
+
+
+@order_status_index.handler()
+async def expire_status(ctx: ObjectContext, update: IndexedStatus):
+    # Unless the status changed again in the meantime
+    if await ctx.get(update["order_id"]) == update["status"]:
+        ctx.clear(update["order_id"])
+
+
+@order_status_index.handler(kind="shared")
+async def get_indexed_statuses(ctx: ObjectSharedContext, order_ids: list[str]) -> dict[str, Optional[str]]:
+    return {order_id: await ctx.get(order_id) for order_id in order_ids}
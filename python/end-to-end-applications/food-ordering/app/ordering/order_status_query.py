@@ -0,0 +1,66 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import os
+from collections import deque
+from functools import partial
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+
+from restate import Context, Service
+
+import ordering.order_workflow as order_workflow
+from ordering.order_status_index import ORDER_STATUS_INDEX_SHARDS, get_indexed_statuses, index_shard
+from ordering.types.types import StatusQuery
+
+T = TypeVar("T")
+
+# Number of status reads that a query keeps in flight at once
+ORDER_STATUS_QUERY_CONCURRENCY = int(os.getenv("ORDER_STATUS_QUERY_CONCURRENCY", "100"))
+
+order_status_query = Service("order-status-query")
+
+
+@order_status_query.handler()
+async def get_statuses(ctx: Context, query: StatusQuery) -> dict[str, Optional[str]]:
+    """
+    Returns the status of every order in the query, or None for unknown orders.
+    With `cached`, the statuses are read from the order status index, if it is enabled,
+    which forgets the orders that are done after ORDER_STATUS_INDEX_RETENTION; otherwise from the order workflows.
+    """
+    order_ids = query["order_ids"]
+    if query.get("cached", False) and ORDER_STATUS_INDEX_SHARDS:
+        shards: dict[str, list[str]] = {}
+        for order_id in order_ids:
+            shards.setdefault(index_shard(order_id), []).append(order_id)
+        statuses: dict[str, Optional[str]] = {}
+        for shard_statuses in await gather_bounded(
+                partial(ctx.object_call, get_indexed_statuses, shard, arg=ids) for shard, ids in shards.items()):
+            statuses.update(shard_statuses)
+        return {order_id: statuses[order_id] for order_id in order_ids}
+
+    return dict(zip(order_ids, await gather_bounded(
+        partial(ctx.workflow_call, order_workflow.get_status, order_id, arg=None) for order_id in order_ids)))
+
+
+async def gather_bounded(calls: Iterable[Callable[[], Awaitable[T]]],
+                         concurrency: Optional[int] = None) -> list[T]:
+    """
+    Makes the calls with at most `concurrency` of them in flight, and returns their results in order.
+    Restate starts a call when it is made, so awaiting them one after the other still runs them concurrently.
+    """
+    concurrency = concurrency or ORDER_STATUS_QUERY_CONCURRENCY
+    results: list[T] = []
+    in_flight: deque[Awaitable[T]] = deque()
+    for call in calls:
+        if len(in_flight) == concurrency:
+            results.append(await in_flight.popleft())
+        in_flight.append(call())
+    while in_flight:
+        results.append(await in_flight.popleft())
+    return results
@@ -1,13 +1,16 @@
 import uuid
 from datetime import timedelta
-from typing import TypedDict
 
 from restate import Workflow, WorkflowContext, WorkflowSharedContext
+from restate.exceptions import TerminalError
 
 from ordering.clients.payment_client import PaymentClient
 from ordering.clients.restaurant_client import RestaurantClient
-from ordering.types.types import Status
+from ordering.types.types import DEMO_REGION, Order, Status
+import ordering.delivery_admission as delivery_admission
 import ordering.delivery_manager as delivery_manager
+import ordering.driver_matcher as driver_matcher
+import ordering.order_status as order_status
 
 payment_client = PaymentClient()
 restaurant_client = RestaurantClient()
@@ -15,51 +18,71 @@ restaurant_client = RestaurantClient()
 order_workflow = Workflow("order-workflow")
 
 
-class Product(TypedDict):
-    product_id: str
-    description: str
-    quantity: int
-
-
-class Order(TypedDict):
-    id: str
-    restaurant_id: str
-    products: list[Product]
-    total_cost: int
-    delivery_delay: int
-
-
 @order_workflow.main()
 async def run(ctx: WorkflowContext, order: Order):
     id, total_cost, delivery_delay = ctx.key(), order["total_cost"], order["delivery_delay"]
 
-    ctx.set("status", Status.CREATED)
+    set_status(ctx, Status.CREATED)
 
     token = await ctx.run("payment ID", lambda: str(uuid.uuid4()))
     paid = await ctx.run("payment", lambda: payment_client.charge(token, total_cost))
 
     if not paid:
-        ctx.set("status", Status.REJECTED)
+        set_status(ctx, Status.REJECTED)
         return
 
-    ctx.set("status", Status.SCHEDULED)
+    set_status(ctx, Status.SCHEDULED)
     await ctx.sleep(timedelta(milliseconds=delivery_delay))
 
-    await ctx.run("prepare", lambda: restaurant_client.prepare(id))
-    ctx.set("status", Status.IN_PREPARATION)
+    async def prepare():
+        await restaurant_client.prepare(id)
 
-    await ctx.promise("preparation_finished").value()
-    ctx.set("status", Status.SCHEDULING_DELIVERY)
-
-    delivery_id = await ctx.run("delivery ID", lambda: str(uuid.uuid4()))
-    ctx.object_send(delivery_manager.start, delivery_id, arg=order)
+    await ctx.run("prepare", prepare)
+    set_status(ctx, Status.IN_PREPARATION)
 
-    await ctx.promise("driver_selected").value()
-    ctx.set("status", Status.WAITING_FOR_DRIVER)
+    await ctx.promise("preparation_finished").value()
+    set_status(ctx, Status.SCHEDULING_DELIVERY)
+
+    if await delivery_admitted(ctx):
+        delivery_id = await ctx.run("delivery ID", lambda: str(uuid.uuid4()))
+        ctx.object_send(delivery_manager.start, delivery_id, arg=order)
+    else:
+        # Shed the order like when the driver matcher gives up on finding a driver
+        await ctx.promise("driver_selected").reject("No driver available: too many deliveries are waiting for a driver")
+
+    try:
+        await ctx.promise("driver_selected").value()
+    except TerminalError:
+        # The driver matcher gave up on finding a driver
+        set_status(ctx, Status.REJECTED)
+        return
+    set_status(ctx, Status.WAITING_FOR_DRIVER)
     await ctx.promise("driver_at_restaurant").value()
-    ctx.set("status", Status.IN_DELIVERY)
+    set_status(ctx, Status.IN_DELIVERY)
     await ctx.promise("delivery_finished").value()
-    ctx.set("status", Status.DELIVERED)
+    set_status(ctx, Status.DELIVERED)
+
+
+async def delivery_admitted(ctx: WorkflowContext) -> bool:
+    """
+    Holds the delivery back while too many deliveries wait for a driver, instead of adding to them.
+    Returns False if the region is still at the limit after ADMISSION_MAX_WAIT.
+    """
+    if driver_matcher.MAX_BACKLOG == 0:
+        return True
+    waited = timedelta()
+    while await ctx.object_call(delivery_admission.get_backlog, DEMO_REGION, arg=None) >= driver_matcher.MAX_BACKLOG:
+        if waited >= delivery_admission.ADMISSION_MAX_WAIT:
+            return False
+        await ctx.sleep(delivery_admission.ADMISSION_RETRY_INTERVAL)
+        waited += delivery_admission.ADMISSION_RETRY_INTERVAL
+    return True
+
+
+def set_status(ctx: WorkflowContext, status: Status):
+    ctx.set("status", status)
+    # The order status object keeps a copy of the status, so that polling it does not need to call the workflow
+    ctx.object_send(order_status.set_status, ctx.key(), arg=status)
 
 
 @order_workflow.handler(name="finishedPreparation")
@@ -72,6 +95,11 @@ async def selected_driver(ctx: WorkflowSharedContext):
     await ctx.promise("driver_selected").resolve(None)
 
 
+@order_workflow.handler()
+async def signal_no_driver(ctx: WorkflowSharedContext):
+    await ctx.promise("driver_selected").reject("No driver available for the delivery")
+
+
 @order_workflow.handler()
 async def signal_driver_at_restaurant(ctx: WorkflowSharedContext):
     await ctx.promise("driver_at_restaurant").resolve(None)
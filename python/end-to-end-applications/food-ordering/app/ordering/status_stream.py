@@ -0,0 +1,153 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Sidecar that streams the status and ETA changes of orders to the web UI, as server-sent events,
+# so that the web UI does not need to poll the order status object.
+# The order status object publishes every change with POST /orders/{order_id},
+# and clients subscribe to the changes of an order with GET /orders/{order_id}/events.
+# Every event holds the full status of the order, in the same format as order-status/get.
+#
+# The subscriptions are kept in memory, so run the sidecar with a single worker:
+# hypercorn ordering/status_stream:app --bind 0.0.0.0:9081
+
+import asyncio
+import json
+import os
+from collections import OrderedDict, deque
+
+from ordering.types.types import OrderStatusUpdate, Status
+from ordering.utils.asgi import lifespan, read_body, respond
+
+# Number of events kept per client that does not read them fast enough; older events get dropped
+STATUS_STREAM_CLIENT_BUFFER = int(os.getenv("STATUS_STREAM_CLIENT_BUFFER", "16"))
+# Number of orders for which the latest status is kept, to send it to new subscribers right away
+STATUS_STREAM_MAX_ORDERS = int(os.getenv("STATUS_STREAM_MAX_ORDERS", "100000"))
+STATUS_STREAM_KEEP_ALIVE_SECONDS = float(os.getenv("STATUS_STREAM_KEEP_ALIVE_SECONDS", "15"))
+
+FINAL_STATUSES = {Status.DELIVERED, Status.REJECTED, Status.CANCELLED}
+
+
+class Subscription:
+    """
+    The events of one order for one client.
+    Every event holds the full status of the order, so dropping the oldest events when the buffer is full
+    only skips intermediate states: the client always gets the latest one.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.events: deque[OrderStatusUpdate] = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, event: OrderStatusUpdate):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Waits until there are events or the subscription got closed, and returns False on timeout."""
+        if not self.events and not self.closed:
+            self._ready.clear()
+            wake_up = asyncio.get_running_loop().call_later(timeout, self._ready.set)
+            await self._ready.wait()
+            wake_up.cancel()
+        return bool(self.events) or self.closed
+
+
+class StatusBroker:
+    def __init__(self, buffer_size: int = STATUS_STREAM_CLIENT_BUFFER, max_orders: int = STATUS_STREAM_MAX_ORDERS):
+        self.buffer_size = buffer_size
+        self.max_orders = max_orders
+        self.subscriptions: dict[str, set[Subscription]] = {}
+        self.latest: OrderedDict[str, OrderStatusUpdate] = OrderedDict()
+
+    def publish(self, order_id: str, update: OrderStatusUpdate):
+        state = OrderStatusUpdate(eta=None, status=None)
+        state.update(self.latest.pop(order_id, {}))
+        state.update(update)
+        self.latest[order_id] = state
+        if len(self.latest) > self.max_orders:
+            self.latest.popitem(last=False)
+        for subscription in self.subscriptions.get(order_id, ()):
+            subscription.push(state)
+
+    def subscribe(self, order_id: str) -> Subscription:
+        subscription = Subscription(self.buffer_size)
+        self.subscriptions.setdefault(order_id, set()).add(subscription)
+        if order_id in self.latest:
+            subscription.push(self.latest[order_id])
+        return subscription
+
+    def unsubscribe(self, order_id: str, subscription: Subscription):
+        subscriptions = self.subscriptions.get(order_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscriptions.pop(order_id, None)
+
+
+broker = StatusBroker()
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    path = scope["path"].strip("/").split("/")
+    if scope["method"] == "GET" and len(path) == 3 and path[0] == "orders" and path[2] == "events":
+        await stream_events(path[1], receive, send)
+    elif scope["method"] == "POST" and len(path) == 2 and path[0] == "orders":
+        body = await read_body(receive)
+        update = json.loads(body)
+        broker.publish(path[1], OrderStatusUpdate(**{k: v for k, v in update.items() if k in ("eta", "status")}))
+        await respond(send, 202)
+    else:
+        await respond(send, 404)
+
+
+async def stream_events(order_id: str, receive, send):
+    subscription = broker.subscribe(order_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    disconnected.add_done_callback(lambda _: subscription.close())
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"access-control-allow-origin", b"*")],
+        })
+        while True:
+            if not await subscription.wait(STATUS_STREAM_KEEP_ALIVE_SECONDS):
+                await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+                continue
+            if subscription.closed:
+                return
+            events = list(subscription.events)
+            subscription.events.clear()
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode()
+            # The order will not change anymore
+            done = events[-1]["status"] in FINAL_STATUSES
+            await send({"type": "http.response.body", "body": body, "more_body": not done})
+            if done:
+                return
+    finally:
+        broker.unsubscribe(order_id, subscription)
+        disconnected.cancel()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
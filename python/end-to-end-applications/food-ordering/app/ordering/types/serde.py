@@ -0,0 +1,122 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Compact fixed-layout serdes for the locations and deliveries that the handlers pass around and store
+# with every location update. Opt in with COMPACT_SERDE=true; the handlers use JSON otherwise.
+#
+# Every compact message starts with a format byte, which JSON never starts with,
+# so the compact serdes still read the JSON of state that was stored before opting in.
+# Opting out again needs empty state, since JSON cannot read the compact messages.
+
+import json
+import math
+import os
+import struct
+import typing
+
+from restate.serde import JsonSerde, Serde
+
+from ordering.types.types import DeliveryInformation, DeliveryRequest, Location
+
+COMPACT_SERDE = os.getenv("COMPACT_SERDE", "false").lower() == "true"
+
+FORMAT_V1 = 1
+
+# Little-endian doubles for the coordinates, and unsigned shorts for the lengths of the UTF-8 strings
+LOCATION = struct.Struct("<Bdd")
+DELIVERY_REQUEST = struct.Struct("<BddddHH")
+DELIVERY_INFORMATION = struct.Struct("<Bddddd?HH")
+
+
+def _is_json(buf: bytes) -> bool:
+    return buf[0] != FORMAT_V1
+
+
+class LocationSerde(Serde[Location]):
+    def serialize(self, obj: typing.Optional[Location]) -> bytes:
+        if obj is None:
+            return bytes()
+        return LOCATION.pack(FORMAT_V1, obj["long"], obj["lat"])
+
+    def deserialize(self, buf: bytes) -> typing.Optional[Location]:
+        if not buf:
+            return None
+        if _is_json(buf):
+            return json.loads(buf)
+        _, long, lat = LOCATION.unpack(buf)
+        return {"long": long, "lat": lat}
+
+
+class DeliveryRequestSerde(Serde[DeliveryRequest]):
+    def serialize(self, obj: typing.Optional[DeliveryRequest]) -> bytes:
+        if obj is None:
+            return bytes()
+        delivery_id = obj["delivery_id"].encode()
+        restaurant_id = obj["restaurant_id"].encode()
+        restaurant, customer = obj["restaurant_location"], obj["customer_location"]
+        return DELIVERY_REQUEST.pack(FORMAT_V1, restaurant["long"], restaurant["lat"],
+                                     customer["long"], customer["lat"],
+                                     len(delivery_id), len(restaurant_id)) + delivery_id + restaurant_id
+
+    def deserialize(self, buf: bytes) -> typing.Optional[DeliveryRequest]:
+        if not buf:
+            return None
+        if _is_json(buf):
+            return json.loads(buf)
+        _, restaurant_long, restaurant_lat, customer_long, customer_lat, delivery_id_length, restaurant_id_length = \
+            DELIVERY_REQUEST.unpack_from(buf)
+        restaurant_id_start = DELIVERY_REQUEST.size + delivery_id_length
+        # Dict literals, since calling the TypedDicts is several times slower
+        return {
+            "delivery_id": bytes(buf[DELIVERY_REQUEST.size:restaurant_id_start]).decode(),
+            "restaurant_id": bytes(buf[restaurant_id_start:restaurant_id_start + restaurant_id_length]).decode(),
+            "restaurant_location": {"long": restaurant_long, "lat": restaurant_lat},
+            "customer_location": {"long": customer_long, "lat": customer_lat},
+        }
+
+
+class DeliveryInformationSerde(Serde[DeliveryInformation]):
+    def serialize(self, obj: typing.Optional[DeliveryInformation]) -> bytes:
+        if obj is None:
+            return bytes()
+        order_id = obj["order_id"].encode()
+        restaurant_id = obj["restaurant_id"].encode()
+        restaurant, customer = obj["restaurant_location"], obj["customer_location"]
+        return DELIVERY_INFORMATION.pack(FORMAT_V1, restaurant["long"], restaurant["lat"],
+                                         customer["long"], customer["lat"],
+                                         obj.get("restaurant_to_customer_eta_millis", math.nan), obj["order_picked_up"],
+                                         len(order_id), len(restaurant_id)) + order_id + restaurant_id
+
+    def deserialize(self, buf: bytes) -> typing.Optional[DeliveryInformation]:
+        if not buf:
+            return None
+        if _is_json(buf):
+            return json.loads(buf)
+        (_, restaurant_long, restaurant_lat, customer_long, customer_lat, restaurant_to_customer_eta_millis,
+         order_picked_up, order_id_length, restaurant_id_length) = DELIVERY_INFORMATION.unpack_from(buf)
+        restaurant_id_start = DELIVERY_INFORMATION.size + order_id_length
+        delivery: DeliveryInformation = {
+            "order_id": bytes(buf[DELIVERY_INFORMATION.size:restaurant_id_start]).decode(),
+            "restaurant_id": bytes(buf[restaurant_id_start:restaurant_id_start + restaurant_id_length]).decode(),
+            "restaurant_location": {"long": restaurant_long, "lat": restaurant_lat},
+            "customer_location": {"long": customer_long, "lat": customer_lat},
+            "order_picked_up": order_picked_up,
+        }
+        # NaN stands for a delivery without it, that was read from the JSON of older state
+        if not math.isnan(restaurant_to_customer_eta_millis):
+            delivery["restaurant_to_customer_eta_millis"] = restaurant_to_customer_eta_millis
+        return delivery
+
+
+# The serdes that the handlers use
+LOCATION_SERDE: Serde[Location] = LocationSerde() if COMPACT_SERDE else JsonSerde()
+DELIVERY_REQUEST_SERDE: Serde[DeliveryRequest] = DeliveryRequestSerde() if COMPACT_SERDE else JsonSerde()
+DELIVERY_INFORMATION_SERDE: Serde[DeliveryInformation] = DeliveryInformationSerde() if COMPACT_SERDE else JsonSerde()
+# Content type of the handlers that take these messages
+CONTENT_TYPE = "application/octet-stream" if COMPACT_SERDE else "application/json"
@@ -1,4 +1,4 @@
-from typing import TypedDict
+from typing import NotRequired, Optional, TypedDict
 from enum import Enum
 
 DEMO_REGION = "San Jose (CA)"
@@ -17,6 +17,20 @@ class Status(str, Enum):
     CANCELLED = "CANCELLED"
 
 
+class Product(TypedDict):
+    product_id: str
+    description: str
+    quantity: int
+
+
+class Order(TypedDict):
+    id: str
+    restaurant_id: str
+    products: list[Product]
+    total_cost: int
+    delivery_delay: int
+
+
 class Location(TypedDict):
     long: float
     lat: float
@@ -28,6 +42,8 @@ class DeliveryInformation(TypedDict):
     restaurant_location: Location
     customer_location: Location
     order_picked_up: bool
+    # Missing from the deliveries that were stored before it was added
+    restaurant_to_customer_eta_millis: NotRequired[float]
 
 
 class DeliveryRequest(TypedDict):
@@ -39,6 +55,75 @@ class DeliveryRequest(TypedDict):
 
 class PendingDelivery(TypedDict):
     promise_id: str
+    restaurant_location: NotRequired[Location]
+    overflow_shards: NotRequired[list[str]]
+    expires_at_millis: NotRequired[int]
+
+
+class AvailableDriver(TypedDict):
+    driver_id: str
+    location: Optional[Location]
+    overflow_shards: NotRequired[list[str]]
+
+
+class LocatedDriver(TypedDict):
+    driver_id: str
+    location: Location
+
+
+class RestaurantStack(TypedDict):
+    driver_id: str
+    restaurant_location: Location
+    free_slots: int
+
+
+class StackedLocation(TypedDict):
+    location: Location
+    # Customers that the driver delivers to before this delivery's customer, in order
+    stops_before: list[Location]
+
+
+class ShardBacklog(TypedDict):
+    shard: str
+    has_pending_deliveries: bool
+
+
+class ShardBacklogSize(TypedDict):
+    shard: str
+    pending_deliveries: int
+
+
+class DriverStatusChange(TypedDict):
+    previous_status: Optional[str]
+    status: Optional[str]
+    # Heatmap cells the driver is counted in before and after the change, if any
+    previous_cell: Optional[str]
+    cell: Optional[str]
+
+
+class FleetAggregates(TypedDict):
+    drivers_by_status: dict[str, int]
+    available_drivers_by_cell: dict[str, int]
+
+
+class ForwardedLocation(TypedDict):
+    location: Location
+    timestamp_millis: int
+
+
+class OrderStatusUpdate(TypedDict, total=False):
+    eta: Optional[float]
+    status: Optional[str]
+
+
+class StatusQuery(TypedDict):
+    order_ids: list[str]
+    cached: NotRequired[bool]
+
+
+class IndexedStatus(TypedDict):
+    order_id: str
+    status: str
 
 
 class DeliveryState(TypedDict):
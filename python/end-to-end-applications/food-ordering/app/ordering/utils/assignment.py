@@ -0,0 +1,71 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+import numpy as np
+
+
+def min_cost_assignment(cost: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Solves the rectangular assignment problem with the Hungarian algorithm.
+    Returns the row and column indices of the assigned pairs, with min(rows, columns) pairs of minimal total cost.
+    The inner loop over the columns is vectorized, so a batch of n x m takes O(n * m) NumPy operations.
+    """
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    # Potentials of the rows and columns, and the row assigned to each column (1-based, 0 is the virtual column)
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    assigned_row = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        assigned_row[0] = i
+        j0 = 0
+        min_v = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        # Grow an alternating tree from row i until it reaches a free column
+        while True:
+            used[j0] = True
+            i0 = assigned_row[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+
+            improved = free & (reduced < min_v[1:])
+            min_v[1:][improved] = reduced[improved]
+            way[1:][improved] = j0
+
+            candidates = np.where(free, min_v[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            used_columns = np.nonzero(used)[0]
+            u[assigned_row[used_columns]] += delta
+            v[used_columns] -= delta
+            min_v[1:][free] -= delta
+
+            j0 = j1
+            if assigned_row[j0] == 0:
+                break
+
+        # Flip the assignments along the augmenting path
+        while j0 != 0:
+            j1 = way[j0]
+            assigned_row[j0] = assigned_row[j1]
+            j0 = j1
+
+    columns = np.nonzero(assigned_row[1:])[0]
+    rows = assigned_row[1:][columns] - 1
+    if transposed:
+        rows, columns = columns, rows
+    order = np.argsort(rows)
+    return rows[order], columns[order]
@@ -0,0 +1,160 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+from typing import Any, Optional
+
+from restate import ObjectContext
+
+# Number of entries stored under a single state key.
+# Enqueue/dequeue only ever load and write one chunk plus the head/tail indices,
+# so the state bytes per call are bounded by the chunk size and not by the queue length.
+CHUNK_SIZE = 32
+
+
+class StateQueue:
+    """
+    FIFO queue stored in the K/V state of a Virtual Object.
+
+    The entries are split over fixed-size chunks, each stored under its own state key:
+    <name>_<n> holds the entries at positions [n * chunk_size, (n + 1) * chunk_size),
+    <name>_HEAD holds the position of the first entry and <name>_LAST_CHUNK the index of the chunk being filled.
+    A push writes one state key, plus the index of the last chunk whenever it starts a new chunk.
+    """
+
+    def __init__(self, ctx: ObjectContext, name: str, chunk_size: int = CHUNK_SIZE):
+        self.ctx = ctx
+        self.name = name
+        self.chunk_size = chunk_size
+
+    def _head_key(self) -> str:
+        return f"{self.name}_HEAD"
+
+    def _last_chunk_key(self) -> str:
+        return f"{self.name}_LAST_CHUNK"
+
+    def _chunk_key(self, index: int) -> str:
+        return f"{self.name}_{index}"
+
+    async def _last_chunk(self) -> tuple[int, list[Any]]:
+        index = await self.ctx.get(self._last_chunk_key()) or 0
+        chunk: list[Any] = await self.ctx.get(self._chunk_key(index)) or []
+        return index, chunk
+
+    async def size(self) -> int:
+        head = await self.ctx.get(self._head_key()) or 0
+        index, chunk = await self._last_chunk()
+        return index * self.chunk_size + len(chunk) - head
+
+    async def push(self, entry: Any):
+        await self.push_many([entry])
+
+    async def push_many(self, entries: list[Any]):
+        if not entries:
+            return
+        first_index, chunk = await self._last_chunk()
+        index = first_index
+
+        for entry in entries:
+            if len(chunk) == self.chunk_size:
+                self.ctx.set(self._chunk_key(index), chunk)
+                index, chunk = index + 1, []
+            chunk.append(entry)
+
+        self.ctx.set(self._chunk_key(index), chunk)
+        if index != first_index:
+            self.ctx.set(self._last_chunk_key(), index)
+
+    async def peek(self) -> Optional[Any]:
+        head = await self.ctx.get(self._head_key()) or 0
+        index, offset = divmod(head, self.chunk_size)
+        chunk: list[Any] = await self.ctx.get(self._chunk_key(index)) or []
+        return chunk[offset] if offset < len(chunk) else None
+
+    async def peek_many(self, max_entries: int) -> list[Any]:
+        """The first max_entries entries, without removing them."""
+        head = await self.ctx.get(self._head_key()) or 0
+        entries: list[Any] = []
+
+        while len(entries) < max_entries:
+            index, offset = divmod(head + len(entries), self.chunk_size)
+            chunk: list[Any] = await self.ctx.get(self._chunk_key(index)) or []
+            taken = chunk[offset:offset + max_entries - len(entries)]
+            if not taken:
+                break
+            entries.extend(taken)
+        return entries
+
+    async def remove_many(self, positions: set[int]):
+        """
+        Removes the entries at the given positions, counted from the first entry, keeping the order of the others.
+        The entries before the last removed one move up, so only the chunks up to that entry get written.
+        """
+        if not positions:
+            return
+        if len(positions) == await self.size():
+            await self.pop_many(len(positions))
+            return
+
+        head = await self.ctx.get(self._head_key()) or 0
+        chunks: dict[int, list[Any]] = {}
+        entries: list[Any] = []
+        for position in range(max(positions) + 1):
+            index, offset = divmod(head + position, self.chunk_size)
+            if index not in chunks:
+                chunks[index] = await self.ctx.get(self._chunk_key(index)) or []
+            entries.append(chunks[index][offset])
+
+        new_head = head + len(positions)
+        kept = [entry for position, entry in enumerate(entries) if position not in positions]
+        changed: set[int] = set()
+        for position, entry in enumerate(kept, start=new_head):
+            index, offset = divmod(position, self.chunk_size)
+            if chunks[index][offset] is not entry:
+                chunks[index][offset] = entry
+                changed.add(index)
+
+        for index in sorted(chunks):
+            if (index + 1) * self.chunk_size <= new_head:
+                # Every entry of this chunk has been consumed
+                self.ctx.clear(self._chunk_key(index))
+            elif index in changed:
+                self.ctx.set(self._chunk_key(index), chunks[index])
+        self.ctx.set(self._head_key(), new_head)
+
+    async def pop(self) -> Optional[Any]:
+        entries = await self.pop_many(1)
+        return entries[0] if entries else None
+
+    async def pop_many(self, max_entries: int) -> list[Any]:
+        head = await self.ctx.get(self._head_key()) or 0
+        last_index = await self.ctx.get(self._last_chunk_key()) or 0
+        entries: list[Any] = []
+
+        while len(entries) < max_entries:
+            index, offset = divmod(head, self.chunk_size)
+            chunk: list[Any] = await self.ctx.get(self._chunk_key(index)) or []
+            taken = chunk[offset:offset + max_entries - len(entries)]
+            if not taken:
+                break
+            entries.extend(taken)
+            head += len(taken)
+
+            if index == last_index and offset + len(taken) == len(chunk):
+                # Queue drained: reset the positions so the next push starts from the first chunk again
+                self.ctx.clear(self._chunk_key(index))
+                self.ctx.clear(self._head_key())
+                self.ctx.clear(self._last_chunk_key())
+                return entries
+            if head % self.chunk_size == 0:
+                # Every entry of this chunk has been consumed
+                self.ctx.clear(self._chunk_key(index))
+
+        if entries:
+            self.ctx.set(self._head_key(), head)
+        return entries
@@ -7,12 +7,14 @@
 # in the root directory of this repository or package or at
 # https://github.com/restatedev/examples/blob/main/LICENSE
 import asyncio
+import atexit
 
 from flask import Flask, request, jsonify
-import requests
+import httpx
 import os
 import time
-from threading import Thread
+from threading import Lock, Thread
+from typing import Optional
 
 # This file contains the logic for the Point of Sales API server of the restaurant.
 # It responds to requests to create, cancel and prepare orders.
@@ -20,28 +22,101 @@ from threading import Thread
 RESTATE_RUNTIME_ENDPOINT = os.getenv("RESTATE_RUNTIME_ENDPOINT", "http://localhost:8080")
 RESTATE_TOKEN = os.getenv("RESTATE_RUNTIME_TOKEN")
 
+# The callbacks to Restate run in the background, so that /prepare responds right away
+CALLBACK_CONCURRENCY = int(os.getenv("CALLBACK_CONCURRENCY", "50"))
+CALLBACK_MAX_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "10"))
+CALLBACK_INITIAL_BACKOFF_SECONDS = 0.1
+CALLBACK_MAX_BACKOFF_SECONDS = 10.0
+CALLBACK_TIMEOUT_SECONDS = 10.0
+
 app = Flask(__name__)
 
 
+class CallbackDispatcher:
+    """
+    Sends the completion callbacks to Restate from a background thread.
+    The request threads only enqueue the order, and CALLBACK_CONCURRENCY workers drain the queue concurrently
+    over a shared pool of keep-alive connections, retrying failed callbacks with exponential backoff.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._lock = Lock()
+        self._thread: Optional[Thread] = None
+
+    def submit(self, order_id: str):
+        # The thread gets started by the first request, so that it runs in the process that serves the requests
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, order_id)
+
+    def close(self, timeout: float = CALLBACK_TIMEOUT_SECONDS):
+        if self._thread is None:
+            return
+        # Give the queued callbacks a chance to go out before shutting down
+        try:
+            asyncio.run_coroutine_threadsafe(self.queue.join(), self.loop).result(timeout)
+        except TimeoutError:
+            print(f"{log_prefix()} {self.queue.qsize()} callbacks were not sent", flush=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._serve())
+
+    async def _serve(self):
+        headers = {"Content-Type": "application/json"}
+        if RESTATE_TOKEN:
+            headers["Authorization"] = f"Bearer {RESTATE_TOKEN}"
+        async with httpx.AsyncClient(base_url=RESTATE_RUNTIME_ENDPOINT, headers=headers,
+                                     limits=httpx.Limits(max_connections=CALLBACK_CONCURRENCY),
+                                     timeout=CALLBACK_TIMEOUT_SECONDS) as client:
+            await asyncio.gather(*(self._work(client) for _ in range(CALLBACK_CONCURRENCY)))
+
+    async def _work(self, client: httpx.AsyncClient):
+        while True:
+            order_id = await self.queue.get()
+            try:
+                await resolve_cb(client, order_id)
+            finally:
+                self.queue.task_done()
+
+
+callbacks = CallbackDispatcher()
+atexit.register(callbacks.close)
+
+
 @app.route("/prepare", methods=["POST"])
 def prepare_order():
     order_id = request.json["order_id"]
     print(f"{log_prefix()} Started preparation of order {order_id}; expected duration: 5 seconds", flush=True)
-    response = jsonify({}), 200
 
-    resolve_cb(order_id)
-    return response
+    callbacks.submit(order_id)
+    return jsonify({}), 200
 
 
-def resolve_cb(order_id):
-    print(f"{log_prefix()} Order {order_id} prepared and ready for shipping", flush=True)
-    headers = {
-        "Content-Type": "application/json",
-    }
-    if RESTATE_TOKEN:
-        headers["Authorization"] = f"Bearer {RESTATE_TOKEN}"
-    requests.post(f"{RESTATE_RUNTIME_ENDPOINT}/order-workflow/{order_id}/finishedPreparation/send?delay=5s", headers=headers)
+async def resolve_cb(client: httpx.AsyncClient, order_id: str):
+    backoff = CALLBACK_INITIAL_BACKOFF_SECONDS
+    for attempt in range(1, CALLBACK_MAX_ATTEMPTS + 1):
+        try:
+            response = await client.post(f"/order-workflow/{order_id}/finishedPreparation/send?delay=5s")
+            response.raise_for_status()
+            print(f"{log_prefix()} Order {order_id} prepared and ready for shipping", flush=True)
+            return
+        except httpx.HTTPStatusError as e:
+            # Retrying does not help when Restate rejected the callback
+            if e.response.is_client_error or attempt == CALLBACK_MAX_ATTEMPTS:
+                print(f"{log_prefix()} Failed to notify Restate of order {order_id}: {e}", flush=True)
+                return
+        except httpx.TransportError as e:
+            if attempt == CALLBACK_MAX_ATTEMPTS:
+                print(f"{log_prefix()} Failed to notify Restate of order {order_id}: {e}", flush=True)
+                return
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, CALLBACK_MAX_BACKOFF_SECONDS)
 
 
 def log_prefix():
-    return f"[restaurant] [{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}] INFO:"
\ No newline at end of file
+    return f"[restaurant] [{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}] INFO:"
@@ -0,0 +1,131 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Runs the driver matcher on the emulated Restate context of the benchmarks.
+# Run from the app directory: python -m unittest discover tests
+
+import unittest
+from unittest import mock
+
+import ordering.delivery_admission as delivery_admission
+import ordering.driver_matcher as driver_matcher
+from benchmarks.state_context import SerializedObjectRuntime
+from ordering.types.types import DEMO_REGION
+from ordering.utils.state_queue import StateQueue
+
+CORNER = f"{DEMO_REGION}/0_0"
+TWO_SHARDS_AWAY = f"{DEMO_REGION}/2_1"
+THREE_SHARDS_AWAY = f"{DEMO_REGION}/3_3"
+
+
+class FarAwayDriverTest(unittest.IsolatedAsyncioTestCase):
+    """A delivery in a corner shard, and the only driver more than OVERFLOW_RINGS shards away"""
+
+    def setUp(self):
+        for name, value in [("MATCHING_MODE", "fifo"), ("SHARDS_PER_SIDE", 4), ("OVERFLOW_RINGS", 1),
+                            ("MAX_STACKED_DELIVERIES", 1), ("MAX_BACKLOG", 0)]:
+            patcher = mock.patch.object(driver_matcher, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.runtime = SerializedObjectRuntime()
+        self.addCleanup(self.runtime.close)
+
+    async def make_available(self, shard: str, driver_id: str):
+        self.runtime.send(driver_matcher.set_driver_available, shard,
+                          {"driver_id": driver_id, "location": driver_matcher.shard_center(shard)})
+        await self.runtime.drain()
+
+    async def request_driver(self, shard: str, promise_id: str):
+        self.runtime.send(driver_matcher.request_driver_for_delivery, shard,
+                          {"promise_id": promise_id, "restaurant_location": driver_matcher.shard_center(shard)})
+        await self.runtime.drain()
+
+    async def backlogs(self) -> dict[str, list[str]]:
+        """The shards that still know about a backlog, and which ones"""
+        found = {}
+        for (_, key), ctx in self.runtime.contexts.items():
+            neighbors = await ctx.get(driver_matcher.NEIGHBORS_WITH_BACKLOG)
+            if neighbors:
+                found[key] = neighbors
+        return found
+
+    async def test_idle_driver_two_shards_away_gets_the_delivery(self):
+        await self.make_available(TWO_SHARDS_AWAY, "driver-1")
+        await self.request_driver(CORNER, "delivery-1")
+
+        self.assertEqual(self.runtime.resolved_awakeables, {"delivery-1": "driver-1"})
+        self.assertEqual(self.runtime.errors, [])
+        self.assertEqual(await self.backlogs(), {})
+
+    async def test_driver_that_becomes_available_far_away_gets_the_waiting_delivery(self):
+        await self.request_driver(CORNER, "delivery-1")
+        self.assertEqual(self.runtime.resolved_awakeables, {})
+
+        await self.make_available(THREE_SHARDS_AWAY, "driver-1")
+
+        self.assertEqual(self.runtime.resolved_awakeables, {"delivery-1": "driver-1"})
+        self.assertEqual(self.runtime.errors, [])
+        self.assertEqual(await self.backlogs(), {})
+
+    async def test_backlog_reaches_every_shard_once(self):
+        await self.request_driver(CORNER, "delivery-1")
+
+        backlogs = await self.backlogs()
+        self.assertEqual(len(backlogs), 15)
+        self.assertTrue(all(neighbors == [CORNER] for neighbors in backlogs.values()))
+        self.assertEqual(self.runtime.invocations["driver-delivery-matcher/set_neighbor_backlog"], 15)
+
+
+class BacklogLimitTest(unittest.IsolatedAsyncioTestCase):
+    """Deliveries in every shard of a region, and no drivers"""
+
+    SHARDS = [f"{DEMO_REGION}/{x}_{y}" for x in range(4) for y in range(4)]
+
+    def setUp(self):
+        for name, value in [("MATCHING_MODE", "fifo"), ("SHARDS_PER_SIDE", 4), ("OVERFLOW_RINGS", 1),
+                            ("MAX_STACKED_DELIVERIES", 1)]:
+            patcher = mock.patch.object(driver_matcher, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.runtime = SerializedObjectRuntime()
+        self.addCleanup(self.runtime.close)
+
+    async def request_drivers(self, per_shard: int) -> list[int]:
+        """The backlog of every shard after the requests"""
+        for i in range(per_shard):
+            for shard in self.SHARDS:
+                self.runtime.send(driver_matcher.request_driver_for_delivery, shard,
+                                  {"promise_id": f"delivery-{shard}-{i}",
+                                   "restaurant_location": driver_matcher.shard_center(shard)})
+        await self.runtime.drain()
+        self.assertEqual(self.runtime.errors, [])
+        return [await StateQueue(self.runtime.contexts[("driver-delivery-matcher", shard)],
+                                 driver_matcher.PENDING_DELIVERIES).size() for shard in self.SHARDS]
+
+    async def admitted_backlog(self) -> int:
+        return await self.runtime.call(delivery_admission.get_backlog, DEMO_REGION, None)
+
+    async def test_region_backlog_stays_within_the_limit(self):
+        with mock.patch.object(driver_matcher, "MAX_BACKLOG", 64):
+            backlogs = await self.request_drivers(10)
+
+        self.assertEqual(backlogs, [4] * 16)
+        self.assertEqual(await self.admitted_backlog(), 64)
+
+    async def test_reported_backlog_is_never_below_the_actual_one(self):
+        # Shards report in steps of 16 deliveries
+        with mock.patch.object(driver_matcher, "MAX_BACKLOG", 1024):
+            backlogs = await self.request_drivers(3)
+
+        self.assertEqual(backlogs, [3] * 16)
+        self.assertEqual(await self.admitted_backlog(), 16 * 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
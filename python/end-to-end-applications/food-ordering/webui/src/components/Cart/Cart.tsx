@@ -3,6 +3,10 @@ import CartProducts from './CartProducts';
 import { useCart } from 'contexts/cart-context';
 import * as S from './style';
 import { sendRequestToRestate } from 'services/sendToRestate';
+import {
+  isStatusStreamEnabled,
+  subscribeToOrderStatus,
+} from 'services/statusStream';
 import { useUser } from 'contexts/user-context';
 import { useOrderStatusContext } from '../../contexts/status-context/OrderStatusProvider';
 import { useState } from 'react';
@@ -94,6 +98,14 @@ const Cart = () => {
         bg: true,
       });
 
+      if (
+        isStatusStreamEnabled() &&
+        (await subscribeToOrderStatus(user!.user_id, setOrderStatus))
+      ) {
+        setNewShoppingCartId();
+        return;
+      }
+
       let done = false;
       while (!done) {
         const newOrderStatus = (
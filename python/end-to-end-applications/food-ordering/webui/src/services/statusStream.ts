@@ -0,0 +1,31 @@
+import { IOrderStatus } from 'models';
+
+const STATUS_STREAM_HOST = process.env.REACT_APP_STATUS_STREAM_HOST;
+
+const FINAL_STATUSES = ['DELIVERED', 'REJECTED', 'CANCELLED'];
+
+export const isStatusStreamEnabled = () => !!STATUS_STREAM_HOST;
+
+// Receives every status change of the order from the status stream sidecar, until the order is done.
+// Resolves to false if the stream failed before that, so that the caller can poll the order status instead.
+export const subscribeToOrderStatus = (
+  orderId: string,
+  onStatus: (orderStatus: IOrderStatus) => void
+) =>
+  new Promise<boolean>((resolve) => {
+    const source = new EventSource(
+      `${STATUS_STREAM_HOST}/orders/${orderId}/events`
+    );
+    source.onmessage = (event) => {
+      const orderStatus: IOrderStatus = JSON.parse(event.data);
+      onStatus(orderStatus);
+      if (FINAL_STATUSES.includes(orderStatus.status)) {
+        source.close();
+        resolve(true);
+      }
+    };
+    source.onerror = () => {
+      source.close();
+      resolve(false);
+    };
+  });
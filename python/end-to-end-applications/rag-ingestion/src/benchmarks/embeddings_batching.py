@@ -0,0 +1,96 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Throughput and latency per chunk of the embeddings service (rag/embeddings_service.py) in one worker,
+# sending every chunk to the model on its own, compared to micro-batching the concurrent calls.
+# Uses a local fake embeddings model with a fixed cost per request and per text, that handles one request at a time,
+# like an Ollama server on a single GPU.
+#
+# Run from the src directory: python -m benchmarks.embeddings_batching
+
+import asyncio
+import random
+import time
+
+import rag.embeddings as embeddings
+import rag.embeddings_cache as embeddings_cache
+from rag.embeddings_service import compute_embedding
+
+REQUEST_MS = 15
+TEXT_MS = 0.5
+DIMENSIONS = 1024
+CHUNKS = 500
+# (scenario, chunks per second; 0 for all the chunks of a PDF at once)
+SCENARIOS = [("500-chunk PDF", 0), ("steady 100 / s", 100)]
+BATCH_SIZES = [1, 64]
+
+
+class FakeEmbeddings:
+    """Embeddings model answering after REQUEST_MS plus TEXT_MS per text, one request at a time"""
+
+    model = "fake"
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.requests = 0
+        self.texts = 0
+
+    async def aembed_documents(self, texts):
+        async with self.lock:
+            self.requests += 1
+            self.texts += len(texts)
+            await asyncio.sleep((REQUEST_MS + TEXT_MS * len(texts)) / 1000)
+        return [[float(len(text))] * DIMENSIONS for text in texts]
+
+
+async def measure(scenario: str, chunks_per_second: int, batch_size: int):
+    model = FakeEmbeddings()
+    embeddings.EMBEDDINGS = model  # type: ignore
+    embeddings.EMBEDDINGS_BATCH_SIZE = batch_size
+    embeddings.BATCHER = None
+    # Every chunk goes to the model
+    embeddings_cache.CACHE = embeddings_cache.EmbeddingsCache(model.model, 0)
+
+    latencies: list[float] = []
+
+    async def embed(text: str):
+        start = time.perf_counter()
+        vector = await compute_embedding(None, text)
+        latencies.append(time.perf_counter() - start)
+        assert vector[0] == len(text)
+
+    start = time.perf_counter()
+    calls = []
+    for i in range(CHUNKS):
+        calls.append(asyncio.create_task(embed("chunk " * random.randint(50, 170) + str(i))))
+        if chunks_per_second:
+            await asyncio.sleep(random.expovariate(chunks_per_second))
+    await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{scenario:>15} | {batch_size:>10} | {model.requests:>14} | {CHUNKS / elapsed:>10.0f}"
+          f" | {p50:>8.1f} | {p99:>8.1f}")
+
+
+async def main():
+    random.seed(CHUNKS)
+    print(f"{CHUNKS} chunks, fake model: {REQUEST_MS} ms per request + {TEXT_MS} ms per text, "
+          f"batches wait up to {embeddings.EMBEDDINGS_BATCH_WAIT_MS:.0f} ms")
+    print(f"{'scenario':>15} | {'batch size':>10} | {'model requests':>14} | {'chunks / s':>10}"
+          f" | {'p50 ms':>8} | {'p99 ms':>8}")
+    for scenario, chunks_per_second in SCENARIOS:
+        for batch_size in BATCH_SIZES:
+            await measure(scenario, chunks_per_second, batch_size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
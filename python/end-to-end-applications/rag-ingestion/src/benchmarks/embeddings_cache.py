@@ -0,0 +1,77 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Hit rate and latency of the embeddings cache (rag/embeddings_cache.py) when ingesting documents that share
+# boilerplate, re-ingesting them, re-ingesting them after a restart of the worker with the on-disk tier,
+# and re-ingesting them with an in-memory budget smaller than the working set.
+# Embeds the chunks of every document at once, like the text workflow, with the fake embeddings model
+# of benchmarks/embeddings_batching.py.
+#
+# Run from the src directory: python -m benchmarks.embeddings_cache
+
+import asyncio
+import random
+import tempfile
+import time
+
+from rag.embeddings_cache import EmbeddingsCache, EMBEDDINGS_CACHE_BYTES
+from benchmarks.embeddings_batching import DIMENSIONS, FakeEmbeddings
+
+DOCUMENTS = 20
+CHUNKS_PER_DOCUMENT = 100
+# Chunks that every document has, like a license or a disclaimer
+BOILERPLATE_CHUNKS = 10
+SMALL_CACHE_BYTES = 4 * 1024 * 1024
+
+
+def random_chunk() -> str:
+    return " ".join(random.choice(["order", "driver", "restaurant", "delivery", "pizza", "route"])
+                    for _ in range(150))
+
+
+async def ingest(name: str, cache: EmbeddingsCache, documents: list[list[str]]):
+    model = FakeEmbeddings()
+    cache.memory_hits = cache.disk_hits = cache.misses = 0
+    cache.lookup_seconds = cache.embed_seconds = 0.0
+    start = time.perf_counter()
+    for chunks in documents:
+        vectors = await cache.aembed_documents(chunks, model)
+        assert [vector[0] for vector in vectors] == [float(len(chunk)) for chunk in chunks]
+    elapsed = time.perf_counter() - start
+
+    metrics = cache.metrics()
+    print(f"{name:>26} | {metrics['lookups']:>6.0f} | {metrics['misses']:>6.0f} | {metrics['hit_rate']:>8.1%}"
+          f" | {metrics['memory_bytes'] / 1024 / 1024:>10.1f} | {metrics['lookup_ms_per_text']:>15.3f}"
+          f" | {metrics['embed_ms_per_miss']:>14.2f} | {elapsed:>5.2f}")
+
+
+async def main():
+    random.seed(DOCUMENTS)
+    boilerplate = [random_chunk() for _ in range(BOILERPLATE_CHUNKS)]
+    documents = [boilerplate + [random_chunk() for _ in range(CHUNKS_PER_DOCUMENT - BOILERPLATE_CHUNKS)]
+                 for _ in range(DOCUMENTS)]
+
+    print(f"{DOCUMENTS} documents of {CHUNKS_PER_DOCUMENT} chunks, {BOILERPLATE_CHUNKS} of them shared, "
+          f"{DIMENSIONS} dimensions")
+    print(f"{'pass':>26} | {'texts':>6} | {'misses':>6} | {'hit rate':>8} | {'memory MiB':>10}"
+          f" | {'lookup ms/text':>15} | {'embed ms/miss':>14} | {'s':>5}")
+    with tempfile.TemporaryDirectory() as directory:
+        await ingest("no cache", EmbeddingsCache("fake", 0), documents)
+        cache = EmbeddingsCache("fake", EMBEDDINGS_CACHE_BYTES, directory)
+        await ingest("first ingestion", cache, documents)
+        await ingest("re-ingestion", cache, documents)
+        await ingest("re-ingestion after restart", EmbeddingsCache("fake", EMBEDDINGS_CACHE_BYTES, directory),
+                     documents)
+    small_cache = EmbeddingsCache("fake", SMALL_CACHE_BYTES)
+    await ingest("first, 4 MiB in memory", small_cache, documents)
+    await ingest("re-ingestion, 4 MiB", small_cache, documents)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
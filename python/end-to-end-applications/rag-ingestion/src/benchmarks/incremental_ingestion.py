@@ -0,0 +1,98 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Embedding work of the text workflow (rag/text_workflow.py) when a 300-page manual is ingested, ingested again
+# unchanged, and ingested again with one page edited, compared to embedding every chunk again.
+# Runs the workflow on the emulated workflow context, with the objects in a temporary directory, an in-memory Qdrant collection,
+# and the fake embeddings model of benchmarks/embeddings_batching.py, without the embeddings cache.
+#
+# Run from the src directory: python -m benchmarks.incremental_ingestion
+
+import asyncio
+import random
+import tempfile
+import time
+
+from qdrant_client import QdrantClient, models
+
+import rag.embeddings as embeddings
+import rag.embeddings_cache as embeddings_cache
+import rag.object_store as object_store
+import rag.vector_store as vector_store
+from rag.text_workflow import process_text
+from benchmarks.embeddings_batching import DIMENSIONS, FakeEmbeddings
+from benchmarks.object_download import file_object_store
+from benchmarks.workflow_context import WorkflowContext
+
+PAGES = 300
+PARAGRAPHS_PER_PAGE = 4
+WORDS_PER_PARAGRAPH = 100
+EDITED_PAGE = 150
+BUCKET = "docs"
+OBJECT = "manual.txt"
+
+
+class InMemoryQdrant:
+    """Stands in for the langchain Qdrant store, of which the vector store only uses the client"""
+
+    def __init__(self) -> None:
+        self.client = QdrantClient(":memory:")
+        self.client.create_collection("docs", vectors_config=models.VectorParams(size=DIMENSIONS,
+                                                                                 distance=models.Distance.COSINE))
+
+
+def random_page() -> str:
+    words = ["manual", "driver", "restaurant", "delivery", "route", "order", "install", "press", "screen", "battery"]
+    return "\n\n".join(" ".join(random.choice(words) for _ in range(WORDS_PER_PARAGRAPH))
+                       for _ in range(PARAGRAPHS_PER_PAGE))
+
+
+async def ingest(name: str, qdrant: InMemoryQdrant, pages: list[str]):
+    await object_store.get_object_store_client().aput_object(BUCKET, OBJECT, "\n\n".join(pages).encode())
+    model = FakeEmbeddings()
+    embeddings.EMBEDDINGS = model  # type: ignore
+    ctx = WorkflowContext(name.replace(" ", "-"))
+    start = time.perf_counter()
+    await process_text(ctx, {"bucket_name": BUCKET, "object_name": OBJECT})
+    elapsed = time.perf_counter() - start
+
+    document_points = qdrant.client.count("docs", count_filter=models.Filter(must=[
+        models.FieldCondition(key="object_name", match=models.MatchValue(value=OBJECT))])).count
+    print(f"{name:>24} | {model.texts:>15} | {document_points:>15} | {qdrant.client.count('docs').count:>12}"
+          f" | {elapsed:>5.2f}")
+
+
+async def main():
+    random.seed(PAGES)
+    # Every new chunk goes to the model
+    embeddings_cache.CACHE = embeddings_cache.EmbeddingsCache("fake", 0)
+
+    pages = [random_page() for _ in range(PAGES)]
+    edited_pages = pages.copy()
+    edited_pages[EDITED_PAGE] = random_page()
+
+    print(f"{PAGES}-page manual, {PARAGRAPHS_PER_PAGE} paragraphs of {WORDS_PER_PARAGRAPH} words per page")
+    print(f"{'ingestion':>24} | {'embedded chunks':>15} | {'document points':>15} | {'all points':>12} | {'s':>5}")
+    with tempfile.TemporaryDirectory() as directory:
+        object_store.OBJECT_STORE = file_object_store(directory)
+
+        qdrant = InMemoryQdrant()
+        vector_store.VECTOR_STORE = vector_store.VectorStore(qdrant)
+        await ingest("first", qdrant, pages)
+        await ingest("unchanged", qdrant, pages)
+        await ingest("one page edited", qdrant, edited_pages)
+
+        # Embedding every chunk again, as without looking up the existing ones
+        qdrant = InMemoryQdrant()
+        vector_store.VECTOR_STORE = vector_store.VectorStore(qdrant)
+        await ingest("one page edited, all", qdrant, edited_pages)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
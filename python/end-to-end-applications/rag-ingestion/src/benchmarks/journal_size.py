@@ -0,0 +1,82 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Bytes that the text and PDF workflows (rag/text_workflow.py, rag/pdf_workflow.py) write to their journal
+# per document, next to the size of the document, of its snippets and of their embeddings,
+# that the journal does not hold since the snippets are kept in the scratch bucket (rag/snippets.py).
+# Runs the workflows on the emulated workflow context, with the objects in a temporary directory,
+# an in-memory Qdrant collection, and the fake embeddings model of benchmarks/embeddings_batching.py.
+#
+# Run from the src directory: python -m benchmarks.journal_size
+
+import asyncio
+import json
+import os
+import random
+import tempfile
+from collections import Counter
+
+import rag.embeddings as embeddings
+import rag.embeddings_cache as embeddings_cache
+import rag.object_store as object_store
+import rag.vector_store as vector_store
+from rag.pdf_workflow import process_pdf
+from rag.text_workflow import process_text
+from benchmarks.embeddings_batching import DIMENSIONS, FakeEmbeddings
+from benchmarks.incremental_ingestion import PAGES, InMemoryQdrant, random_page
+from benchmarks.object_download import file_object_store, write_pdf
+from benchmarks.workflow_context import WorkflowContext
+
+PDF_PAGES = 100
+PDF_ATTACHMENT_MB = 20
+
+
+async def measure(name: str, workflow, object_name: str, directory: str):
+    model = FakeEmbeddings()
+    embeddings.EMBEDDINGS = model  # type: ignore
+    embeddings.BATCHER = None
+    ctx = WorkflowContext(name)
+    await workflow(ctx, {"bucket_name": "docs", "object_name": object_name})
+
+    document_bytes = os.path.getsize(os.path.join(directory, "docs", object_name))
+    points, _ = vector_store.get_vector_store().store.client.scroll("docs", limit=100_000, with_vectors=True)
+    snippet_bytes = len(json.dumps([(point.payload or {}).get("page_content") for point in points]))
+    vector_bytes = len(json.dumps([point.vector for point in points]))
+    print(f"{name}: document {document_bytes / 1024:.0f} KiB, {len(points)} snippets of {snippet_bytes / 1024:.0f} KiB"
+          f" with {vector_bytes / 1024:.0f} KiB of embeddings, "
+          f"journal {ctx.journal_bytes() / 1024:.1f} KiB")
+    sizes: Counter = Counter()
+    for entry, size in ctx.journal:
+        sizes[entry] += size
+    for entry, size in sizes.items():
+        print(f"  {entry:>28} | {size:>9} bytes")
+    scratch = os.path.join(directory, "scratch")
+    assert not any(files for _, _, files in os.walk(scratch)), "the scratch snippets were not removed"
+
+
+async def main():
+    random.seed(PAGES)
+    # Every chunk goes to the model
+    embeddings_cache.CACHE = embeddings_cache.EmbeddingsCache("fake", 0)
+    print(f"{DIMENSIONS} dimensions")
+    with tempfile.TemporaryDirectory() as directory:
+        object_store.OBJECT_STORE = file_object_store(directory)
+        await object_store.OBJECT_STORE.aput_object("docs", "manual.txt",
+                                                    "\n\n".join(random_page() for _ in range(PAGES)).encode())
+        os.makedirs(os.path.join(directory, "docs"), exist_ok=True)
+        write_pdf(os.path.join(directory, "docs", "manual.pdf"), PDF_PAGES, PDF_ATTACHMENT_MB)
+
+        vector_store.VECTOR_STORE = vector_store.VectorStore(InMemoryQdrant())
+        await measure("text", process_text, "manual.txt", directory)
+        vector_store.VECTOR_STORE = vector_store.VectorStore(InMemoryQdrant())
+        await measure("pdf", process_pdf, "manual.pdf", directory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
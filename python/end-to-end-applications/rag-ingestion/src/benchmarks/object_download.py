@@ -0,0 +1,166 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Peak memory of downloading and extracting a large PDF (rag/pdf_workflow.py) when the whole object is read into
+# memory and journaled, compared to spooling it to a temporary file (rag/object_store.py), with a single streaming
+# request and with ranged requests.
+# The PDF has a few pages of text and a large attachment, and is served from a local file
+# by a stand-in for the minio client. Memory is measured with tracemalloc.
+#
+# Run from the src directory: python -m benchmarks.object_download
+
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from langchain_community.document_loaders.parsers import PyPDFParser
+from langchain_core.document_loaders.blob_loaders import Blob
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from restate.serde import BytesSerde
+
+import rag.object_store as object_store
+from rag.pdf_workflow import extract_pdf_text_snippets
+
+PAGES = 20
+ATTACHMENT_MB = 100
+RANGE_MB = 8
+
+
+class FileResponse:
+    """Response of the stand-in minio client, reading the object from its file"""
+
+    def __init__(self, path: str, offset: int, length: int) -> None:
+        self.file = open(path, "rb")  # pylint: disable=consider-using-with
+        self.file.seek(offset)
+        self.remaining = length or os.path.getsize(path) - offset
+
+    @property
+    def data(self) -> bytes:
+        return self.file.read(self.remaining)
+
+    def stream(self, amt: int):
+        while self.remaining > 0:
+            chunk = self.file.read(min(amt, self.remaining))
+            self.remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+    def release_conn(self):
+        pass
+
+
+class FileMinio:
+    """Stands in for the minio client, serving the objects from a directory"""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.requests = 0
+
+    def get_object(self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0):
+        self.requests += 1
+        return FileResponse(os.path.join(self.directory, bucket_name, object_name), offset, length)
+
+    def stat_object(self, bucket_name: str, object_name: str):
+        return SimpleNamespace(size=os.path.getsize(os.path.join(self.directory, bucket_name, object_name)))
+
+    def put_object(self, bucket_name: str, object_name: str, data, length: int):
+        path = os.path.join(self.directory, bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data.read(length))
+
+    def remove_object(self, bucket_name: str, object_name: str):
+        path = os.path.join(self.directory, bucket_name, object_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def file_object_store(directory: str) -> object_store.ObjectStore:
+    """Object store client serving the objects from a directory"""
+    store = object_store.ObjectStore(endpoint="localhost:9000", key="", secret="")
+    store.client = FileMinio(directory)  # type: ignore
+    return store
+
+
+def write_pdf(path: str, pages: int = PAGES, attachment_mb: int = ATTACHMENT_MB):
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({  # pylint: disable=protected-access
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for page_number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        lines = " ".join(f"(Page {page_number} line {line}: deliver the order to the customer) '" for line in range(50))
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 10 Tf 50 760 Td 14 TL {lines} ET".encode())
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        page[NameObject("/Contents")] = writer._add_object(content)  # pylint: disable=protected-access
+    writer.add_attachment("data.bin", os.urandom(attachment_mb * 1024 * 1024))
+    with open(path, "wb") as file:
+        writer.write(file)
+
+
+def extract_from_bytes(pdf_bytes: bytes) -> list[str]:
+    """The extraction of the snippets from the downloaded bytes, as before spooling to a file"""
+    docs = PyPDFParser().parse(Blob.from_data(data=pdf_bytes, mime_type="application/pdf"))
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(docs)
+    return [chunk.page_content for chunk in chunks]
+
+
+async def whole_object(store: object_store.ObjectStore) -> list[str]:
+    pdf_bytes = await store.aget_object("docs", "large.pdf")
+    # Written to the journal, and read back from it
+    serde = BytesSerde()
+    return extract_from_bytes(serde.deserialize(serde.serialize(pdf_bytes)) or b"")
+
+
+async def spooled(store: object_store.ObjectStore) -> list[str]:
+    async with store.aspooled_object("docs", "large.pdf") as pdf_path:
+        return extract_pdf_text_snippets(pdf_path)
+
+
+async def measure(name: str, store: object_store.ObjectStore, extract, range_bytes: int):
+    object_store.OBJECT_STORE_RANGE_BYTES = range_bytes
+    client: FileMinio = store.client  # type: ignore
+    client.requests = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    texts = await extract(store)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>22} | {client.requests:>8} | {len(texts):>8} | {peak / 1024 / 1024:>12.1f} | {elapsed:>5.2f}")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "docs"))
+        path = os.path.join(directory, "docs", "large.pdf")
+        write_pdf(path)
+        store = file_object_store(directory)
+
+        print(f"{os.path.getsize(path) / 1024 / 1024:.0f} MiB PDF, {PAGES} pages of text, "
+              f"read in parts of {object_store.OBJECT_STORE_CHUNK_BYTES // 1024} KiB")
+        print(f"{'download':>22} | {'requests':>8} | {'snippets':>8} | {'peak MiB':>12} | {'s':>5}")
+        await measure("whole object, journal", store, whole_object, 0)
+        await measure("spooled", store, spooled, 0)
+        await measure(f"spooled, {RANGE_MB} MiB ranges", store, spooled, RANGE_MB * 1024 * 1024)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Emulated Restate workflow context, to run the ingestion workflows in-process in the benchmarks.
+# Records the size of every entry that the workflow writes to its journal.
+
+import asyncio
+from inspect import iscoroutinefunction
+
+from restate.serde import JsonSerde
+
+
+class WorkflowContext:
+    """Runs the actions and service calls of a workflow in-process, like the first execution on Restate"""
+
+    def __init__(self, key: str = "workflow") -> None:
+        self.workflow_key = key
+        self.journal: list[tuple[str, int]] = []
+
+    def key(self) -> str:
+        return self.workflow_key
+
+    async def run(self, name, action, serde=JsonSerde()):
+        result = await action() if iscoroutinefunction(action) else action()
+        entry = serde.serialize(result)
+        self.journal.append((name, len(entry)))
+        # The workflow continues with the value from the journal, like on a replay
+        return serde.deserialize(entry)
+
+    def service_call(self, handler, arg):
+        async def call():
+            result = await handler(None, arg)
+            # The call entry holds the argument and the result
+            entry = JsonSerde().serialize(result)
+            self.journal.append((f"call {handler.__name__}", len(JsonSerde().serialize(arg)) + len(entry)))
+            return JsonSerde().deserialize(entry)
+
+        return asyncio.ensure_future(call())
+
+    def journal_bytes(self) -> int:
+        return sum(size for _, size in self.journal)
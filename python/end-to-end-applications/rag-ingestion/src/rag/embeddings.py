@@ -1,6 +1,14 @@
+import asyncio
 import os
+from typing import List, Tuple
 from langchain_ollama import OllamaEmbeddings
 
+# Concurrent embedding requests of a worker are sent to the model together,
+# in batches of up to EMBEDDINGS_BATCH_SIZE texts, waiting at most EMBEDDINGS_BATCH_WAIT_MS for a batch to fill up.
+# A batch size of 1 sends every text on its own.
+EMBEDDINGS_BATCH_SIZE = int(os.getenv('EMBEDDINGS_BATCH_SIZE', '64'))
+EMBEDDINGS_BATCH_WAIT_MS = float(os.getenv('EMBEDDINGS_BATCH_WAIT_MS', '10'))
+
 EMBEDDINGS: OllamaEmbeddings | None = None
 
 def get_embeddings_model() -> OllamaEmbeddings:
@@ -11,3 +19,67 @@ def get_embeddings_model() -> OllamaEmbeddings:
         ollama_host = os.environ['OLLAMA_HOST']
         EMBEDDINGS = OllamaEmbeddings(model=model, base_url=ollama_host)
     return EMBEDDINGS
+
+
+class EmbeddingsBatcher:
+    """Coalesces concurrent embedding requests into batches for the embeddings model"""
+
+    def __init__(self, model, max_batch_size: int, max_wait_ms: float) -> None:
+        self.model = model
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.flush_timer: asyncio.TimerHandle | None = None
+        self.batches: set[asyncio.Task] = set()
+
+    async def aembed(self, text: str) -> List[float]:
+        """Queue the text for the next batch and wait for its embedding"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Queue the texts for the next batches and wait for their embeddings"""
+        return list(await asyncio.gather(*(self.aembed(text) for text in texts)))
+
+    def flush(self):
+        """Send the queued texts to the model"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        while self.pending:
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            task = asyncio.create_task(self.embed_batch(batch))
+            # keep a reference until the batch is done
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def embed_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Compute the embeddings of a batch and hand them back to the callers"""
+        try:
+            vectors = await self.model.aembed_documents([text for text, _ in batch])
+        except Exception as e: # pylint: disable=broad-exception-caught
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            # the caller may have been cancelled in the meantime
+            if not future.done():
+                future.set_result(vector)
+
+
+BATCHER: EmbeddingsBatcher | None = None
+
+def get_embeddings_batcher() -> EmbeddingsBatcher:
+    """initialize or return cached embeddings batcher of this worker"""
+    global BATCHER # pylint: disable=global-statement
+    if BATCHER is None:
+        BATCHER = EmbeddingsBatcher(get_embeddings_model(), EMBEDDINGS_BATCH_SIZE, EMBEDDINGS_BATCH_WAIT_MS)
+    return BATCHER
@@ -0,0 +1,154 @@
+import asyncio
+from array import array
+from collections import OrderedDict
+from hashlib import sha256
+import os
+import time
+from typing import Dict, List
+
+from . embeddings import get_embeddings_model
+
+# Embeddings of the chunks that were already seen by this worker, keyed by the model name and the hash of the chunk,
+# so that re-ingesting a document, or boilerplate shared by documents, does not go to the model again.
+# At most EMBEDDINGS_CACHE_BYTES of vectors are kept in memory (0 disables the in-memory cache),
+# and if EMBEDDINGS_CACHE_DIR is set, all of them are also kept in files in that directory.
+EMBEDDINGS_CACHE_BYTES = int(os.getenv('EMBEDDINGS_CACHE_BYTES', str(64 * 1024 * 1024)))
+EMBEDDINGS_CACHE_DIR = os.getenv('EMBEDDINGS_CACHE_DIR')
+
+
+class EmbeddingsCache:
+    """Content-addressed cache of embeddings, with an in-memory LRU and an optional on-disk tier"""
+
+    def __init__(self, model_name: str, max_bytes: int, directory: str | None = None) -> None:
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.vectors: OrderedDict[str, bytes] = OrderedDict()
+        self.bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self.embed_seconds = 0.0
+
+    def key(self, text: str) -> str:
+        """cache key of a chunk for the model"""
+        return f"{self.model_name}/{sha256(text.encode()).hexdigest()}"
+
+    async def aembed_documents(self, texts: List[str], model) -> List[List[float]]:
+        """Return the cached embeddings of the texts, and compute the missing ones with the model"""
+        start = time.perf_counter()
+        keys = [self.key(text) for text in texts]
+        found: Dict[int, bytes] = {}
+        for i, key in enumerate(keys):
+            vector = self.get(key)
+            if vector is not None:
+                found[i] = vector
+        self.memory_hits += len(found)
+
+        if self.directory is not None and len(found) < len(texts):
+            missing = [i for i in range(len(texts)) if i not in found]
+            loop = asyncio.get_running_loop()
+            from_disk = await loop.run_in_executor(None, self.read_files, [keys[i] for i in missing])
+            for i, vector in zip(missing, from_disk):
+                if vector is not None:
+                    found[i] = vector
+                    self.put(keys[i], vector)
+                    self.disk_hits += 1
+        self.lookup_seconds += time.perf_counter() - start
+
+        vectors: List[List[float]] = [to_floats(found[i]) if i in found else [] for i in range(len(texts))]
+        missing = [i for i in range(len(texts)) if i not in found]
+        if not missing:
+            return vectors
+
+        self.misses += len(missing)
+        start = time.perf_counter()
+        computed = await model.aembed_documents([texts[i] for i in missing])
+        self.embed_seconds += time.perf_counter() - start
+
+        new_vectors = {}
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            new_vectors[keys[i]] = array('d', vector).tobytes()
+            self.put(keys[i], new_vectors[keys[i]])
+        if self.directory is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.write_files, new_vectors)
+        return vectors
+
+    def get(self, key: str) -> bytes | None:
+        """look up a vector in memory, and mark it as recently used"""
+        vector = self.vectors.get(key)
+        if vector is not None:
+            self.vectors.move_to_end(key)
+        return vector
+
+    def put(self, key: str, vector: bytes):
+        """keep a vector in memory, evicting the least recently used ones beyond the byte budget"""
+        size = len(key) + len(vector)
+        if size > self.max_bytes or key in self.vectors:
+            return
+        self.vectors[key] = vector
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old_key, old_vector = self.vectors.popitem(last=False)
+            self.bytes -= len(old_key) + len(old_vector)
+
+    def path(self, key: str) -> str:
+        """file of a vector in the on-disk tier"""
+        assert self.directory is not None
+        model_name, text_hash = key.rsplit('/', 1)
+        return os.path.join(self.directory, model_name.replace('/', '_'), text_hash[:2], text_hash)
+
+    def read_files(self, keys: List[str]) -> List[bytes | None]:
+        """file IO is blocking"""
+        vectors: List[bytes | None] = []
+        for key in keys:
+            try:
+                with open(self.path(key), 'rb') as file:
+                    vectors.append(file.read())
+            except FileNotFoundError:
+                vectors.append(None)
+        return vectors
+
+    def write_files(self, vectors: Dict[str, bytes]):
+        """file IO is blocking"""
+        for key, vector in vectors.items():
+            path = self.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write and rename, so that concurrent readers never see a partial vector
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(vector)
+            os.replace(temp_path, path)
+
+    def metrics(self) -> Dict[str, float]:
+        """hit rate and time spent in the cache and in the model"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "lookups": lookups,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_bytes": self.bytes,
+            "lookup_ms_per_text": self.lookup_seconds * 1000 / lookups if lookups else 0.0,
+            "embed_ms_per_miss": self.embed_seconds * 1000 / self.misses if self.misses else 0.0,
+        }
+
+
+def to_floats(vector: bytes) -> List[float]:
+    """decode a cached vector"""
+    return array('d', vector).tolist()
+
+
+CACHE: EmbeddingsCache | None = None
+
+def get_embeddings_cache() -> EmbeddingsCache:
+    """initialize or return cached embeddings cache of this worker"""
+    global CACHE # pylint: disable=global-statement
+    if CACHE is None:
+        model_name = get_embeddings_model().model
+        CACHE = EmbeddingsCache(model_name, EMBEDDINGS_CACHE_BYTES, EMBEDDINGS_CACHE_DIR)
+    return CACHE
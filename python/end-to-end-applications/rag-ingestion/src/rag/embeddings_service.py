@@ -1,12 +1,35 @@
 import restate
 
-from . embeddings import get_embeddings_model
+from . types import NewSnippets
+from . embeddings import get_embeddings_batcher
+from . embeddings_cache import get_embeddings_cache
+from . snippets import aload_snippets
+from . vector_store import get_vector_store
 
 embeddings_service = restate.Service('embeddings')
 
 @embeddings_service.handler()
 async def compute_embedding(_ctx, text: str):
     """Compute embeddings for the text chunks"""
-    model = get_embeddings_model()
-    vectors = await model.aembed_documents([text])
+    # batched together with the concurrent calls to this worker, unless it is cached
+    cache = get_embeddings_cache()
+    vectors = await cache.aembed_documents([text], get_embeddings_batcher())
     return vectors[0]
+
+@embeddings_service.handler()
+async def add_snippets(_ctx, request: NewSnippets) -> int:
+    """Compute embeddings for some of the snippets of a document, and add them to the vector store"""
+    # the snippets and their embeddings stay out of the journal of the workflow
+    snippets = await aload_snippets(request["snippets"])
+    texts = [snippets[i] for i in request["indexes"]]
+    cache = get_embeddings_cache()
+    vectors = await cache.aembed_documents(texts, get_embeddings_batcher())
+    metadata = { "object_name": request["object_name"], "bucket_name": request["bucket_name"] }
+    store = get_vector_store()
+    await store.aupsert(texts, vectors, metadata)
+    return len(texts)
+
+@embeddings_service.handler()
+async def cache_metrics(_ctx) -> dict:
+    """Hit rate and latency of the embeddings cache of the worker that handles the call"""
+    return get_embeddings_cache().metrics()
@@ -1,8 +1,17 @@
 
 import asyncio
+from contextlib import asynccontextmanager
+import io
 import os
+import tempfile
+from typing import IO, AsyncIterator
 import minio
 
+# Objects are spooled to a temporary file in parts of OBJECT_STORE_CHUNK_BYTES,
+# with one ranged request per OBJECT_STORE_RANGE_BYTES if that is set, or else with a single streaming request.
+OBJECT_STORE_CHUNK_BYTES = int(os.getenv('OBJECT_STORE_CHUNK_BYTES', str(1024 * 1024)))
+OBJECT_STORE_RANGE_BYTES = int(os.getenv('OBJECT_STORE_RANGE_BYTES', '0'))
+
 class ObjectStore:
     """Object Store client that wraps minio"""
     client: minio.Minio
@@ -29,6 +38,62 @@ class ObjectStore:
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, blocking_get)
 
+    async def adownload_object(self, bucket_name: str, object_name: str, file: IO[bytes]):
+        """Download object from minio into the file, without keeping it in memory"""
+
+        def blocking_download():
+            """minio API is blocking"""
+            if OBJECT_STORE_RANGE_BYTES <= 0:
+                self.write_range(bucket_name, object_name, file)
+                return
+            size = self.client.stat_object(bucket_name=bucket_name, object_name=object_name).size
+            for offset in range(0, size, OBJECT_STORE_RANGE_BYTES):
+                self.write_range(bucket_name, object_name, file,
+                                 offset=offset, length=min(OBJECT_STORE_RANGE_BYTES, size - offset))
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, blocking_download)
+        file.flush()
+
+    async def aput_object(self, bucket_name: str, object_name: str, data: bytes):
+        """Upload object to minio"""
+
+        def blocking_put():
+            """minio API is blocking"""
+            self.client.put_object(bucket_name=bucket_name, object_name=object_name,
+                                   data=io.BytesIO(data), length=len(data))
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, blocking_put)
+
+    async def aremove_object(self, bucket_name: str, object_name: str):
+        """Remove object from minio"""
+
+        def blocking_remove():
+            """minio API is blocking"""
+            self.client.remove_object(bucket_name=bucket_name, object_name=object_name)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, blocking_remove)
+
+    def write_range(self, bucket_name: str, object_name: str, file: IO[bytes], offset: int = 0, length: int = 0):
+        """Write the object, or the given range of it, to the file"""
+        response = self.client.get_object(bucket_name=bucket_name, object_name=object_name,
+                                          offset=offset, length=length)
+        try:
+            for chunk in response.stream(OBJECT_STORE_CHUNK_BYTES):
+                file.write(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+
+    @asynccontextmanager
+    async def aspooled_object(self, bucket_name: str, object_name: str) -> AsyncIterator[str]:
+        """Download object from minio into a temporary file, and yield its path"""
+        with tempfile.NamedTemporaryFile(prefix="object-", suffix=os.path.splitext(object_name)[1]) as file:
+            await self.adownload_object(bucket_name, object_name, file)
+            yield file.name
+
 OBJECT_STORE: ObjectStore | None = None
 
 def get_object_store_client() -> ObjectStore:
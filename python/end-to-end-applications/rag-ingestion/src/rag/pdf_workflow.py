@@ -1,23 +1,26 @@
 from typing import List
 
 import restate
-from restate.serde import BytesSerde
+from restate.exceptions import TerminalError
 
 from langchain_community.document_loaders.parsers import PyPDFParser
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.document_loaders.blob_loaders import Blob
 
-from . types import NewPdfDocument
+from . types import NewPdfDocument, NewSnippets, SnippetsRef
 from . object_store import get_object_store_client
-from . vector_store import get_vector_store
-from . embeddings_service import compute_embedding
+from . vector_store import get_vector_store, point_id
+from . embeddings import EMBEDDINGS_BATCH_SIZE
+from . embeddings_service import add_snippets
+from . snippets import asave_snippets, aload_snippets, aremove_snippets
 
 pdf_workflow = restate.Workflow('pdf')
 
-def extract_pdf_text_snippets(pdf_bytes: bytes) -> List[str]:
+def extract_pdf_text_snippets(pdf_path: str) -> List[str]:
     """Extract text from PDF"""
     parser = PyPDFParser()
-    docs = parser.parse(Blob.from_data(data=pdf_bytes, mime_type="application/pdf"))
+    # parsed from the file, without reading all of it into memory
+    docs = parser.parse(Blob.from_path(pdf_path, mime_type="application/pdf"))
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
     chunks = text_splitter.split_documents(docs)
     return [chunk.page_content for chunk in chunks]
@@ -26,37 +29,65 @@ def extract_pdf_text_snippets(pdf_bytes: bytes) -> List[str]:
 async def process_pdf(ctx: restate.WorkflowContext, request: NewPdfDocument):
     """PDF ingestion workflow"""
     #
-    # 1. Download the PDF
+    # 1. Download the PDF to a temporary file, and
+    # 2. Extract the snippets from the PDF, to the scratch bucket
     #
 
-    async def download_pdf() -> bytes:
+    async def download_and_extract() -> SnippetsRef:
         object_store = get_object_store_client()
-        return await object_store.aget_object(request["bucket_name"], request["object_name"])
+        async with object_store.aspooled_object(request["bucket_name"], request["object_name"]) as pdf_path:
+            texts = extract_pdf_text_snippets(pdf_path)
+        return await asave_snippets(f"pdf/{ctx.key()}", texts)
 
-    pdf_bytes = await ctx.run("Download PDF", download_pdf, serde=BytesSerde())
+    # only the reference to the snippets goes to the journal
+    snippets: SnippetsRef = await ctx.run("Download and extract PDF", download_and_extract)
 
-    #
-    # 2. Extract the snippets from the PDF
-    #
-
-    texts = extract_pdf_text_snippets(pdf_bytes)
+    async def remove_snippets():
+        await aremove_snippets(snippets)
 
-    #
-    # 3. Compute embeddings for the text snippets
-    #
-
-    vector_futures = [ctx.service_call(compute_embedding, arg=text) for text in texts]
-    vectors = [await vector for vector in vector_futures]
-
-    #
-    # 4. Add the documents to the vector store
-    #
+    try:
+        #
+        # 3. Find the snippets that are not in the vector store yet, from a previous version of the document
+        #    or from other documents. The document claims the ones that are, so that other documents do not remove them.
+        #
 
-    async def add_documents():
         metadata = { "object_name": request["object_name"], "bucket_name": request["bucket_name"] }
-        store = get_vector_store()
-        await store.aupsert(texts, vectors, metadata)
 
-    await ctx.run("Add documents", add_documents)
+        async def find_new() -> List[int]:
+            texts = await aload_snippets(snippets)
+            existing = set(await get_vector_store().aclaim_existing(texts, metadata))
+            return [i for i, text in enumerate(texts) if point_id(text) not in existing]
+
+        new_indexes: List[int] = await ctx.run("Find new snippets", find_new)
+
+        #
+        # 4. Compute embeddings for the new snippets, and add them to the vector store
+        #
+
+        batches = [new_indexes[i:i + EMBEDDINGS_BATCH_SIZE] for i in range(0, len(new_indexes), EMBEDDINGS_BATCH_SIZE)]
+        added_futures = [ctx.service_call(add_snippets, arg=NewSnippets(snippets=snippets,
+                                                                        indexes=indexes,
+                                                                        bucket_name=request["bucket_name"],
+                                                                        object_name=request["object_name"]))
+                         for indexes in batches]
+        for added in added_futures:
+            await added
+
+        #
+        # 5. Remove the snippets of the previous version of the document, unless other documents contain them
+        #
+
+        async def remove_previous_version():
+            texts = await aload_snippets(snippets)
+            store = get_vector_store()
+            await store.aremove_previous_version(texts, metadata)
+
+        await ctx.run("Remove previous version", remove_previous_version)
+    except TerminalError:
+        # the scratch snippets are removed when the ingestion fails for good too
+        await ctx.run("Remove snippets", remove_snippets)
+        raise
+
+    await ctx.run("Remove snippets", remove_snippets)
 
     return "ok"
@@ -0,0 +1,63 @@
+import asyncio
+from collections import OrderedDict
+from hashlib import sha256
+import json
+import os
+from typing import List
+
+from restate.exceptions import TerminalError
+
+from . types import SnippetsRef
+from . object_store import get_object_store_client
+
+# The text snippets of the documents that are being ingested are kept in this bucket,
+# so that the workflows only write a reference to them to their journal
+SCRATCH_BUCKET = os.getenv('SCRATCH_BUCKET', 'scratch')
+# Number of documents of which a worker keeps the snippets in memory
+SNIPPETS_CACHE_DOCUMENTS = int(os.getenv('SNIPPETS_CACHE_DOCUMENTS', '8'))
+
+SNIPPETS: OrderedDict[str, asyncio.Task] = OrderedDict()
+
+
+async def asave_snippets(name: str, texts: List[str]) -> SnippetsRef:
+    """Store the snippets of a document in the scratch bucket, and return a reference to them"""
+    data = json.dumps(texts).encode()
+    ref = SnippetsRef(bucket_name=SCRATCH_BUCKET,
+                      object_name=f"{name}.json",
+                      sha256=sha256(data).hexdigest(),
+                      count=len(texts))
+    await get_object_store_client().aput_object(ref["bucket_name"], ref["object_name"], data)
+    return ref
+
+
+async def aload_snippets(ref: SnippetsRef) -> List[str]:
+    """Return the snippets of a document, from memory or from the scratch bucket"""
+    task = SNIPPETS.get(ref["sha256"])
+    if task is None:
+        # concurrent calls for the same document share the download
+        task = asyncio.create_task(download_snippets(ref))
+        SNIPPETS[ref["sha256"]] = task
+        while len(SNIPPETS) > SNIPPETS_CACHE_DOCUMENTS:
+            SNIPPETS.popitem(last=False)
+    else:
+        SNIPPETS.move_to_end(ref["sha256"])
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        if SNIPPETS.get(ref["sha256"]) is task:
+            del SNIPPETS[ref["sha256"]]
+        raise
+
+
+async def download_snippets(ref: SnippetsRef) -> List[str]:
+    """Download the snippets and check that they are the ones that were saved"""
+    data = await get_object_store_client().aget_object(ref["bucket_name"], ref["object_name"])
+    if sha256(data).hexdigest() != ref["sha256"]:
+        raise TerminalError(f"The snippets in {ref['bucket_name']}/{ref['object_name']} were modified")
+    return json.loads(data)
+
+
+async def aremove_snippets(ref: SnippetsRef):
+    """Remove the snippets of a document from the scratch bucket"""
+    SNIPPETS.pop(ref["sha256"], None)
+    await get_object_store_client().aremove_object(ref["bucket_name"], ref["object_name"])
@@ -1,11 +1,16 @@
+from typing import List
+
 import restate
+from restate.exceptions import TerminalError
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from . types import NewTextDocument
+from . types import NewTextDocument, SnippetsRef
 from . object_store import get_object_store_client
-from . vector_store import get_vector_store
+from . vector_store import get_vector_store, point_id
 from . embeddings import get_embeddings_model
+from . embeddings_cache import get_embeddings_cache
+from . snippets import asave_snippets, aload_snippets, aremove_snippets
 
 text_workflow = restate.Workflow('text')
 
@@ -13,42 +18,60 @@ text_workflow = restate.Workflow('text')
 async def process_text(ctx: restate.WorkflowContext, request: NewTextDocument):
     """Text ingestion workflow"""
     #
-    # 1. Download the text file
+    # 1. Download the text file, and
+    # 2. Split it into snippets, to the scratch bucket
     #
 
-    async def download() -> str:
+    async def download_and_split() -> SnippetsRef:
         object_store = get_object_store_client()
         text_bytes = await object_store.aget_object(request["bucket_name"], request["object_name"])
-        return text_bytes.decode("utf-8")
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        chunks = text_splitter.split_text(text_bytes.decode("utf-8"))
+        return await asave_snippets(f"text/{ctx.key()}", chunks)
 
-    text: str = await ctx.run("Download", download)
+    # only the reference to the snippets goes to the journal
+    snippets: SnippetsRef = await ctx.run("Download and split", download_and_split)
 
-    #
-    # 2. Extract the snippets from the PDF
-    #
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_text(text)
+    async def remove_snippets():
+        await aremove_snippets(snippets)
 
-    #
-    # 3. Compute embeddings for the text snippets
-    #
+    try:
+        #
+        # 3. Find the snippets that are not in the vector store yet, from a previous version of the document
+        #    or from other documents. The document claims the ones that are, so that other documents do not remove them.
+        #
+
+        metadata = { "object_name": request["object_name"], "bucket_name": request["bucket_name"] }
 
-    async def compute_embeddings():
-        model = get_embeddings_model()
-        vectors = await model.aembed_documents(chunks)
-        return vectors
+        async def find_new() -> List[int]:
+            chunks = await aload_snippets(snippets)
+            existing = set(await get_vector_store().aclaim_existing(chunks, metadata))
+            return [i for i, chunk in enumerate(chunks) if point_id(chunk) not in existing]
 
-    vectors = await ctx.run("compute embeddings", compute_embeddings)
+        new_indexes: List[int] = await ctx.run("Find new snippets", find_new)
 
-    #
-    # 4. Add the documents to the vector store
-    #
+        #
+        # 4. Compute embeddings for the new snippets, add them to the vector store,
+        #    and remove the ones of the previous version, unless other documents contain them.
+        #    The embeddings are computed again on a retry (mostly from the cache), instead of being journaled.
+        #
 
-    async def add_documents():
-        metadata = { "object_name": request["object_name"], "bucket_name": request["bucket_name"] }
-        store = get_vector_store()
-        await store.aupsert(chunks, vectors, metadata)
+        async def add_documents():
+            chunks = await aload_snippets(snippets)
+            new_chunks = [chunks[i] for i in new_indexes]
+            cache = get_embeddings_cache()
+            vectors = await cache.aembed_documents(new_chunks, get_embeddings_model())
+
+            store = get_vector_store()
+            await store.aupsert(new_chunks, vectors, metadata)
+            await store.aremove_previous_version(chunks, metadata)
+
+        await ctx.run("Add documents", add_documents)
+    except TerminalError:
+        # the scratch snippets are removed when the ingestion fails for good too
+        await ctx.run("Remove snippets", remove_snippets)
+        raise
 
-    await ctx.run("Add documents", add_documents)
+    await ctx.run("Remove snippets", remove_snippets)
 
     return "ok"
@@ -1,6 +1,6 @@
 """core types"""
 
-from typing import TypedDict
+from typing import List, TypedDict
 
 class NewPdfDocument(TypedDict):
     """A new document request """
@@ -13,3 +13,17 @@ class NewTextDocument(TypedDict):
     object_name: str
 
 
+
+class SnippetsRef(TypedDict):
+    """Location and content hash of the text snippets of a document, in the scratch bucket"""
+    bucket_name: str
+    object_name: str
+    sha256: str
+    count: int
+
+class NewSnippets(TypedDict):
+    """A request to embed and add some of the snippets of a document"""
+    snippets: SnippetsRef
+    indexes: List[int]
+    bucket_name: str
+    object_name: str
@@ -2,6 +2,7 @@ import asyncio
 from hashlib import sha256
 import os
 import threading
+from typing import List
 import uuid
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient, models
@@ -9,6 +10,17 @@ from qdrant_client import QdrantClient, models
 from . embeddings import get_embeddings_model
 
 
+def point_id(text: str) -> str:
+    """Id of the point of a text chunk, derived from its content"""
+    text_hash = sha256(text.encode()).digest()
+    return uuid.UUID(bytes=text_hash[:16]).hex
+
+
+def document_id(metadata) -> str:
+    """Id of a document, in the list of documents that own a point"""
+    return f"{metadata['bucket_name']}/{metadata['object_name']}"
+
+
 class VectorStore:
     """Wrapper around the Qdrant vector store client"""
     store: QdrantVectorStore
@@ -17,24 +29,119 @@ class VectorStore:
         self.store = store
 
     async def aupsert(self, texts, vectors, metadata):
-        """Convert texts and embeddings to the Qdrant points and upsert them"""
-        points = []
-        for text, vector in zip(texts, vectors):
-            text_hash = sha256(text.encode()).digest()
-            point_id = uuid.UUID(bytes=text_hash[:16]).hex
-            payload = metadata.copy()
-            payload["page_content"] = text
-            point = models.PointStruct(id=point_id, vector={ "" : vector}, payload = payload)
-            points.append(point)
+        """Convert texts and embeddings to the Qdrant points, add the ones that are not in the collection yet,
+        and make the document own all of them"""
+        client = self.store.client
+        document = document_id(metadata)
 
+        def task():
+            points = {}
+            for text, vector in zip(texts, vectors):
+                payload = metadata.copy()
+                payload["page_content"] = text
+                payload["documents"] = [document]
+                payload["revision"] = uuid.uuid4().hex
+                points[point_id(text)] = models.PointStruct(id=point_id(text), vector={ "" : vector}, payload = payload)
+            missing = set(points)
+            while missing:
+                # another document may have added some of the points in the meantime: those are only claimed,
+                # and the ones it removed again before they were claimed are added again
+                client.upsert(collection_name="docs", points=[points[i] for i in missing],
+                              update_mode=models.UpdateMode.INSERT_ONLY, wait=True,
+                              ordering=models.WriteOrdering.STRONG)
+                missing = update_documents(client, missing, document, owns=True)
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, task)
+
+    async def aclaim_existing(self, texts, metadata) -> List[str]:
+        """Make the document own the points of the texts that are already in the collection, and return their ids.
+        Once claimed, the points are not removed by other documents that give them up."""
         client = self.store.client
-        
+        document = document_id(metadata)
+        ids = {point_id(text) for text in texts}
+
         def task():
-            client.upsert(collection_name="docs", points=points, wait=False)
+            missing = update_documents(client, ids, document, owns=True)
+            return [i for i in ids if i not in missing]
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, task)
+
+    async def aremove_previous_version(self, texts, metadata):
+        """Give up the points of the previous version of the document that are not among its texts any more.
+        Points that no document owns any more are removed."""
+        client = self.store.client
+        document = document_id(metadata)
+        kept_ids = {point_id(text) for text in texts}
+        owned_filter = models.Filter(should=[
+            models.FieldCondition(key="documents", match=models.MatchValue(value=document)),
+            # points written before the documents were recorded, owned by the document that wrote them last
+            models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="documents")),
+                                *[models.FieldCondition(key=key, match=models.MatchValue(value=value))
+                                  for key, value in metadata.items()]]),
+        ])
+
+        def task():
+            removed_ids = set()
+            offset = None
+            while True:
+                owned, offset = client.scroll(collection_name="docs", scroll_filter=owned_filter, offset=offset,
+                                              limit=1000, with_payload=False, with_vectors=False)
+                removed_ids.update(uuid.UUID(str(record.id)).hex for record in owned)
+                if offset is None:
+                    break
+            update_documents(client, removed_ids - kept_ids, document, owns=False)
 
         loop = asyncio.get_event_loop()
         await loop.run_in_executor(None, task)
 
+
+def update_documents(client, ids, document: str, owns: bool) -> set:
+    """Add the document to the owners of the points, or remove it, deleting the points that no document owns then.
+    The owners of a point are read and written back, by any worker, so every write only applies if the revision
+    of the point did not change since it was read; otherwise the point is read and updated again.
+    Returns the ids of the points that are not in the collection."""
+    pending = set(ids)
+    missing: set = set()
+    while pending:
+        records = client.retrieve(collection_name="docs", ids=list(pending), with_payload=True, with_vectors=False)
+        missing |= pending - {uuid.UUID(str(record.id)).hex for record in records}
+        operations: List[models.UpdateOperation] = []
+        for record in records:
+            record_id = uuid.UUID(str(record.id)).hex
+            payload = record.payload or {}
+            documents = record_documents(record)
+            if (document in documents) == owns and "documents" in payload:
+                pending.discard(record_id)
+                continue
+            new_documents = documents | {document} if owns else documents - {document}
+            unchanged = models.Filter(must=[
+                models.HasIdCondition(has_id=[record_id]),
+                models.FieldCondition(key="revision", match=models.MatchValue(value=payload["revision"]))
+                if "revision" in payload else models.IsEmptyCondition(is_empty=models.PayloadField(key="revision")),
+            ])
+            if new_documents:
+                operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={"documents": sorted(new_documents), "revision": uuid.uuid4().hex}, filter=unchanged)))
+            else:
+                operations.append(models.DeleteOperation(delete=models.FilterSelector(filter=unchanged)))
+        pending -= missing
+        if operations:
+            # the writes are visible to the next read, which checks whether they applied
+            client.batch_update_points(collection_name="docs", update_operations=operations,
+                                       wait=True, ordering=models.WriteOrdering.STRONG)
+    return missing
+
+
+def record_documents(record) -> set:
+    """Documents that own a point"""
+    payload = record.payload or {}
+    if "documents" in payload:
+        return set(payload["documents"])
+    # points written before the documents were recorded
+    return {document_id(payload)} if "object_name" in payload else set()
+
 VECTOR_STORE: VectorStore | None = None
 LOCK = threading.Lock()
 
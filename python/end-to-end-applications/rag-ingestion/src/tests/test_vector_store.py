@@ -0,0 +1,124 @@
+# Copyright (c) 2024 - Restate Software, Inc., Restate GmbH
+#
+# This file is part of the Restate examples,
+# which is released under the MIT license.
+#
+# You can find a copy of the license in the file LICENSE
+# in the root directory of this repository or package or at
+# https://github.com/restatedev/examples/
+
+# Run from the src directory: python -m unittest discover tests
+
+import unittest
+from types import SimpleNamespace
+
+from qdrant_client import QdrantClient, models
+
+from rag.vector_store import VectorStore, point_id, update_documents
+
+BOILERPLATE = "Copyright ACME, all rights reserved."
+A = {"bucket_name": "docs", "object_name": "a.txt"}
+B = {"bucket_name": "docs", "object_name": "b.txt"}
+
+
+class SharedChunksTest(unittest.IsolatedAsyncioTestCase):
+    """Two documents that contain the same chunk, which is a single point"""
+
+    def setUp(self):
+        self.client = QdrantClient(":memory:")
+        self.client.create_collection("docs", vectors_config=models.VectorParams(size=2,
+                                                                                 distance=models.Distance.COSINE))
+        self.store = VectorStore(SimpleNamespace(client=self.client))
+
+    async def find_new(self, texts, metadata):
+        existing = set(await self.store.aclaim_existing(texts, metadata))
+        return [text for text in texts if point_id(text) not in existing]
+
+    async def add(self, texts, new_texts, metadata):
+        await self.store.aupsert(new_texts, [[1.0, float(len(text))] for text in new_texts], metadata)
+        await self.store.aremove_previous_version(texts, metadata)
+
+    async def ingest(self, texts, metadata):
+        await self.add(texts, await self.find_new(texts, metadata), metadata)
+
+    def owners(self, text):
+        records = self.client.retrieve("docs", ids=[point_id(text)], with_payload=True)
+        return records[0].payload["documents"] if records else None
+
+    async def test_shared_chunk_is_owned_by_both_documents(self):
+        await self.ingest(["a1", BOILERPLATE], A)
+        await self.ingest(["b1", BOILERPLATE], B)
+
+        self.assertEqual(self.owners(BOILERPLATE), ["docs/a.txt", "docs/b.txt"])
+        self.assertEqual(self.owners("a1"), ["docs/a.txt"])
+        self.assertEqual(self.client.count("docs").count, 3)
+
+    async def test_new_version_without_shared_chunk_keeps_it_for_the_other_document(self):
+        await self.ingest(["a1", BOILERPLATE], A)
+        await self.ingest(["b1", BOILERPLATE], B)
+        # the new version of A does not contain the shared chunk any more
+        await self.ingest(["a2"], A)
+
+        self.assertEqual(self.owners(BOILERPLATE), ["docs/b.txt"])
+        self.assertIsNone(self.owners("a1"))
+        self.assertEqual(self.owners("a2"), ["docs/a.txt"])
+        self.assertEqual(self.owners("b1"), ["docs/b.txt"])
+
+    async def test_shared_chunk_is_removed_with_its_last_document(self):
+        await self.ingest(["a1", BOILERPLATE], A)
+        await self.ingest(["b1", BOILERPLATE], B)
+        await self.ingest(["a2"], A)
+        await self.ingest(["b2"], B)
+
+        self.assertIsNone(self.owners(BOILERPLATE))
+        self.assertEqual(self.client.count("docs").count, 2)
+
+    async def test_unchanged_chunk_keeps_its_metadata(self):
+        await self.ingest(["a1", BOILERPLATE], A)
+        await self.ingest(["b1", BOILERPLATE], B)
+
+        payload = self.client.retrieve("docs", ids=[point_id(BOILERPLATE)], with_payload=True)[0].payload
+        self.assertEqual(payload["object_name"], "a.txt")
+
+
+class InterleavedIngestionTest(SharedChunksTest):
+    """Two documents that contain the same chunk, ingested at the same time"""
+
+    async def test_both_documents_add_the_shared_chunk(self):
+        # neither document finds the shared chunk, so both add it
+        new_a = await self.find_new(["a1", BOILERPLATE], A)
+        new_b = await self.find_new(["b1", BOILERPLATE], B)
+        await self.add(["a1", BOILERPLATE], new_a, A)
+        await self.add(["b1", BOILERPLATE], new_b, B)
+
+        self.assertEqual(self.owners(BOILERPLATE), ["docs/a.txt", "docs/b.txt"])
+
+    async def test_claim_while_the_other_document_gives_up_the_shared_chunk(self):
+        await self.ingest(["a1", BOILERPLATE], A)
+        batch_update_points = self.client.batch_update_points
+
+        def claim_first(*args, **kwargs):
+            # B claims the shared chunk after A read its owners, and before A removes it
+            self.client.batch_update_points = batch_update_points
+            update_documents(self.client, {point_id(BOILERPLATE)}, "docs/b.txt", owns=True)
+            return batch_update_points(*args, **kwargs)
+
+        self.client.batch_update_points = claim_first
+        # the new version of A does not contain the shared chunk any more
+        await self.ingest(["a2"], A)
+
+        self.assertEqual(self.owners(BOILERPLATE), ["docs/b.txt"])
+
+    async def test_shared_chunk_found_by_one_document_survives_the_other(self):
+        await self.ingest(["a1", BOILERPLATE], A)
+        new_b = await self.find_new(["b1", BOILERPLATE], B)
+        self.assertEqual(new_b, ["b1"])
+        # A gives up the shared chunk after B found it, and before B added its snippets
+        await self.store.aremove_previous_version(["a2"], A)
+        await self.add(["b1", BOILERPLATE], new_b, B)
+
+        self.assertEqual(self.owners(BOILERPLATE), ["docs/b.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()